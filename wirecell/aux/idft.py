@@ -1,10 +1,8 @@
-import os
 import json
 import numpy
 import matplotlib.pyplot as plt
 from collections import defaultdict
 from wirecell.util import ario
-import tarfile
 
 def load(filename):
     dat = json.loads(open(filename).read())
@@ -186,19 +184,9 @@ def save_arrays(fname, arrays):
 
     Array names will have .npy appended if missing.
     '''
-    # fixme: it would be nice to add this to ario
-    mode = "w"
-    if fname.endswith('.bz2'): mode += ":bz2"
-    if fname.endswith('.gz'): mode += ":gz"
-    tf = tarfile.open(fname, mode=mode, format=tarfile.GNU_FORMAT)
-    for name, arr in arrays.items():
-        # fixme: use tempfile
-        numpy.save("tmp.npy", arr);
-        if not name.endswith(".npy"):
-            name += ".npy"
-        tf.add("tmp.npy", name);
-        os.unlink("tmp.npy")
-    tf.close()
+    with ario.Writer(fname) as out:
+        for name, arr in arrays.items():
+            out.add(name, numpy.asarray(arr))
 
 def select_array(dat, func_name, first=False, inplace=True):
     '''
@@ -4,6 +4,7 @@ import math
 import click
 from wirecell import units
 from wirecell.util.functions import unitify, unitify_parse
+from wirecell.gen import depogen
 
 cmddef = dict(context_settings = dict(help_option_names=['-h', '--help']))
 
@@ -39,7 +40,7 @@ def unitify_depos(ctx, json_path,
 
     '''
 
-    import depos as deposmod
+    from . import depos as deposmod
     depos = deposmod.load(input_file)
     depos = deposmod.apply_units(depos, distance_unit, time_unit, energy_unit, step_unit);
     deposmod.dump(output_file, depos)
@@ -58,19 +59,68 @@ def unitify_depos(ctx, json_path,
 def move_depos(ctx, json_path, center, offset,
                    input_file, output_file):
     '''
-    Apply some transformations to a file of JSON depos and create a new file.
+    Apply some transformations to a file of depos and create a new file.
+
+    Each depo set is transformed.  A JSON output takes the first.
     '''
-    import depos as deposmod
-    depos = deposmod.load(input_file)
+    from . import depos as deposmod
 
     if center:
         center = tuple([float(eval(c, units.__dict__)) for c in center])
-        depos = deposmod.center(depos, center)
-
     if offset:
         offset = tuple([float(eval(c, units.__dict__)) for c in offset])
-        depos = deposmod.move(depos, offset)
-    deposmod.dump(output_file, depos)
+
+    def transform(sets):
+        for index, data, info in sets:
+            if center:
+                data = deposmod.center(data, center)
+            if offset:
+                data = deposmod.move(data, offset)
+            yield index, data, info
+
+    sets = transform(deposmod.iter_sets(input_file, json_path, 'float64'))
+    if output_file.endswith(deposmod.json_exts):
+        for _, data, info in sets:
+            deposmod.dump(output_file, data, json_path)
+            return
+        print(f'no depo sets to move in {input_file}')
+        return -1
+    deposmod.write_sets(output_file, sets)
+
+@cli.command("convert-depos")
+@click.option("-c", "--compression", default=None,
+              type=click.Choice(["gz", "bz2", "xz", "zst"]),
+              help="Compress each array of an archive output")
+@click.option("-i", "--index", default=None, type=int,
+              help="Convert only this depo set, def: all (JSON output takes the first)")
+@click.option("-j", "--json-path", default='depos',
+              help="Data structure path to the deposition array in JSON files.")
+@click.argument("input-file")
+@click.argument("output-file")
+def convert_depos(compression, index, json_path, input_file, output_file):
+    '''
+    Convert depo sets between file formats.
+
+    Archive files (.npz, .tar, etc) hold each set as binary
+    depo_data_N and depo_info_N arrays and are converted one set at a
+    time.  A .json or .json.bz2 file holds a single set as depo
+    objects.
+    '''
+    import wirecell.gen.depos as deposmod
+
+    sets = deposmod.iter_sets(input_file, json_path)
+    if index is not None:
+        sets = (one for one in sets if one[0] == index)
+
+    if output_file.endswith(deposmod.json_exts):
+        for _, data, info in sets:
+            deposmod.dump(output_file, data, json_path)
+            return
+        print(f'no depo sets to convert in {input_file}')
+        return -1
+
+    deposmod.write_sets(output_file, sets, compression)
+
 
 @cli.command("plot-depos")
 @click.option("-g", "--generation", default=0,
@@ -83,11 +133,17 @@ def move_depos(ctx, json_path, center, offset,
               help="Assign x position based on drift speed, use units like '1.6*mm/us'.")
 @click.option("--t0", default="0*ns",
               help="Arbitrary additive time used in drift speed assignment, use units")
+@click.option("-c", "--corner", type=str, default=None,
+              help="Plot only depos in a box with this corner, eg '0,0,0*m'")
+@click.option("-d", "--diagonal", type=str, default=None,
+              help="A vector from corner to diagonally opposed corner of the box")
+@click.option("-w", "--time-window", type=str, default=None,
+              help="Plot only depos in a time range, eg '0*us,100*us'")
 @click.argument("input-file")
 @click.argument("output-file")
 @click.pass_context
 def plot_depos(ctx, generation, index, plot,
-               speed, t0,
+               speed, t0, corner, diagonal, time_window,
                input_file, output_file):
     '''
     Make a plot from a WCT depo file.
@@ -100,8 +156,12 @@ def plot_depos(ctx, generation, index, plot,
     Note, a t0 of the ductors "start_time" will generally bring depos
     into alignement with products for simulated frames.
 
+    The box and time window select depos before speed and t0 are
+    applied.
+
     See also "wirecell-img paraview-depos".
     '''
+    import numpy
     import wirecell.gen.depos as deposmod
 
     plotter = getattr(deposmod, "plot_"+plot)
@@ -109,6 +169,19 @@ def plot_depos(ctx, generation, index, plot,
     if 't' not in depos or len(depos['t']) == 0:
         print(f'No depos for index={index} and generation={generation} in {input_file}')
         return
+    box = trange = None
+    if corner or diagonal:
+        if not (corner and diagonal):
+            raise click.BadParameter("a box needs both --corner and --diagonal")
+        p0 = numpy.array(unitify_parse(corner))
+        p1 = p0 + numpy.array(unitify_parse(diagonal))
+        box = (numpy.minimum(p0, p1), numpy.maximum(p0, p1))
+    if time_window:
+        trange = unitify_parse(time_window)
+    if box is not None or trange is not None:
+        rows = deposmod.region(depos, box, trange)
+        print(f'selected {len(rows)} of {len(depos["t"])} depos')
+        depos = deposmod.select(depos, rows)
     t0 = unitify(t0)
     if speed is not None:
         speed = unitify(speed)
@@ -273,22 +346,23 @@ def plot_sim(ctx, input_file, output_file, ticks, plot, tag, time_range, number,
               help="Speed of track")
 @click.option("--seed", default="0,1,2,3,4", type=str,
               help="A single integer or comma-list of integers to use as random seed")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes generating depo sets, def: serial")
 @click.option("-o", "--output",
               type=click.Path(dir_okay=False, file_okay=True),
-              help="Numpy file (.npz) in which to save the results")
+              help="Archive file (.npz, .tar, etc) in which to save the results")
 def depo_lines(electron_density, step_size, time, tracks, sets,
-               corner, diagonal, track_speed, seed, output):
+               corner, diagonal, track_speed, seed, jobs, output):
     '''
     Generate ideal line-source "tracks" of depos
-    '''
-
-    if not output.endswith(".npz"):
-        print(f'unsupported file type: {output}')
-        return -1
 
+    Each depo set is written to the output as it is generated so
+    memory holds only the sets in progress.  Each set is seeded
+    independently from --seed so the result does not depend on --jobs.
+    '''
+    from wirecell.util import ario
     seed = list(map(int, seed.split(",")))
-    import numpy.random
-    numpy.random.seed(seed)
+    import numpy
 
     time = unitify_parse(time)
     track_speed = unitify(track_speed)
@@ -299,60 +373,93 @@ def depo_lines(electron_density, step_size, time, tracks, sets,
     p0 = numpy.array(unitify_parse(corner))
     p1 = numpy.array(unitify_parse(diagonal)) + p0
 
-    from .depogen import lines
-
-    arrays = lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed)
+    from .depogen import iter_lines
 
-    print("saving:", list(arrays.keys()))
-    numpy.savez(output, **arrays) 
+    print(f"depo time: {time}")
+    gen = iter_lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed,
+                     seed, jobs)
+    try:
+        out = ario.Writer(output)
+    except ValueError:
+        print(f'unsupported file type: {output}')
+        return -1
+    with out:
+        for iset, (datas, infos, tinfos) in enumerate(gen):
+            print(f"saving set {iset}: {len(datas)} depos")
+            out.add(f'depo_data_{iset}', datas)
+            out.add(f'depo_info_{iset}', infos)
+            out.add(f'track_info_{iset}', tinfos)
 
 @cli.command("depo-sphere")
+@click.option("-p", "--pattern", default="shell",
+              type=click.Choice(sorted(depogen.patterns)),
+              help="The shape of the depo pattern, def: shell")
 @click.option("-r", "--radius", default="1*m",
               help="Radius of the origin sphere)")
+@click.option("-L", "--length", default="1*m",
+              help="Length of a cylinder pattern")
+@click.option("-a", "--axis", type=str, default="0,0,1",
+              help="Axis of a cylinder or normal to a sheet pattern")
+@click.option("-n", "--npoints", default=0, type=int,
+              help="Number of depos, def: 0.3*(radius/step-size)^2")
 @click.option("-e", "--electron-density", default="5000/mm",
               help="Linear electron density on track (number of electrons per unit track length)")
 @click.option("-S", "--step-size", default="1.0*mm",
               help="Distance between deposition of ionization electron groups")
-@click.option("-c", "--corner", type=str, default="0,0,0",
-              help="One corner of a bounding box")
-@click.option("-d", "--diagonal", type=str, default="1*m,1*m,1*m",
-              help="A vector from corner to diagonally opposed corner of bounding box")
 @click.option("-O", "--origin", type=str, default="0,0,0",
               help="A vector to origin")
 @click.option("--seed", default="0,1,2,3,4", type=str,
               help="A single integer or comma-list of integers to use as random seed")
 @click.option("-o", "--output",
               type=click.Path(dir_okay=False, file_okay=True),
-              help="Numpy file (.npz) in which to save the results")
-def depo_sphere(radius, electron_density, step_size, 
-                corner, diagonal, origin, seed, output):
-    '''
-    Generate ideal line-source "tracks" of depos
+              help="Archive file (.npz, .tar, etc) in which to save the results")
+def depo_sphere(pattern, radius, length, axis, npoints, electron_density, step_size,
+                origin, seed, output):
     '''
+    Generate ideal patterns of depos, by default a spherical shell.
 
-    if not output.endswith(".npz"):
-        print(f'unsupported file type: {output}')
-        return -1
+    The patterns are:
+
+        - shell :: uniform on a sphere of radius
+
+        - ball :: uniform inside a sphere of radius
+
+        - cylinder :: uniform inside a cylinder of radius and length
+          along axis
+
+        - sheet :: uniform on a square of half-width radius with
+          normal along axis
+
+        - point :: along isotropic rays from origin out to radius
+    '''
+    import numpy
+    from wirecell.util import ario
+    from .depogen import pattern_set, default_npoints
 
     seed = list(map(int, seed.split(",")))
-    import numpy.random
-    numpy.random.seed(seed)
+    rng = numpy.random.default_rng(seed)
 
     radius = unitify_parse(radius)[0]
+    length = unitify_parse(length)[0]
+    axis = numpy.array(unitify_parse(axis))
     electron_density = unitify(electron_density)
     step_size = unitify(step_size)
     eperstep = electron_density * step_size
+    npoints = npoints or default_npoints(radius, step_size)
 
-    p0 = numpy.array(unitify_parse(corner))
-    p1 = numpy.array(unitify_parse(diagonal))
     origin = numpy.array(unitify_parse(origin))
 
-    from .depogen import sphere
+    data, info = pattern_set(pattern, npoints, origin, eperstep, rng,
+                             radius=radius, length=length, axis=axis)
 
-    arrays = sphere(origin, p0, p1, radius=radius,
-                    eperstep=eperstep, step_size=step_size)
-
-    numpy.savez(output, **arrays) 
+    try:
+        out = ario.Writer(output)
+    except ValueError:
+        print(f'unsupported file type: {output}')
+        return -1
+    with out:
+        out.add("depo_data_0", data)
+        out.add("depo_info_0", info)
 
 
 
@@ -5,14 +5,151 @@ Various functions to generate patterns of depos.
 
 import math
 import numpy
-from numpy.random import uniform, normal as gauss
 from wirecell import units
 
 track_info_types = numpy.dtype([('pmin','3float32'), ('pmax','3float32'),
                                 ('tmin', 'float32'), ('tmax', 'float32'),
                                 ('step','f4'),       ('eper','f4')])
 
-def lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed):
+def make_rng(rng=None):
+    '''
+    Return a random source from rng.
+
+    This may be a numpy.random.Generator, which is returned, an
+    integer or sequence of integers used to seed a new Generator or
+    None to use the global numpy.random state.
+    '''
+    if rng is None:
+        return numpy.random
+    if isinstance(rng, (numpy.random.Generator, numpy.random.RandomState)):
+        return rng
+    return numpy.random.default_rng(rng)
+
+
+def spawn_seeds(rng, num):
+    '''
+    Return num independent numpy.random.SeedSequence derived from rng
+    as accepted by make_rng().
+    '''
+    if rng is None or isinstance(rng, (numpy.random.Generator, numpy.random.RandomState)):
+        src = make_rng(rng)
+        draw = getattr(src, "integers", None) or src.randint
+        rng = [int(one) for one in draw(0, 2**31, size=4)]
+    return numpy.random.SeedSequence(rng).spawn(num)
+
+
+def generate(func, seeds, *args, workers=0):
+    '''
+    Yield func(*args, rng) for each seed in turn.
+
+    If workers is nonzero the calls are made in that many processes
+    with at most two results per worker held ahead of the consumer.
+    '''
+    if not workers:
+        for seed in seeds:
+            yield func(*args, numpy.random.default_rng(seed))
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    pending = deque()
+    seeds = iter(seeds)
+    with ProcessPoolExecutor(workers) as pool:
+        for seed in seeds:
+            pending.append(pool.submit(func, *args, numpy.random.default_rng(seed)))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def line_set(tracks, p0, p1, time, eperstep, step_size, track_speed, rng=None):
+    '''
+    Generate one set of tracks as in lines().
+
+    Return tuple of (data, info, track_info) arrays.  All tracks are
+    made at once.
+    '''
+    rng = make_rng(rng)
+    p0 = numpy.asarray(p0, dtype=float)
+    p1 = numpy.asarray(p1, dtype=float)
+
+    pt = rng.uniform(p0, p1, size=(tracks, 3))
+    g3 = rng.normal(0, 1, size=(tracks, 3))
+    vdir = g3/numpy.linalg.norm(g3, axis=1).reshape(-1,1)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t0 = (p0 - pt) / vdir # may have zeros
+        t1 = (p1 - pt) / vdir # may have zeros
+    itrack = numpy.arange(tracks)
+    a0 = numpy.argmin(numpy.abs(t0), axis=1)
+    a1 = numpy.argmin(numpy.abs(t1), axis=1)
+
+    # points on either side bb walls
+    pmin = pt + t0[itrack, a0].reshape(-1,1) * vdir
+    pmax = pt + t1[itrack, a1].reshape(-1,1) * vdir
+
+    pdist = numpy.linalg.norm(pmax - pmin, axis=1)
+    nsteps = numpy.asarray(numpy.round(pdist / step_size), dtype=int)
+
+    if isinstance(time, (int, float)):
+        time0 = numpy.full(tracks, float(time))
+    elif len(time) == 1:
+        time0 = numpy.full(tracks, float(time[0]))
+    else:
+        time0 = rng.uniform(time[0], time[1], size=tracks)
+    timef = time0 + nsteps*step_size/track_speed
+
+    tinfos = numpy.zeros(tracks, dtype=track_info_types)
+    tinfos["pmin"] = pmin
+    tinfos["pmax"] = pmax
+    tinfos["tmin"] = time0
+    tinfos["tmax"] = timef
+    tinfos["step"] = step_size
+    tinfos["eper"] = eperstep
+
+    # expand tracks to their points
+    npts = nsteps + 1
+    ntot = int(npts.sum())
+    first = numpy.cumsum(npts) - npts
+    owner = numpy.repeat(itrack, npts)
+    istep = numpy.arange(ntot) - first[owner]
+    frac = istep / numpy.maximum(nsteps, 1)[owner]
+    pts = pmin[owner] + frac.reshape(-1,1) * (pmax - pmin)[owner]
+    times = time0[owner] + istep*step_size/track_speed
+
+    datas = numpy.zeros((ntot, 7))
+    datas[:,0] = times
+    # in terms of charge, negative is expected
+    datas[:,1] = -eperstep
+    datas[:,2:5] = pts
+    infos = numpy.zeros((ntot, 4))
+    infos[:,0] = numpy.arange(ntot)
+
+    timeorder = numpy.argsort(datas[:,0], kind='stable')
+    datas = datas[timeorder]
+    infos = infos[timeorder]
+
+    return (numpy.array(datas, dtype='float32'),
+            numpy.array(infos, dtype='int32'),
+            tinfos)
+
+
+def iter_lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed,
+               rng=None, workers=0):
+    '''
+    Generate sets of tracks as in lines(), yielding the tuple of
+    (depo_data, depo_info, track_info) arrays for each set in turn.
+
+    Each set draws from its own generator seeded from rng so results
+    do not depend on workers, the number of processes to use.
+    '''
+    seeds = spawn_seeds(rng, sets)
+    yield from generate(line_set, seeds, tracks, p0, p1, time, eperstep,
+                        step_size, track_speed, workers=workers)
+
+
+def lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed, rng=None):
     '''
     Generate sets of tracks.
 
@@ -24,144 +161,160 @@ def lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed):
     Each line is made of individual points separated by step_size.
     eperstep gives number of electrons (postive number) per point.
     The track_speed determines point separation in time.
-    '''
-
-    bb = list(zip(p0, p1))
-    pmid = 0.5 * (p0 + p1)
 
+    Random numbers are drawn from rng as described in make_rng().
+    All sets are returned in one dict, see iter_lines() to generate
+    one set at a time.
+    '''
     print(f"depo time: {time}")
 
     collect = dict()
-    for iset in range(sets):
-        last_id = 0
-
-        datas = list()
-        infos = list()
-        tinfos = numpy.zeros(tracks, dtype=track_info_types)
-        for itrack in range(tracks):
-
-            pt = numpy.array([uniform(a,b) for a,b in bb])
-            g3 = numpy.array([gauss(0, 1) for i in range(3)])
-            mag = math.sqrt(numpy.dot(g3,g3))
-            vdir = g3/mag
-            
-            t0 = (p0 - pt ) / vdir # may have zeros
-            t1 = (p1 - pt ) / vdir # may have zeros
-            
-            a0 = numpy.argmin(numpy.abs(t0))
-            a1 = numpy.argmin(numpy.abs(t1))
-
-            # points on either side bb walls
-            pmin = pt + t0[a0] * vdir
-            pmax = pt + t1[a1] * vdir
-
-            dp = pmax - pmin
-            pdist = math.sqrt(numpy.dot(dp, dp))
-            nsteps = int(round(pdist / step_size))
-
-            pts = numpy.linspace(pmin,pmax, nsteps+1, endpoint=True)
-            
-            if isinstance(time, int) or isinstance(time, float):
-                time0 = time
-            elif len(time) == 1:
-                time0 = time[0]
-            else:
-                time0 = uniform(time[0], time[1])
-
-            timef = time0 + nsteps*step_size/track_speed
-            times = numpy.linspace(time0, timef, nsteps+1, endpoint=True)
-
-            dt = timef-time0
-            #print(f'nsteps:{nsteps}, pdist:{pdist/units.mm:.1f} mm, dt={dt/units.ns:.1f} ns, {eperstep}')
-
-            tinfos["pmin"][itrack] = pmin
-            tinfos["pmax"][itrack] = pmax
-            tinfos["tmin"][itrack] = time0
-            tinfos["tmax"][itrack] = timef         
-            tinfos["step"][itrack] = step_size
-            tinfos["eper"][itrack] = eperstep
-
-            # in terms of charge, negative is expected
-            charges = numpy.zeros(nsteps+1) + -eperstep
-
-            zeros = numpy.zeros(nsteps+1)
-
-            data = numpy.vstack([
-                times,
-                charges,
-                pts.T,
-                zeros,
-                zeros])
-
-            ids = numpy.arange(last_id, last_id + nsteps + 1)
-            last_id = ids[-1]
-
-            info = numpy.vstack([
-                ids,
-                zeros,
-                zeros,
-                zeros])
-
-            datas.append(data)
-            infos.append(info)
-
-        datas = numpy.vstack([d.T for d in datas])
-        infos = numpy.vstack([i.T for i in infos])
-
-        # datas is now as (n,7)
-
-        timeorder = numpy.argsort(datas[:,0])
-        datas = datas[timeorder]
-        infos = infos[timeorder]
-
-        collect[f'depo_data_{iset}'] = numpy.array(datas, dtype='float32')
-        collect[f'depo_info_{iset}'] = numpy.array(infos, dtype='int32')
+    gen = iter_lines(tracks, sets, p0, p1, time, eperstep, step_size, track_speed, rng)
+    for iset, (datas, infos, tinfos) in enumerate(gen):
+        collect[f'depo_data_{iset}'] = datas
+        collect[f'depo_info_{iset}'] = infos
         collect[f'track_info_{iset}'] = tinfos
 
     return collect
 
+def pattern_depos(points, eperstep, time=0.0):
+    '''
+    Return (data, info) arrays for depos at the (npts, 3) points each
+    with eperstep electrons.
+    '''
+    npoints = len(points)
+    data = numpy.zeros((npoints, 7), dtype="float32")
+    data[:,0] = time
+    data[:,1] = -eperstep
+    data[:,2:5] = points
+    info = numpy.zeros((npoints, 4), dtype="int32")
+    info[:,0] = numpy.arange(npoints)
+    return data, info
+
+
+# The pattern registry.  Each maps a name to a function taking
+# (npoints, origin, rng, **params) and returning (npoints, 3) points.
+patterns = dict()
+
+def pattern(name):
+    '''
+    A decorator registering a function in patterns under name.
+    '''
+    def register(func):
+        patterns[name] = func
+        return func
+    return register
+
+
+def isotropic(npoints, rng):
+    '''
+    Return (npoints, 3) unit vectors with isotropic directions.
+    '''
+    g3 = rng.normal(0, 1, size=(npoints, 3))
+    return g3/numpy.linalg.norm(g3, axis=1).reshape(-1,1)
+
+
+def orthonormal(axis):
+    '''
+    Return two unit vectors perpendicular to axis and to each other.
+    '''
+    axis = numpy.asarray(axis, dtype=float)
+    axis = axis/numpy.linalg.norm(axis)
+    other = numpy.eye(3)[numpy.argmin(numpy.abs(axis))]
+    one = numpy.cross(axis, other)
+    one /= numpy.linalg.norm(one)
+    return one, numpy.cross(axis, one)
+
+
+@pattern("shell")
+def shell_points(npoints, origin, rng, radius=100*units.cm, **kwds):
+    '''
+    Points uniform on a spherical shell.
+    '''
+    return origin + radius*isotropic(npoints, rng)
+
+
+@pattern("ball")
+def ball_points(npoints, origin, rng, radius=100*units.cm, **kwds):
+    '''
+    Points uniform inside a sphere.
+    '''
+    rad = radius*numpy.cbrt(rng.uniform(0, 1, size=(npoints, 1)))
+    return origin + rad*isotropic(npoints, rng)
+
+
+@pattern("cylinder")
+def cylinder_points(npoints, origin, rng, radius=100*units.cm, length=100*units.cm,
+                    axis=(0,0,1), **kwds):
+    '''
+    Points uniform inside a cylinder centered on origin along axis.
+    '''
+    axis = numpy.asarray(axis, dtype=float)
+    axis = axis/numpy.linalg.norm(axis)
+    one, two = orthonormal(axis)
+    rad = radius*numpy.sqrt(rng.uniform(0, 1, size=(npoints, 1)))
+    phi = rng.uniform(0, 2*math.pi, size=(npoints, 1))
+    hgt = rng.uniform(-0.5*length, 0.5*length, size=(npoints, 1))
+    return origin + rad*(numpy.cos(phi)*one + numpy.sin(phi)*two) + hgt*axis
+
+
+@pattern("sheet")
+def sheet_points(npoints, origin, rng, radius=100*units.cm, axis=(0,0,1), **kwds):
+    '''
+    Points uniform on a square of half-width radius centered on origin
+    with normal along axis.
+    '''
+    one, two = orthonormal(axis)
+    uv = rng.uniform(-radius, radius, size=(npoints, 2))
+    return origin + uv[:,:1]*one + uv[:,1:]*two
+
+
+@pattern("point")
+def point_points(npoints, origin, rng, radius=100*units.cm, **kwds):
+    '''
+    Points along isotropic rays out to radius from a point source at
+    origin.
+    '''
+    rad = rng.uniform(0, radius, size=(npoints, 1))
+    return origin + rad*isotropic(npoints, rng)
+
+
+def default_npoints(radius, step_size):
+    '''
+    Return number of points for a pattern of radius at step_size.
+    '''
+    return int(0.3*(radius/step_size)**2)
+
+
+def pattern_set(name, npoints, origin, eperstep=5000, rng=None, **params):
+    '''
+    Return (data, info) arrays for npoints depos in the named pattern.
+
+    The params are passed to the pattern function, see patterns.
+    '''
+    try:
+        func = patterns[name]
+    except KeyError:
+        raise ValueError(f'unknown depo pattern: {name}') from None
+    points = func(npoints, numpy.asarray(origin, dtype=float), make_rng(rng), **params)
+    return pattern_depos(points, eperstep)
+
+
 def sphere(origin, p0, p1,
            radius=100*units.cm,
-           eperstep=5000, step_size=1*units.mm):
+           eperstep=5000, step_size=1*units.mm, rng=None, npoints=None):
     '''
     Generate artificial spherical shell patterns of depos.
 
-    The origin, p0 and p1 are 3-arrays.
-    '''
-
-    bb = list(zip(p0, p1))
-    pmid = 0.5 * (p0 + p1)
-
-    npoints = int(0.3*(radius/step_size)**2)
-
-    #print(f'generating {npoints} points on sphere of radius {radius}mm')
-    pts = list()
-    for ipt in range(npoints):
-        pt = numpy.array([uniform(a,b) for a,b in bb])
-        g3 = numpy.array([gauss(0, 1) for i in range(3)])
-        mag = math.sqrt(numpy.dot(g3,g3))
-        vdir = g3/mag
-        pts.append(origin + vdir * radius)
-    zeros = numpy.zeros(npoints)
-    charges = numpy.zeros(npoints) - eperstep
-    points = numpy.vstack(pts)
-    data = numpy.array( numpy.vstack([
-        zeros,
-        charges,
-        points.T,
-        zeros,
-        zeros]).T, dtype="float32")
-    info = numpy.array( numpy.vstack([
-        numpy.arange(0, npoints),
-        zeros,
-        zeros,
-        zeros]).T, dtype="int32")
+    The origin, p0 and p1 are 3-arrays.  The number of depos defaults
+    to default_npoints().
+    '''
+    if npoints is None:
+        npoints = default_npoints(radius, step_size)
+    data, info = pattern_set("shell", npoints, origin, eperstep, rng, radius=radius)
 
     # must send out in shape (npts, 7) and (npts, 4)
     assert (data.shape[1] == 7)
     assert (info.shape[1] == 4)
-    assert (info[0][3] == 0)
 
     return dict(depo_data_0=data, depo_info_0=info)
-
-        
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+'''
+Spatial and temporal index over a set of depos.
+
+Depos are binned on a uniform 3D grid of cells with the rows of each
+cell held contiguously and, separately, ordered by time.  Queries
+visit only the cells or the time range they need before a final exact
+selection and return sorted row indices into the original depos.
+'''
+
+import numpy
+
+
+def positions(depos):
+    '''
+    Return (N,3) xyz and (N,) t arrays from depos given as a dict of
+    columns (as from depos.load()) or as a (N,7) tqxyzLT array.
+    '''
+    if isinstance(depos, dict):
+        xyz = numpy.vstack([depos[c] for c in "xyz"]).T
+        return xyz, numpy.asarray(depos["t"])
+    depos = numpy.asarray(depos)
+    return depos[:,2:5], depos[:,0]
+
+
+def ranges_rows(starts, stops):
+    '''
+    Return the concatenation of arange(start, stop) for each pair.
+    '''
+    lengths = stops - starts
+    total = int(lengths.sum())
+    offsets = numpy.cumsum(lengths) - lengths
+    return numpy.repeat(starts - offsets, lengths) + numpy.arange(total)
+
+
+class DepoIndex(object):
+    '''
+    Index depos for box, slab, sphere and time window queries.
+
+    The cell size defaults to give about per_cell depos per occupied
+    cell of the bounding box, sized over only those axes along which
+    the depos extend so that planar and linear sets stay compact.  At
+    most max_cells cells are made along each axis and only occupied
+    cells are stored.
+    '''
+
+    def __init__(self, depos, cell=None, per_cell=8, max_cells=1<<16):
+        self.xyz, self.t = positions(depos)
+        self.xyz = numpy.asarray(self.xyz, dtype=float)
+        self.t = numpy.asarray(self.t, dtype=float)
+        ndepos = len(self.t)
+
+        if ndepos:
+            self.lo = self.xyz.min(axis=0)
+            span = self.xyz.max(axis=0) - self.lo
+        else:
+            self.lo = numpy.zeros(3)
+            span = numpy.zeros(3)
+        extended = span > 1e-9*max(span.max(), 1e-300)
+        if cell is None:
+            if numpy.any(extended):
+                ndim = int(numpy.sum(extended))
+                vol = numpy.prod(span[extended])
+                cell = (vol * per_cell / max(ndepos, 1))**(1.0/ndim)
+            else:
+                cell = 1.0
+            # a degenerate axis gets one cell
+            cell = numpy.where(extended, cell, numpy.maximum(span, cell))
+        cell = numpy.broadcast_to(numpy.asarray(cell, dtype=float), (3,))
+        self.cell = numpy.maximum(numpy.maximum(cell, span / max_cells), 1e-9)
+        self.shape = tuple(int(n) + 1 for n in numpy.minimum(span // self.cell, max_cells - 1))
+
+        ijk = self.cell_ijk(self.xyz)
+        cid = numpy.ravel_multi_index(ijk.T, self.shape) if ndepos else numpy.zeros(0, dtype=int)
+        self.order = numpy.argsort(cid, kind='stable')
+        # the occupied cells, their indices and the ranges of their rows in order
+        self.cells, counts = numpy.unique(cid, return_counts=True)
+        self.cells_ijk = numpy.array(numpy.unravel_index(self.cells, self.shape)).T.reshape(-1, 3)
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+
+        self.torder = numpy.argsort(self.t, kind='stable')
+        self.tsorted = self.t[self.torder]
+
+    def __len__(self):
+        return len(self.t)
+
+    def cell_ijk(self, xyz):
+        '''
+        Return (N,3) cell indices of points, clipped to the grid.
+        '''
+        ijk = numpy.floor((numpy.asarray(xyz) - self.lo) / self.cell).astype(int)
+        return numpy.clip(ijk, 0, numpy.array(self.shape) - 1)
+
+    def box_candidates(self, pmin, pmax):
+        '''
+        Return rows of depos in cells overlapping the box.
+        '''
+        pmin = numpy.asarray(pmin, dtype=float)
+        pmax = numpy.asarray(pmax, dtype=float)
+        hi = self.lo + self.cell*numpy.array(self.shape)
+        if len(self) == 0 or numpy.any(pmax < self.lo) or numpy.any(pmin > hi):
+            return numpy.zeros(0, dtype=int)
+        imin = self.cell_ijk(numpy.maximum(pmin, self.lo))
+        imax = self.cell_ijk(numpy.minimum(pmax, hi))
+        if numpy.prod(imax - imin + 1) > len(self.cells):
+            # fewer occupied cells than cells in the box
+            inbox = numpy.all((self.cells_ijk >= imin) & (self.cells_ijk <= imax), axis=1)
+            inds = numpy.nonzero(inbox)[0]
+        else:
+            axes = [numpy.arange(a, b+1) for a, b in zip(imin, imax)]
+            grid = numpy.meshgrid(*axes, indexing='ij')
+            cids = numpy.ravel_multi_index([g.ravel() for g in grid], self.shape)
+            inds = numpy.searchsorted(self.cells, cids)
+            found = inds < len(self.cells)
+            inds, cids = inds[found], cids[found]
+            inds = inds[self.cells[inds] == cids]
+        return self.order[ranges_rows(self.offsets[inds], self.offsets[inds+1])]
+
+    def box(self, pmin, pmax):
+        '''
+        Return sorted rows of depos with pmin <= xyz <= pmax.
+        '''
+        rows = self.box_candidates(pmin, pmax)
+        xyz = self.xyz[rows]
+        keep = numpy.all((xyz >= pmin) & (xyz <= pmax), axis=1)
+        return numpy.sort(rows[keep])
+
+    def slab(self, axis, lo, hi):
+        '''
+        Return sorted rows of depos with lo <= coordinate <= hi along
+        axis (0, 1, 2 or "x", "y", "z").
+        '''
+        if isinstance(axis, str):
+            axis = "xyz".index(axis)
+        pmin = numpy.full(3, -numpy.inf)
+        pmax = numpy.full(3, numpy.inf)
+        pmin[axis] = lo
+        pmax[axis] = hi
+        return self.box(pmin, pmax)
+
+    def sphere(self, center, radius):
+        '''
+        Return sorted rows of depos within radius of center.
+        '''
+        center = numpy.asarray(center, dtype=float)
+        rows = self.box_candidates(center - radius, center + radius)
+        dist2 = numpy.sum((self.xyz[rows] - center)**2, axis=1)
+        return numpy.sort(rows[dist2 <= radius*radius])
+
+    def time(self, tmin, tmax):
+        '''
+        Return sorted rows of depos with tmin <= t <= tmax.
+        '''
+        beg = numpy.searchsorted(self.tsorted, tmin, side='left')
+        end = numpy.searchsorted(self.tsorted, tmax, side='right')
+        return numpy.sort(self.torder[beg:end])
+
+    def within(self, rows, tmin=-numpy.inf, tmax=numpy.inf):
+        '''
+        Return those of rows in the time window.
+        '''
+        t = self.t[rows]
+        return rows[(t >= tmin) & (t <= tmax)]
@@ -2,12 +2,14 @@
 
 from wirecell import units
 from wirecell.util import ario
+from wirecell.gen.depoindex import DepoIndex, positions
 
 import numpy
 import matplotlib.pyplot as plt
 
 import json
 import bz2
+from collections.abc import Mapping
 
 
 # the depo "data" arrays
@@ -57,6 +59,58 @@ def apply_units(depos, distance_unit, time_unit, energy_unit, step_unit=None, el
     return depos
 
 
+json_exts = (".json", ".json.bz2")
+
+
+def set_arrays(data, info=None, dtype='float32'):
+    '''
+    Return (data, info) as row-per-depo (N,7) arrays of dtype, float32
+    as written to archives, and int32 (N,4) arrays.  Either may be
+    given transposed as in some old files.  A missing info is made of
+    zeros.
+    '''
+    data = numpy.asarray(data)
+    if data.ndim == 2 and data.shape[0] == 7 and data.shape[1] != 7:
+        data = data.T
+    data = numpy.asarray(data, dtype=dtype).reshape(-1, 7)
+    if info is None:
+        info = numpy.zeros((len(data), 4), dtype='int32')
+    info = numpy.asarray(info)
+    if info.ndim == 2 and info.shape[0] == 4 and info.shape[1] != 4:
+        info = info.T
+    info = numpy.asarray(info, dtype='int32').reshape(-1, 4)
+    return data, info
+
+
+def set_indices(fp):
+    '''
+    Return sorted indices of the depo sets in an ario mapping.
+    '''
+    return sorted(int(key[len('depo_data_'):]) for key in fp
+                  if key.startswith('depo_data_'))
+
+
+def iter_sets(depofile, jpath="depos", dtype='float32'):
+    '''
+    Yield (index, data, info) for each depo set in the file.
+
+    See set_arrays() for the arrays and dtype.  An archive file holds sets as
+    depo_data_N and depo_info_N arrays and each is read as it is
+    yielded.  A JSON file holds one set of depo objects at jpath.
+    '''
+    if depofile.endswith(json_exts):
+        fopen = bz2.open if depofile.endswith(".bz2") else open
+        with fopen(depofile, 'rt') as fp:
+            jlist = json.load(fp)[jpath]
+        data = numpy.array([[d.get(c, 0.0) for c in columns] for d in jlist])
+        yield (0,) + set_arrays(data, dtype=dtype)
+        return
+
+    fp = ario.load(depofile)
+    for index in set_indices(fp):
+        yield (index,) + set_arrays(fp[f'depo_data_{index}'], fp.get(f'depo_info_{index}'), dtype)
+
+
 def load(depofile, index=0, generation=0):
     '''
     Return depos of index and generation in file.
@@ -67,27 +121,109 @@ def load(depofile, index=0, generation=0):
     Generation 0 is the "youngest" and it's "prior" depos, if they
     exist, have generation=1, etc.
     '''
-    fp = ario.load(depofile)
-    dat = fp[f'depo_data_{index}']
-    nfo = fp[f'depo_info_{index}']
-
-    if dat.shape[0] == 7:
-        dat = dat.T
-    if nfo.shape[0] == 4:
-        nfo = nfo.T
+    if depofile.endswith(json_exts):
+        _, dat, nfo = next(iter_sets(depofile))
+    else:
+        fp = ario.load(depofile)
+        dat, nfo = set_arrays(fp[f'depo_data_{index}'], fp[f'depo_info_{index}'])
 
     indices = nfo[:,2] == generation
     return todict(dat[indices,:])
 
 
-def dump(output_file, depos, jpath="depos"):
+class DepoArchive(Mapping):
     '''
-    Save a deposition array to JSON file 
+    Index of every (set, generation) of depos in a file.
+
+    The file is read once.  The rows of each set are stably sorted by
+    generation so the depos of any (set, generation) are a contiguous
+    row range.  Mapping keys are (index, generation) pairs and values
+    are dictionaries as from load() but holding views of the sorted
+    arrays which must not be modified in place.
     '''
-    jlist = list()
-    for depo in depos:
-        jdepo = {c:v for c,v in zip(columns, depo)}
-        jlist.append(jdepo)
+    def __init__(self, depofile, jpath="depos"):
+        self.data = dict()
+        self.info = dict()
+        self.ranges = dict()
+        for index, data, info in iter_sets(depofile, jpath):
+            order = numpy.argsort(info[:,2], kind='stable')
+            self.data[index] = data[order]
+            self.info[index] = info[order]
+            gens, starts = numpy.unique(self.info[index][:,2], return_index=True)
+            stops = numpy.append(starts[1:], len(order))
+            for gen, start, stop in zip(gens.tolist(), starts.tolist(), stops.tolist()):
+                self.ranges[(index, gen)] = (start, stop)
+
+    @property
+    def indices(self):
+        '''
+        The sorted set indices.
+        '''
+        return sorted(self.data)
+
+    def generations(self, index):
+        '''
+        Return sorted generations in the set of index.
+        '''
+        return sorted(gen for ind, gen in self.ranges if ind == index)
+
+    def arrays(self, index, generation=0):
+        '''
+        Return (data, info) array views for the set and generation.
+        '''
+        start, stop = self.ranges[(index, generation)]
+        return self.data[index][start:stop], self.info[index][start:stop]
+
+    def __getitem__(self, key):
+        return todict(self.arrays(*key)[0])
+
+    def __iter__(self):
+        return iter(sorted(self.ranges))
+
+    def __len__(self):
+        return len(self.ranges)
+
+
+def write_sets(output_file, sets, compression=None):
+    '''
+    Write depo sets to an archive file in binary form.
+
+    Each of sets is a data array, a (data, info) pair or an (index,
+    data, info) triple as from iter_sets().  Sets are written as
+    depo_data_N and depo_info_N arrays as they are taken so memory
+    holds only one.  The compression applies to each array, see
+    ario.Writer.
+    '''
+    with ario.Writer(output_file, compression) as out:
+        for count, one in enumerate(sets):
+            if isinstance(one, numpy.ndarray):
+                one = (one,)
+            if len(one) == 3:
+                index, data, info = one
+            else:
+                index = count
+                data, info = (tuple(one) + (None,))[:2]
+            data, info = set_arrays(data, info)
+            out.add(f'depo_data_{index}', data)
+            out.add(f'depo_info_{index}', info)
+
+
+def dump(output_file, depos, jpath="depos", info=None, compression=None):
+    '''
+    Save a deposition array to file.
+
+    A .json or .json.bz2 file receives one object per depo under
+    jpath.  Any other file is taken as an archive (.npz, .tar, etc)
+    which receives the depos and their info (zeros if not given) as
+    set 0 in binary form, see write_sets().
+    '''
+    if not output_file.endswith(json_exts):
+        write_sets(output_file, [(depos, info)], compression)
+        return
+
+    # keep full precision, float32 is only for the binary form
+    depos, _ = set_arrays(depos, dtype='float64')
+    jlist = [dict(zip(columns, depo)) for depo in depos.tolist()]
     out = {jpath: jlist}
 
     # indent for readability.  If bz2 is used, there is essentially no change
@@ -98,36 +234,79 @@ def dump(output_file, depos, jpath="depos"):
     if output_file.endswith(".json"):
         fopen = open
     elif output_file.endswith(".json.bz2"):
-        fopen = bz2.BZ2File
+        fopen = bz2.open
     else:
-        raise IOError('Unknown file extension: "%s"' % filename)
-    with fopen(output_file, 'w') as fp:
+        raise IOError('Unknown file extension: "%s"' % output_file)
+    with fopen(output_file, 'wt') as fp:
         fp.write(text)
     return
     
 
 
 
-def move(depos, offset):
+def region(depos, box=None, trange=None, index=None):
+    '''
+    Return sorted rows of depos inside a box given as (pmin, pmax)
+    and a time range given as (tmin, tmax).
+
+    Either may be None to not restrict.  A DepoIndex of the depos may
+    be given to reuse, else one is built.
+    '''
+    if index is None:
+        index = DepoIndex(depos)
+    if box is None:
+        if trange is None:
+            return numpy.arange(len(index))
+        return index.time(*trange)
+    rows = index.box(*box)
+    if trange is not None:
+        rows = index.within(rows, *trange)
+    return rows
+
+
+def select(depos, rows):
+    '''
+    Return depos restricted to the given rows.
+
+    Depos may be a dict of columns as from todict() or a 2D array.
+    Rows are typically the result of a DepoIndex query.
     '''
-    Return new set of depos all moved by given vector offset.
+    if isinstance(depos, dict):
+        return {key: numpy.asarray(val)[rows] for key, val in depos.items()}
+    return numpy.asarray(depos)[rows]
+
+
+def move(depos, offset, rows=None):
+    '''
+    Return new set of depos moved by given vector offset.
+
+    Depos may be a dict of columns or a tqxyzLT array.  If rows is
+    given, only those depos are moved.
     '''
     offset = numpy.asarray(offset)
-    depos = numpy.copy(depos)
-    depos[:,0:3] += offset
+    rows = slice(None) if rows is None else rows
+    if isinstance(depos, dict):
+        depos = {key: numpy.array(val) for key, val in depos.items()}
+        for ind, letter in enumerate("xyz"):
+            depos[letter][rows] += offset[ind]
+        return depos
+    depos = numpy.array(depos)
+    depos[rows, 2:5] += offset
     return depos
             
 
-def center(depos, point):
+def center(depos, point, rows=None):
     '''
-    Shift depositions so that they are centered on the given point
+    Shift depositions so that they are centered on the given point.
+
+    If rows is given, the center is that of only those depos though
+    all are shifted.
     '''
     point = numpy.asarray(point)
-    tot = numpy.asarray([0.0, 0.0, 0.0])
-    for depo in depos:
-        tot += depo[:3]
-    n = len(depos)
-    offset = point - tot/n
+    xyz, _ = positions(depos)
+    if rows is not None:
+        xyz = xyz[rows]
+    offset = point - numpy.mean(xyz, axis=0)
     return move(depos, offset)
 
 
@@ -0,0 +1,75 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell import units
+from wirecell.gen import depogen
+
+
+def test_lines():
+    p0 = numpy.array([0, 0, 0])
+    p1 = numpy.array([100, 200, 300])*units.mm
+    step = 1*units.mm
+    speed = 300*units.mm/units.us
+    got = depogen.lines(50, 2, p0, p1, [0, 10*units.us], 5000, step, speed,
+                        numpy.random.default_rng(1))
+    assert sorted(got) == sorted(f'{k}_{i}' for k in ('depo_data', 'depo_info', 'track_info')
+                                 for i in range(2))
+
+    data = got['depo_data_0']
+    info = got['depo_info_0']
+    tinfo = got['track_info_0']
+    assert data.dtype == numpy.float32 and data.shape[1] == 7
+    assert info.dtype == numpy.int32 and info.shape[1] == 4
+    assert numpy.all(numpy.diff(data[:,0]) >= 0)
+    assert numpy.all(data[:,1] == -5000)
+    assert len(set(info[:,0])) == len(info)
+
+    nsteps = numpy.round(numpy.linalg.norm(tinfo['pmax'] - tinfo['pmin'], axis=1)/step)
+    assert len(data) == int(numpy.sum(nsteps + 1))
+
+    # each track starts at pmin at tmin
+    for one in tinfo:
+        hit = numpy.all(numpy.isclose(data[:,2:5], one['pmin'], atol=1e-3), axis=1)
+        assert numpy.any(hit)
+        assert numpy.isclose(data[hit][0, 0], one['tmin'], rtol=1e-5)
+
+    again = depogen.lines(50, 2, p0, p1, [0, 10*units.us], 5000, step, speed,
+                          numpy.random.default_rng(1))
+    assert numpy.array_equal(again['depo_data_1'], got['depo_data_1'])
+
+
+def test_iter_lines():
+    p0 = numpy.array([0, 0, 0])
+    p1 = numpy.array([50, 50, 50])*units.mm
+    args = (20, 4, p0, p1, [0.0], 5000, 1*units.mm, 300*units.mm/units.us)
+    serial = list(depogen.iter_lines(*args, rng=42))
+    parallel = list(depogen.iter_lines(*args, rng=42, workers=2))
+    assert len(serial) == 4
+    for one, two in zip(serial, parallel):
+        for a, b in zip(one, two):
+            assert numpy.array_equal(a, b)
+    assert not numpy.array_equal(serial[0][0], serial[1][0])
+
+
+def test_patterns():
+    origin = numpy.array([10.0, 20.0, 30.0])
+    radius = 50*units.mm
+    for name in ("shell", "ball", "cylinder", "sheet", "point"):
+        data, info = depogen.pattern_set(name, 1000, origin, 5000, 1, radius=radius,
+                                         length=40*units.mm, axis=(0, 1, 0))
+        assert data.shape == (1000, 7) and info.shape == (1000, 4)
+        assert numpy.all(data[:,1] == -5000)
+        rel = data[:,2:5] - origin
+        dist = numpy.linalg.norm(rel, axis=1)
+        if name == "shell":
+            assert numpy.allclose(dist, radius, rtol=1e-5)
+        elif name in ("ball", "point"):
+            assert numpy.all(dist <= radius*1.00001)
+        elif name == "cylinder":
+            assert numpy.all(numpy.abs(rel[:,1]) <= 20*units.mm*1.00001)
+            assert numpy.all(numpy.hypot(rel[:,0], rel[:,2]) <= radius*1.00001)
+        elif name == "sheet":
+            assert numpy.allclose(rel[:,1], 0, atol=1e-4)
+
+    got = depogen.sphere(origin, None, None, radius=radius, step_size=1*units.mm, rng=3)
+    assert len(got['depo_data_0']) == depogen.default_npoints(radius, 1*units.mm)
@@ -0,0 +1,76 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.gen import depos
+from wirecell.gen.depoindex import DepoIndex
+
+
+def make_depos(ndepos=5000):
+    rng = numpy.random.default_rng(2)
+    data = numpy.zeros((ndepos, 7))
+    data[:,0] = rng.uniform(0, 1000, ndepos)
+    data[:,1] = rng.uniform(1, 10, ndepos)
+    data[:,2:5] = rng.normal(scale=[100, 50, 10], size=(ndepos, 3))
+    return data
+
+
+def test_queries():
+    data = make_depos()
+    xyz, t = data[:,2:5], data[:,0]
+    for index in (DepoIndex(data), DepoIndex(depos.todict(data), cell=7.0)):
+        pmin, pmax = numpy.array([-50, -20, -100]), numpy.array([30, 60, 5])
+        want = numpy.nonzero(numpy.all((xyz >= pmin) & (xyz <= pmax), axis=1))[0]
+        assert numpy.array_equal(index.box(pmin, pmax), want)
+
+        want = numpy.nonzero((xyz[:,1] >= -10) & (xyz[:,1] <= 10))[0]
+        assert numpy.array_equal(index.slab("y", -10, 10), want)
+
+        cen = numpy.array([10, -5, 2])
+        want = numpy.nonzero(numpy.sum((xyz - cen)**2, axis=1) <= 40**2)[0]
+        assert numpy.array_equal(index.sphere(cen, 40), want)
+
+        want = numpy.nonzero((t >= 100) & (t <= 250))[0]
+        assert numpy.array_equal(index.time(100, 250), want)
+
+        assert len(index.box([1e4]*3, [2e4]*3)) == 0
+
+
+def check_brute(data, index):
+    xyz = data[:,2:5]
+    lo, hi = xyz.min(axis=0), xyz.max(axis=0)
+    pmin, pmax = lo + 0.2*(hi - lo), lo + 0.6*(hi - lo)
+    want = numpy.nonzero(numpy.all((xyz >= pmin) & (xyz <= pmax), axis=1))[0]
+    assert numpy.array_equal(index.box(pmin, pmax), want)
+    cen = 0.5*(lo + hi)
+    rad = 0.3*numpy.max(hi - lo)
+    want = numpy.nonzero(numpy.sum((xyz - cen)**2, axis=1) <= rad**2)[0]
+    assert numpy.array_equal(index.sphere(cen, rad), want)
+
+
+def test_degenerate():
+    from wirecell.gen.depogen import pattern_set
+    sheet, _ = pattern_set("sheet", 20000, [0, 0, 0], rng=numpy.random.default_rng(4))
+    index = DepoIndex(sheet)
+    assert len(index.cells) <= len(sheet)
+    check_brute(sheet, index)
+
+    line = numpy.zeros((10000, 7))
+    line[:,2] = numpy.linspace(0, 1000, 10000)
+    index = DepoIndex(line)
+    assert index.shape[1:] == (1, 1)
+    check_brute(line, index)
+
+    point = numpy.zeros((100, 7))
+    assert len(DepoIndex(point).box([-1]*3, [1]*3)) == 100
+
+
+def test_move_center():
+    data = make_depos(100)
+    rows = depos.region(data, trange=(0, 500))
+    moved = depos.move(data, [1, 2, 3], rows)
+    assert numpy.allclose(moved[rows, 2:5] - data[rows, 2:5], [1, 2, 3])
+    assert numpy.array_equal(numpy.delete(moved, rows, 0), numpy.delete(data, rows, 0))
+
+    cent = depos.center(depos.todict(data), [5, 6, 7], rows)
+    sel = depos.select(cent, rows)
+    assert numpy.allclose([sel[c].mean() for c in "xyz"], [5, 6, 7])
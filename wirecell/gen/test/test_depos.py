@@ -0,0 +1,68 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.gen import depos
+
+
+def make_sets(nsets=3, ndepos=100):
+    rng = numpy.random.default_rng(1)
+    ret = list()
+    for iset in range(nsets):
+        data = rng.normal(size=(ndepos, 7)).astype('float32')
+        info = numpy.zeros((ndepos, 4), dtype='int32')
+        info[:,0] = numpy.arange(ndepos)
+        info[:,2] = numpy.arange(ndepos) % 2
+        ret.append((data, info))
+    return ret
+
+
+def test_binary(tmp_path):
+    sets = make_sets()
+    path = str(tmp_path / "depos.tar")
+    depos.write_sets(path, iter(sets), compression="gz")
+    got = list(depos.iter_sets(path))
+    assert [one[0] for one in got] == [0, 1, 2]
+    for (_, data, info), (wdata, winfo) in zip(got, sets):
+        assert numpy.array_equal(data, wdata)
+        assert numpy.array_equal(info, winfo)
+
+    gen1 = depos.load(path, 2, 1)
+    assert numpy.array_equal(gen1['t'], sets[2][0][1::2, 0])
+
+
+def test_json(tmp_path):
+    data, info = make_sets(1)[0]
+    path = str(tmp_path / "depos.json.bz2")
+    depos.dump(path, data)
+    _, got, ginfo = next(depos.iter_sets(path))
+    assert numpy.array_equal(got, data)
+    assert not numpy.any(ginfo)
+
+    npz = str(tmp_path / "depos.npz")
+    depos.dump(npz, data.T, info=info)
+    assert numpy.array_equal(depos.load(npz)['x'], data[info[:,2] == 0, 2])
+
+    # JSON keeps full precision
+    import json
+    fine = data.astype('float64') + 1e-9
+    jpath = str(tmp_path / "fine.json")
+    depos.dump(jpath, fine)
+    jlist = json.load(open(jpath))["depos"]
+    assert numpy.array_equal([[d[c] for c in depos.columns] for d in jlist], fine)
+
+
+def test_archive(tmp_path):
+    sets = make_sets()
+    path = str(tmp_path / "depos.npz")
+    depos.write_sets(path, sets)
+    arc = depos.DepoArchive(path)
+    assert list(arc) == [(i, g) for i in range(3) for g in (0, 1)]
+    assert arc.indices == [0, 1, 2]
+    assert arc.generations(1) == [0, 1]
+    for (index, gen), got in arc.items():
+        want = depos.load(path, index, gen)
+        for key in depos.columns:
+            assert numpy.array_equal(got[key], want[key])
+    data, info = arc.arrays(2, 1)
+    assert numpy.all(info[:,2] == 1)
+    assert numpy.shares_memory(data, arc.data[2])
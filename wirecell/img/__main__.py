@@ -64,6 +64,7 @@ def plot_blobs(ctx, speed, t0, plot, cluster_file, plot_file):
         fig.savefig(pname)
         click.echo(pname)
 
+    # networkx, node lookups per neighbor rebuild dicts on a TypedGraph
     for n, gr in enumerate(tap.load(cluster_file)):
         do_one(gr, n)
 
@@ -87,7 +88,7 @@ def inspect(ctx, cluster_file):
     elif '.tar' in path.name:
         print ('TAR file assuming from ClusterFileSink')
 
-    graphs = list(tap.load(str(path)))
+    graphs = list(tap.load(str(path), typed=True))
     print (f'number of graphs: {len(graphs)}')
     for ig, gr in enumerate(graphs):
         cm = clusters.ClusterMap(gr)
@@ -98,20 +99,40 @@ def inspect(ctx, cluster_file):
             print(f'\t{code}: {count} nodes')
 
             if code == 'b':
-                q = sum([n['value'] for c,n in gr.nodes(data=True) if n['code'] == code])
+                q = sum([cm.value(n, 'value') for n in cm.nodes_oftype(code)])
                 print(f'\t\ttotal charge: {q}')
                 continue
 
             if code == 's':
                 q=0
                 for snode in cm.nodes_oftype('s'):
-                    sdat = cm.gr.nodes[snode]
-                    sig = sdat['signal']
+                    sig = cm.value(snode, 'signal')
                     q += sum([v['val'] for v in sig.values()])
                 print(f'\t\ttotal charge: {q}')
                 continue
         
 
+@cli.command("convert-clusters")
+@click.option("-c", "--compression", default=None,
+              type=click.Choice(["gz", "bz2", "xz", "zst"]),
+              help="Compress each array of the output archive")
+@click.argument("input-file")
+@click.argument("output-file")
+def convert_clusters(compression, input_file, output_file):
+    '''
+    Convert a cluster file of JSON graphs to an archive of arrays.
+
+    The output (.npz, .tar, etc) is read by the other commands much
+    faster than JSON.
+    '''
+    from . import tap
+    try:
+        count = tap.save_arrays(output_file, tap.load_json(input_file), compression)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+    click.echo(f'{output_file}: {count} graphs')
+
+
 @cli.command("paraview-blobs")
 @click.option("--speed", default="1.6*mm/us",
               help="Drift speed (with units)")
@@ -124,10 +145,10 @@ def paraview_blobs(ctx, speed, t0, cluster_file, paraview_file):
     '''
     Convert a cluster file to a ParaView .vtu files of blobs
 
-    Speed and t0 converts time to relative drift coordinate.
+    Speed and t0 converts time to relative drift coordinate.  The file
+    is written with numpy alone, tvtk is not required.
     '''
     from . import converter, tap
-    from tvtk.api import write_data
 
     if not paraview_file.endswith(".vtu"):
         print ("warning: blobs are written as UnstructuredGrid and paraview expects a .vtu extension")
@@ -141,14 +162,13 @@ def paraview_blobs(ctx, speed, t0, cluster_file, paraview_file):
         if 0 == gr.number_of_nodes():
             click.echo("no verticies in %s" % cluster_file)
             return
-        dat = converter.clusters2blobs(gr)
         fname = paraview_file
         if '%' in paraview_file:
             fname = paraview_file%n
-        write_data(dat, fname)
+        converter.write_blobs(gr, fname)
         click.echo(fname)
 
-    for n, gr in enumerate(tap.load(cluster_file)):
+    for n, gr in enumerate(tap.load(cluster_file, typed=True)):
         do_one(gr, n)
 
     return
@@ -190,6 +210,7 @@ def paraview_activity(ctx, speed, t0, cluster_file, paraview_file):
             write_data(dat, pname)
             click.echo(pname)
 
+    # networkx, node lookups per neighbor rebuild dicts on a TypedGraph
     for n, gr in enumerate(tap.load(cluster_file)):
         do_one(gr, n)
 
@@ -285,6 +306,7 @@ def bee_blobs(output, geom, rse, sampling, speed, t0, density, cluster_files):
     )[sampling];
 
     for ctf in cluster_files:
+        # networkx until blobpoints() uses typed columns
         gr = list(tap.load(ctf))[0] # fixme: for now ignore subsequent graphs
         gr = converter.undrift(gr, speed, t0)
         print ("got %d" % gr.number_of_nodes())
@@ -326,28 +348,30 @@ def divine_planes(nch):
               help="Drift speed (with units)")
 @click.option("--t0", default="0*ns",
               help="Absolute time of first tick (with units)")
+@click.option("--sparse/--dense", default=False,
+              help="Keep only filled bins until plotting, for large detectors")
 @click.argument("cluster-file")
-def activity(output, slices, slice_line, speed, t0, cluster_file):
+def activity(output, slices, slice_line, speed, t0, sparse, cluster_file):
     '''
     Plot activity
     '''
     from matplotlib.colors import LogNorm
-    from . import tap, clusters, plots
+    from . import tap, clusters, plots, converter
 
     speed = unitify(speed)
     t0 = unitify(t0)
 
-    gr = list(tap.load(cluster_file))[0]
+    gr = list(tap.load(cluster_file, typed=True))[0]
     gr = converter.undrift(gr, speed, t0)
     cm = clusters.ClusterMap(gr)
-    ahist = plots.activity(cm)
-    arr = ahist.arr
-    print(f'channel x slice array shape: {arr.shape}')
+    ahist = plots.activity(cm, sparse)
+    print(f'channel x slice array shape: {(ahist.ny, ahist.nx)}')
     extent = list()
     if slices:
-        arr = arr[:,slices[0]:slices[1]]
+        arr = ahist.dense(slice(*slices))
         extent = [slices[0], slices[1]]
     else:
+        arr = ahist.dense()
         extent = [0, arr.shape[1]]
     extent += [ahist.rangey[1], ahist.rangey[0]]
 
@@ -398,20 +422,22 @@ def activity(output, slices, slice_line, speed, t0, cluster_file):
               help="Absolute time of first tick (with units)")
 @click.option('--found/--missed', default=True,
               help="Mask what blobs found or missed")
+@click.option("--sparse/--dense", default=False,
+              help="Keep only filled bins until plotting, for large detectors")
 @click.argument("cluster-file")
-def blob_activity_mask(output, slices, slice_line, speed, t0, found, cluster_file):
+def blob_activity_mask(output, slices, slice_line, speed, t0, found, sparse, cluster_file):
     '''
     Plot blobs as maskes on channel activity.
     '''
-    from . import tap, clusters, plots
+    from . import tap, clusters, plots, converter
 
     speed = unitify(speed)
     t0 = unitify(t0)
 
-    gr = list(tap.load(cluster_file))[0] # fixme
+    gr = list(tap.load(cluster_file, typed=True))[0] # fixme
     gr = converter.undrift(gr, speed, t0)
     cm = clusters.ClusterMap(gr)
-    ahist = plots.activity(cm)
+    ahist = plots.activity(cm, sparse)
     bhist = ahist.like()
     plots.blobs(cm, bhist)
     if found:
@@ -422,12 +448,12 @@ def blob_activity_mask(output, slices, slice_line, speed, t0, found, cluster_fil
         title="missed mask"
     extent = list()
     if slices:
-        a = ahist.arr[:,slices[0]:slices[1]]
-        b = bhist.arr[:,slices[0]:slices[1]]
+        a = ahist.dense(slice(*slices))
+        b = bhist.dense(slice(*slices))
         extent = [slices[0], slices[1]]
     else:
-        a = ahist.arr
-        b = bhist.arr
+        a = ahist.dense()
+        b = bhist.dense()
         extent = [0, a.shape[1]]
     extent += [ahist.rangey[1], ahist.rangey[0]]
 
@@ -453,10 +479,10 @@ def wire_slice_activity(output, sliceid, speed, t0, cluster_file):
     '''
     Plot the activity in one slice as wires and blobs
     '''
-    from . import tap, clusters, plots
+    from . import tap, clusters, plots, converter
     speed = unitify(speed)
     t0 = unitify(t0)
-    gr = next(tap.load(cluster_file))
+    gr = next(tap.load(cluster_file, typed=True))
     gr = converter.undrift(gr, speed, t0)
     cm = clusters.ClusterMap(gr)
     fig, axes = plots.wire_blob_slice(cm, sliceid)
@@ -6,6 +6,9 @@ A cluster graph is a networkx graph with nodes holding a letter "type
 code" (c,w,b,s,m) and a code-dependent data structure
 '''
 
+import numpy
+from collections import defaultdict
+
 def match_dict(have, want):
     '''
     return True if all keys of want are in have and all their values are equal.
@@ -17,30 +20,119 @@ def match_dict(have, want):
             return False
     return True
 
+class ColumnIndex(object):
+    '''
+    Look up nodes by the values of one or more attribute columns.
+
+    Rows are lexically sorted by the columns so a lookup is a binary
+    search in each column in turn.
+    '''
+
+    def __init__(self, nodes, *cols):
+        cols = [numpy.asarray(col) for col in cols]
+        order = numpy.lexsort(cols[::-1]) if len(nodes) else numpy.zeros(0, dtype=int)
+        self.nodes = numpy.asarray(nodes)[order]
+        self.cols = [col[order] for col in cols]
+
+    def lookup(self, *vals):
+        '''
+        Return array of nodes with the values in their original order.
+        '''
+        lo, hi = 0, len(self.nodes)
+        try:
+            for col, val in zip(self.cols, vals):
+                seg = col[lo:hi]
+                lo, hi = (lo + int(numpy.searchsorted(seg, val, 'left')),
+                          lo + int(numpy.searchsorted(seg, val, 'right')))
+        except (TypeError, ValueError):
+            return self.nodes[:0]
+        return self.nodes[lo:hi]
+
+
 class ClusterMap(object):
     '''
     Add some indexing and lookups to meta data on cluster graph vertices
+
+    The graph may be a networkx graph or a TypedGraph.  Nodes are
+    indexed by type and by the values of the indexed_keys attributes,
+    with numpy indices over the columns of a TypedGraph.  Neighbors by
+    type are indexed on first use.
     '''
 
+    # node attributes indexed for find()
+    indexed_keys = ("ident", "sliceid", "wpid")
+
     def __init__(self, gr):
         self.gr = gr
+        self.typed = hasattr(gr, "nodes_oftype")
         self._id2ch = dict()
         self._pi2ch = dict()
         self._cs2wire = dict()
         self._wip2wire = dict()
         self._wid2wire = dict()
+        self._bytype = defaultdict(list)
+        self._byvalue = {key: defaultdict(list) for key in self.indexed_keys}
+        self._nbrs = None
+
+        if self.typed:
+            self._index_typed()
+            return
 
         for node, data in gr.nodes.data():
-            if data['code'] == 'c':
+            code = data['code']
+            self._bytype[code].append(node)
+            for key in self.indexed_keys:
+                val = data.get(key)
+                if val is not None:
+                    self._byvalue[key][val].append(node)
+
+            if code == 'c':
                 self._id2ch[data['ident']] = node
                 self._pi2ch[(data['wpid'], data['index'])] = node;
                 continue;
-            if data['code'] == 'w':
+            if code == 'w':
                 self._cs2wire[(data['chid'], data['seg'])] = node
                 self._wip2wire[(data['wpid'], data['index'])] = node;
                 self._wid2wire[(data['wpid'], data['ident'])] = node;
                 continue
 
+    def _index_typed(self):
+        '''
+        Build ColumnIndex lookups over the columns of a TypedGraph in
+        place of the dicts used for networkx.
+        '''
+        gr = self.gr
+        # per indexed key, a list of per type indices
+        self._byvalue = {key: list() for key in self.indexed_keys}
+        for code, form in gr.schema.items():
+            nodes = gr.nodes_oftype(code)
+            for key in self.indexed_keys:
+                if key in form:
+                    self._byvalue[key].append((code, ColumnIndex(nodes, gr.column(code, key))))
+
+        def index(code, *keys):
+            if code not in gr.schema:
+                return ColumnIndex([], *[[]]*len(keys))
+            return ColumnIndex(gr.nodes_oftype(code), *[gr.column(code, key) for key in keys])
+
+        self._id2ch = index('c', 'ident')
+        self._pi2ch = index('c', 'wpid', 'index')
+        self._cs2wire = index('w', 'chid', 'seg')
+        self._wip2wire = index('w', 'wpid', 'index')
+        self._wid2wire = index('w', 'wpid', 'ident')
+
+    def _lookup(self, table, key):
+        '''
+        Return the node for a key of one of the lookup tables.
+        '''
+        if not self.typed:
+            return table[key]
+        found = table.lookup(*(key if type(key) == tuple else (key,)))
+        if not len(found):
+            raise KeyError(key)
+        # the last, as a dict keeps the last one set
+        return int(found[-1])
+
     def channel(self, key):
         '''
         Return a channel node by a key.  If key is scalar it is a
@@ -48,55 +140,89 @@ class ClusterMap(object):
         index).
         '''
         if type(key) == tuple:
-            return self._pi2ch[key];
-        return self._id2ch[key];
+            return self._lookup(self._pi2ch, key)
+        return self._lookup(self._id2ch, key)
         
     def wire_chanseg(self, chan, seg):
         '''
         Return a wire node by its channel and segment
         '''
-        return self._cs2wire[(chan,seg)]
+        return self._lookup(self._cs2wire, (chan,seg))
     
     def wire_wip(self, wpid, wip):
         '''
         Return a wire node by its wire-in-plane number in the given wire-plane ID
         '''
-        return self._wip2wire[(wpid, wip)];
+        return self._lookup(self._wip2wire, (wpid, wip))
 
     def wire_wid(self, wpid, wid):
         '''
         Return a wire node by its wire-ident and wire-plane ID.
         '''
-        return self._wid2wire[(wpid, wip)];
+        return self._lookup(self._wid2wire, (wpid, wid))
 
+    def code(self, node):
+        '''
+        Return the type code of a node.
+        '''
+        if self.typed:
+            return self.gr.code(node)
+        return self.gr.nodes[node]['code']
+
+    def value(self, node, key, default=None):
+        '''
+        Return the value of one attribute of a node or default.
+        '''
+        if self.typed:
+            return self.gr.row_attribute(self.gr.row(node), key, default)
+        return self.gr.nodes[node].get(key, default)
 
     def find(self, typecode=None, **kwds):
         '''
         Return nodes with data matching kwds.  If typecode is given,
         only consider nodes of that type.
         '''
-        ret = list()
-        for node,data in self.gr.nodes.data():
-            if typecode and self.gr.nodes[node]['code'] != typecode:
-                continue;
-            if not match_dict(data,kwds):
-                continue
-            ret.append(node)
-        return ret
+        indexed = [key for key in self.indexed_keys if key in kwds]
+        if indexed:
+            key = indexed[0]
+            if self.typed:
+                nodes = [node for code, idx in self._byvalue[key]
+                         if not typecode or code == typecode
+                         for node in idx.lookup(kwds[key]).tolist()]
+            else:
+                nodes = self._byvalue[key].get(kwds[key], [])
+                if typecode:
+                    nodes = [node for node in nodes if self.code(node) == typecode]
+        elif typecode:
+            nodes = self.nodes_oftype(typecode)
+        else:
+            nodes = list(self.gr.nodes)
 
+        rest = {key: val for key, val in kwds.items() if key not in indexed[:1]}
+        if not rest:
+            return list(nodes)
+        missing = object()
+        return [node for node in nodes
+                if all(self.value(node, key, missing) == val for key, val in rest.items())]
 
     def nodes_oftype(self, typecode):
         '''
         Return a list of nodes of given type code
         '''
-        return [n for n,d in self.gr.nodes.data() if d['code'] == typecode]
+        if self.typed:
+            return self.gr.nodes_oftype(typecode).tolist()
+        return list(self._bytype.get(typecode, []))
 
     def neighbors_oftype(self, node, typecode):
         '''
         Return all connected nodes of the given node and given type.
         '''
-        ret = list()
-        for nn in self.gr[node]:
-            if self.gr.nodes[nn]['code'] == typecode:
-                ret.append(nn)
-        return ret
+        if self.typed:
+            return self.gr.neighbors_oftype(node, typecode)
+        if self._nbrs is None:
+            self._nbrs = defaultdict(list)
+            codes = dict(self.gr.nodes(data='code'))
+            for one in self.gr:
+                for nn in self.gr[one]:
+                    self._nbrs[(one, codes[nn])].append(nn)
+        return list(self._nbrs.get((node, typecode), []))
@@ -28,6 +28,14 @@ def undrift(grs, speed=1.6*units.mm/units.us, t0=0):
 
     ret = list()
     for gr in grs:
+        if hasattr(gr, "set_column"): # a TypedGraph
+            if len(gr.nodes_oftype('b')):
+                corners = numpy.array(gr.column('b', 'corners'), dtype=float)
+                corners[:,0] = speed*(corners[:,0] + t0)
+                gr.set_column('b', 'corners', corners)
+                gr.set_column('b', 'span', speed*numpy.asarray(gr.column('b', 'span')))
+            ret.append(gr)
+            continue
         for node, ndata in gr.nodes.data():
             if ndata['code'] != 'b':
                 continue;
@@ -119,55 +127,162 @@ def depos2pts(depos):
 
 
 
+def blob_arrays(gr):
+    '''
+    Return (corners, counts, spans, values) of the blobs of a graph.
+
+    The corners of all blobs are concatenated in an (M,3) array with
+    counts giving the number of each blob.  Values is a dict of
+    arrays of the other scalar blob attributes.
+    '''
+    if hasattr(gr, "set_column"): # a TypedGraph
+        nblobs = len(gr.nodes_oftype('b'))
+        if not nblobs:
+            return numpy.zeros((0,3)), numpy.zeros(0, dtype=int), numpy.zeros(0), dict()
+        form = gr.schema['b']
+        values = {key: numpy.asarray(gr.column('b', key), dtype=float)
+                  for key in form if form[key]['form'] == "scalar" and key != 'span'}
+        if 'span' in form:
+            spans = numpy.asarray(gr.column('b', 'span'), dtype=float)
+        else:
+            spans = numpy.ones(nblobs)
+        return (numpy.asarray(gr.column('b', 'corners'), dtype=float).reshape(-1, 3),
+                numpy.diff(gr.offsets_of('b', 'corners')), spans, values)
+
+    corners = list()
+    counts = list()
+    spans = list()
+    values = defaultdict(list)
+    bdats = [ndata for node, ndata in gr.nodes.data() if ndata['code'] == 'b']
+    for ind, ndata in enumerate(bdats):
+        corners += list(ndata['corners'])
+        counts.append(len(ndata['corners']))
+        spans.append(ndata.get('span', 1.0))
+        for key, val in ndata.items():
+            if key in ('corners', 'span', 'code') or not numpy.isscalar(val):
+                continue
+            values[key].append((ind, val))
+    vals = dict()
+    for key, ivs in values.items():
+        vals[key] = numpy.zeros(len(bdats))
+        for ind, val in ivs:
+            vals[key][ind] = val
+    return (numpy.array(corners, dtype=float).reshape(-1, 3),
+            numpy.array(counts, dtype=int), numpy.array(spans, dtype=float), vals)
+
+
+def order_rings(corners, counts):
+    '''
+    Return corners with those of each blob ordered by angle about
+    their center in the Y-Z plane, as orderpoints() for all blobs.
+    '''
+    corners = numpy.asarray(corners)
+    blob = numpy.repeat(numpy.arange(len(counts)), counts)
+    starts = numpy.cumsum(counts) - counts
+    center = numpy.add.reduceat(corners, starts, axis=0) / counts[:,None] \
+        if len(corners) else numpy.zeros((0,3))
+    rel = corners - center[blob]
+    ang = numpy.arctan2(rel[:,2], rel[:,1])
+    return corners[numpy.lexsort((ang, blob))]
+
+
+def blob_polyhedra(corners, counts, spans):
+    '''
+    Return VTK polyhedra of blobs with ordered corners extruded along
+    X by their spans, as extrude() does for each blob.
+
+    The result is a dict of arrays following the VTK XML unstructured
+    grid: points, connectivity, offsets, types, faces and
+    faceoffsets.
+    '''
+    from .vtu import VTK_POLYHEDRON
+    counts = numpy.asarray(counts, dtype='i8')
+    nblobs = len(counts)
+    blob = numpy.repeat(numpy.arange(nblobs), counts)
+    local = numpy.arange(len(blob)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    nper = counts[blob]
+
+    # each blob has a top ring then a bottom ring of points
+    pstart = numpy.repeat(2*(numpy.cumsum(counts) - counts), counts)
+    top = pstart + local
+    bot = top + nper
+    nxt = pstart + (local + 1) % nper
+    points = numpy.zeros((2*len(blob), 3))
+    points[top] = corners
+    points[bot] = corners
+    points[bot, 0] += numpy.asarray(spans)[blob]
+
+    # face stream: nfaces, top face, bottom face and one quad per side
+    slen = 7*counts + 3
+    send = numpy.cumsum(slen)
+    sstart = send - slen
+    faces = numpy.zeros(send[-1] if nblobs else 0, dtype='i8')
+    faces[sstart] = counts + 2
+    faces[sstart + 1] = counts
+    faces[sstart + 2 + counts] = counts
+    first = numpy.repeat(sstart, counts)
+    faces[first + 2 + local] = top
+    faces[first + 3 + nper + local] = bot
+    side = first + 3 + 2*nper + 5*local
+    faces[side] = 4
+    faces[side + 1] = top
+    faces[side + 2] = nxt
+    faces[side + 3] = nxt + nper
+    faces[side + 4] = bot
+
+    return dict(points=points,
+                connectivity=numpy.arange(len(points)),
+                offsets=numpy.cumsum(2*counts),
+                types=numpy.full(nblobs, VTK_POLYHEDRON, dtype='u1'),
+                faces=faces, faceoffsets=send)
+
+
+def blob_grid(gr):
+    '''
+    Return (polyhedra, values) for the blobs of a graph, see
+    blob_polyhedra() and blob_arrays().
+    '''
+    corners, counts, spans, values = blob_arrays(gr)
+    polys = blob_polyhedra(order_rings(corners, counts), counts, spans)
+    return polys, values
+
+
+def write_blobs(gr, filename):
+    '''
+    Write the blobs of a graph to a .vtu file without tvtk.
+    '''
+    from . import vtu
+    polys, values = blob_grid(gr)
+    cell_data = dict(indices=numpy.arange(len(polys['types'])))
+    for key in sorted(values):
+        cell_data[key] = values[key]
+    vtu.write(filename, cell_data=cell_data, scalars="indices", **polys)
+
+
 def clusters2blobs(gr):
     '''
     Given a graph object return a tvtk data object with blbos.
     '''
     from tvtk.api import tvtk
 
-    all_points = list()
-    blob_cells = list()
-    datasetnames = set()
-    values = list()
-    for node, ndata in gr.nodes.data():
-        if ndata['code'] != 'b':
-            continue;
-        vals = dict();
-        thickness = 1.0
-        for key,val in ndata.items():
-            if key == 'corners':
-                pts = orderpoints(val)
-                continue
-            if key == 'span':
-                thickness = val
-                continue
-            if key == 'code':
-                continue
-            datasetnames.add(key)
-            vals[key] = val;
-        pts,cells = extrude(pts, thickness)
-        all_points += pts
-        blob_cells.append((len(pts), cells))
-        values.append(vals)
-
-    ugrid = tvtk.UnstructuredGrid(points = all_points);
+    # the face stream of each blob, see blob_polyhedra()
+    polys, values = blob_grid(gr)
+    faces = polys['faces'].tolist()
+    faceoffsets = polys['faceoffsets'].tolist()
+
+    ugrid = tvtk.UnstructuredGrid(points = polys['points']);
     ptype = tvtk.Polyhedron().cell_type
-    offset = 0
-    for npts,cells in blob_cells:
-        cell_ids = [len(cells)]
-        for cell in cells:
-            cell_ids.append(len(cell))
-            cell_ids += [offset+cid for cid in cell]
-        ugrid.insert_next_cell(ptype, cell_ids)
-        offset += npts
-
-    ugrid.cell_data.scalars = list(range(len(values)))
+    start = 0
+    for end in faceoffsets:
+        ugrid.insert_next_cell(ptype, faces[start:end])
+        start = end
+
+    ugrid.cell_data.scalars = list(range(len(faceoffsets)))
     ugrid.cell_data.scalars.name = "indices"
     
     narrays = 1
-    for datasetname in sorted(datasetnames):
-        arr = numpy.asarray([vals.get(datasetname, 0.0) for vals in values], dtype=float)
-        ugrid.cell_data.add_array(arr)
+    for datasetname in sorted(values):
+        ugrid.cell_data.add_array(values[datasetname])
         ugrid.cell_data.get_array(narrays).name = datasetname
         narrays += 1
 
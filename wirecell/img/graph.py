@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+'''
+A compact typed graph for cluster graphs.
+
+A TypedGraph holds a cluster graph in the array form of tap: per-type
+numpy attribute columns and CSR adjacency.  It answers the queries the
+img modules make of a networkx graph (gr.nodes[n], gr.nodes.data(),
+gr[n], etc) by building node attribute dicts only on demand and adds
+typed queries (nodes_oftype(), neighbors_oftype(), column()) which
+return arrays without building dicts at all.
+'''
+
+import numpy
+from . import tap
+
+
+class NodeView(object):
+    '''
+    A minimal networkx-like view of the nodes of a TypedGraph.
+    '''
+
+    def __init__(self, gr):
+        self.gr = gr
+
+    def __getitem__(self, node):
+        return self.gr.node_data(node)
+
+    def __iter__(self):
+        return iter(self.gr.idents.tolist())
+
+    def __len__(self):
+        return len(self.gr.idents)
+
+    def __contains__(self, node):
+        return node in self.gr
+
+    def data(self, data=True, default=None):
+        '''
+        Yield (node, attributes) or with data a key, (node, value).
+        '''
+        gr = self.gr
+        if data == "code":
+            yield from zip(gr.idents.tolist(), (tap.typecodes[c] for c in gr.codes.tolist()))
+            return
+        for row, node in enumerate(gr.idents.tolist()):
+            if data is True:
+                yield node, gr.row_data(row)
+            else:
+                yield node, gr.row_attribute(row, data, default)
+
+    def __call__(self, data=False, default=None):
+        if data is False:
+            return iter(self)
+        return self.data(data, default)
+
+
+class TypedGraph(object):
+    '''
+    A cluster graph with per-type numpy columns and CSR adjacency.
+
+    Nodes are identified as in the networkx graph made by tap, by
+    their vertex identifiers.
+    '''
+
+    def __init__(self, arrs, name=""):
+        self.name = name
+        self.idents = numpy.asarray(arrs['nodes_ident'])
+        self.codes = numpy.asarray(arrs['nodes_code'])
+        self.offsets = numpy.asarray(arrs['edges_offsets'])
+        self.targets = numpy.asarray(arrs['edges_targets'])
+        self.schema = arrs[tap.schema_name]
+        # plain arrays, memory maps are slow to index element-wise
+        self.arrays = {key: numpy.asarray(val) for key, val in arrs.items() if key != tap.schema_name}
+
+        self._sorted = None
+        if not numpy.array_equal(self.idents, numpy.arange(len(self.idents))):
+            order = numpy.argsort(self.idents, kind='stable')
+            self._sorted = (order, self.idents[order])
+
+        # the row of each node among nodes of its type
+        self.typerows = numpy.zeros(len(self.idents), dtype='i8')
+        self.bytype = dict()
+        for icode, code in enumerate(tap.typecodes):
+            rows = numpy.nonzero(self.codes == icode)[0]
+            self.typerows[rows] = numpy.arange(len(rows))
+            self.bytype[code] = rows
+
+    @classmethod
+    def from_json(cls, dat, name=""):
+        '''
+        Return a TypedGraph from a cluster graph in JSON form.
+        '''
+        return cls(tap.json2arrays(dat), name)
+
+    def to_networkx(self):
+        '''
+        Return an equivalent networkx graph.
+        '''
+        return tap.make_nxgraph_arrays(self.name, self.arrays_dict())
+
+    def arrays_dict(self):
+        '''
+        Return the graph in the array form of tap.
+        '''
+        ret = dict(self.arrays)
+        ret[tap.schema_name] = self.schema
+        return ret
+
+    def rows(self, nodes):
+        '''
+        Return the rows of node identifiers.
+        '''
+        nodes = numpy.asarray(nodes)
+        if self._sorted is None:
+            rows = nodes
+            ok = (rows >= 0) & (rows < len(self.idents))
+        else:
+            order, sidents = self._sorted
+            pos = numpy.minimum(numpy.searchsorted(sidents, nodes), len(sidents) - 1)
+            rows = order[pos]
+            ok = sidents[pos] == nodes if len(sidents) else numpy.zeros(nodes.shape, bool)
+        if not numpy.all(ok):
+            raise KeyError(f'no such node: {nodes}')
+        return rows
+
+    def row(self, node):
+        return int(self.rows(node))
+
+    @property
+    def nodes(self):
+        return NodeView(self)
+
+    def number_of_nodes(self):
+        return len(self.idents)
+
+    def number_of_edges(self):
+        return len(self.targets) // 2
+
+    def __len__(self):
+        return len(self.idents)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node):
+        try:
+            self.rows(node)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def __getitem__(self, node):
+        return self.neighbors(node)
+
+    def code(self, node):
+        '''
+        Return the type code of a node.
+        '''
+        return tap.typecodes[self.codes[self.row(node)]]
+
+    def neighbor_rows(self, row):
+        return self.targets[self.offsets[row]:self.offsets[row+1]]
+
+    def neighbors(self, node):
+        '''
+        Return list of the nodes neighboring node.
+        '''
+        return self.idents[self.neighbor_rows(self.row(node))].tolist()
+
+    def neighbors_oftype(self, node, code):
+        '''
+        Return list of the nodes of type code neighboring node.
+        '''
+        nrows = self.neighbor_rows(self.row(node))
+        nrows = nrows[self.codes[nrows] == tap.typecodes.index(code)]
+        return self.idents[nrows].tolist()
+
+    def nodes_oftype(self, code):
+        '''
+        Return array of nodes of type code.
+        '''
+        return self.idents[self.bytype[code]]
+
+    def typed_edges(self, code1, code2):
+        '''
+        Return arrays of the column rows of nodes of type code1 and of
+        their neighbors of type code2, one pair per edge.
+        '''
+        rows = self.bytype[code1]
+        starts = self.offsets[rows]
+        lens = self.offsets[rows+1] - starts
+        src = numpy.repeat(rows, lens)
+        pos = numpy.repeat(starts - (numpy.cumsum(lens) - lens), lens) + numpy.arange(lens.sum())
+        dst = self.targets[pos]
+        keep = self.codes[dst] == tap.typecodes.index(code2)
+        return self.typerows[src[keep]], self.typerows[dst[keep]]
+
+    def column(self, code, key):
+        '''
+        Return the attribute column of nodes of type code.
+
+        Rows follow nodes_oftype(code).  Variable length attributes
+        are flattened, see offsets_of().
+        '''
+        return self.arrays[f'{code}_{key}']
+
+    def set_column(self, code, key, arr):
+        '''
+        Replace an existing attribute column with one of same length.
+        '''
+        name = f'{code}_{key}'
+        if len(arr) != len(self.arrays[name]):
+            raise ValueError(f'column {name} length mismatch: {len(arr)} != {len(self.arrays[name])}')
+        self.arrays[name] = arr
+
+    def offsets_of(self, code, key):
+        '''
+        Return offsets into column() of a variable length attribute.
+        '''
+        return self.arrays[f'{code}_{key}_offsets']
+
+    def row_attribute(self, row, key, default=None):
+        '''
+        Return one attribute value of the node at row or default.
+        '''
+        code = tap.typecodes[self.codes[row]]
+        if key == "code":
+            return code
+        form = self.schema.get(code, {}).get(key)
+        if form is None:
+            return default
+        trow = self.typerows[row]
+        col = self.column(code, key)
+        if form['form'] in ("scalar", "vector"):
+            return col[trow].tolist()
+        offs = self.offsets_of(code, key)
+        part = col[offs[trow]:offs[trow+1]]
+        if form['form'] == "ragged":
+            return part.tolist()
+        return {str(int(one[0])): dict(zip(form['fields'], one[1:]))
+                for one in part.tolist()}
+
+    def attribute(self, node, key):
+        '''
+        Return one attribute value of a node.
+        '''
+        row = self.row(node)
+        if key != "code" and key not in self.schema.get(tap.typecodes[self.codes[row]], {}):
+            raise KeyError(f'node {node} has no attribute "{key}"')
+        return self.row_attribute(row, key)
+
+    def row_data(self, row):
+        '''
+        Return a new dict of all attributes of the node at row.
+        '''
+        code = tap.typecodes[self.codes[row]]
+        ret = {key: self.row_attribute(row, key) for key in self.schema.get(code, {})}
+        ret['code'] = code
+        return ret
+
+    def node_data(self, node):
+        '''
+        Return a new dict of all attributes of node.
+
+        Modifying the dict does not change the graph, see set_column().
+        '''
+        return self.row_data(self.row(node))
@@ -11,27 +11,89 @@ from wirecell.util.wires.schema import plane_face_apa;
 
 
 class Hist2D(object):
-    def __init__(self, nx, xmin, xmax, ny, ymin, ymax):
-        self.arr = numpy.zeros((ny, nx))
+    '''
+    A 2D histogram with (ny, nx) bins filled with scalars or arrays.
+
+    Values outside the range are clamped to the edge bins.  If sparse
+    is true, only the filled bins are stored and arr is made on
+    demand, see dense() and coo().
+    '''
+    def __init__(self, nx, xmin, xmax, ny, ymin, ymax, sparse=False):
         self.nx = nx
         self.rangex = (xmin, xmax)
         self.ny = ny
         self.rangey = (ymin, ymax)
+        self.sparse = sparse
+        if sparse:
+            self._bins = numpy.zeros(0, dtype='i8')
+            self._vals = numpy.zeros(0)
+            self._pending = list()
+        else:
+            self._arr = numpy.zeros((ny, nx))
+
+    def _bin(self, val, rng, num):
+        lo,hi = rng
+        rel = numpy.clip((numpy.asarray(val, dtype=float) - lo) / (hi-lo), 0.0, 1.0)
+        return numpy.minimum((rel * num).astype('i8'), num-1)
 
     def xbin(self, x):
-        xmin,xmax=self.rangex
-        xrel = max(0, min(1.0, (x - xmin) / (xmax-xmin)))
-        return int(xrel * self.nx);
+        return self._bin(x, self.rangex, self.nx)
 
     def ybin(self, y):
-        ymin,ymax=self.rangey
-        yrel = max(0, min(1.0, (y - ymin) / (ymax-ymin)))
-        return int(yrel * self.ny);
-
-    def fill(self, x, y, v):
-        xi = self.xbin(x)
-        yi = self.ybin(y)
-        self.arr[yi, xi] += v
+        return self._bin(y, self.rangey, self.ny)
+
+    def fill(self, x, y, v=1.0):
+        '''
+        Add v to the bins holding x and y, any may be arrays.
+        '''
+        x, y, v = numpy.broadcast_arrays(numpy.atleast_1d(x), numpy.atleast_1d(y),
+                                         numpy.atleast_1d(numpy.asarray(v, dtype=float)))
+        yb, xb = self.ybin(y.ravel()), self.xbin(x.ravel())
+        if self.sparse:
+            self._pending.append((yb*self.nx + xb, v.ravel()))
+            return
+        # in place, a full size bincount would allocate per call
+        numpy.add.at(self._arr, (yb, xb), v.ravel())
+
+    def coo(self):
+        '''
+        Return (ybins, xbins, values) arrays of the filled bins.
+        '''
+        if not self.sparse:
+            yi, xi = numpy.nonzero(self._arr)
+            return yi, xi, self._arr[yi, xi]
+        if self._pending:
+            bins = numpy.concatenate([self._bins] + [b for b,_ in self._pending])
+            vals = numpy.concatenate([self._vals] + [v for _,v in self._pending])
+            self._bins, inv = numpy.unique(bins, return_inverse=True)
+            self._vals = numpy.bincount(inv.ravel(), weights=vals, minlength=len(self._bins))
+            self._pending = list()
+        return self._bins // self.nx, self._bins % self.nx, self._vals
+
+    def dense(self, xbins=None):
+        '''
+        Return the dense (ny, nx) array or only the columns in the
+        given slice of x bins.
+        '''
+        xbins = xbins or slice(None)
+        if not self.sparse:
+            return self._arr[:, xbins]
+        start, stop, _ = xbins.indices(self.nx)
+        yi, xi, vals = self.coo()
+        sel = (xi >= start) & (xi < stop)
+        arr = numpy.zeros((self.ny, max(0, stop-start)))
+        arr[yi[sel], xi[sel]-start] = vals[sel]
+        return arr
+
+    @property
+    def arr(self):
+        return self.dense()
+
+    @arr.setter
+    def arr(self, arr):
+        if self.sparse:
+            raise ValueError("can not set array of sparse histogram")
+        self._arr = arr
 
     def extent(self):
         return (self.rangex[0], self.rangex[1],
@@ -41,36 +103,71 @@ class Hist2D(object):
 
     def like(self):
         return Hist2D(self.nx, self.rangex[0], self.rangex[1],
-                      self.ny, self.rangey[0], self.rangey[1])
+                      self.ny, self.rangey[0], self.rangey[1], self.sparse)
+
 
-def activity(cm):
+def slice_signals(cm):
     '''
-    Given a ClusterMap, return a figure showing activity
+    Given a ClusterMap, return flat (slice, channel, value) arrays
+    over all slice signals.
     '''
-    channels = set()
-    slices = set()
+    gr = cm.gr
+    if cm.typed:
+        if 's' not in gr.schema:
+            return numpy.zeros((3, 0))
+        col = gr.column('s', 'signal')
+        nper = numpy.diff(gr.offsets_of('s', 'signal'))
+        ival = 1 + gr.schema['s']['signal']['fields'].index('val')
+        sliceids = numpy.repeat(gr.column('s', 'ident'), nper)
+        return sliceids, col[:,0].astype(int), col[:,ival]
+
+    sliceids = list()
+    channels = list()
+    values = list()
     for snode in cm.nodes_oftype('s'):
-        sdat = cm.gr.nodes[snode]
-        for c in sdat['signal']:
-            channels.add(int(c))
-        slices.add(sdat['ident'])
-    
-    cmin = min(channels);
-    cmax = max(channels);
-    smin = min(slices);
-    smax = max(slices);
+        sig = cm.value(snode, 'signal')
+        sliceids += [cm.value(snode, 'ident')]*len(sig)
+        channels += map(int, sig)
+        values += [one['val'] for one in sig.values()]
+    return numpy.array(sliceids), numpy.array(channels, dtype=int), numpy.array(values, dtype=float)
+
+
+def blob_channels(cm):
+    '''
+    Given a ClusterMap, return flat (slice, channel) arrays with one
+    entry for each blob-wire edge.
+    '''
+    gr = cm.gr
+    if cm.typed:
+        if 'b' not in gr.schema or 'w' not in gr.schema:
+            return numpy.zeros((2, 0))
+        brows, wrows = gr.typed_edges('b', 'w')
+        return gr.column('b', 'sliceid')[brows], gr.column('w', 'chid')[wrows]
+
+    sliceids = list()
+    channels = list()
+    for bnode in cm.nodes_oftype('b'):
+        wnodes = cm.neighbors_oftype(bnode, 'w')
+        sliceids += [cm.value(bnode, 'sliceid')]*len(wnodes)
+        channels += [cm.value(wnode, 'chid') for wnode in wnodes]
+    return numpy.array(sliceids), numpy.array(channels)
+
+
+def activity(cm, sparse=False):
+    '''
+    Given a ClusterMap, return a histogram of the activity
+    '''
+    sliceids, channels, values = slice_signals(cm)
+
+    cmin = int(numpy.min(channels))
+    cmax = int(numpy.max(channels))
+    smin = int(numpy.min(sliceids))
+    smax = int(numpy.max(sliceids))
     print ("activity: c:[%d,%d], s:[%d,%d]" % (cmin, cmax, smin, smax))
     
     hist = Hist2D(smax-smin+1, smin, smax+1,
-                  cmax-cmin+1, cmin, cmax+1)
-    for snode in cm.nodes_oftype('s'):
-        sdat = cm.gr.nodes[snode]
-        si = sdat['ident']
-        for c,sig in sdat['signal'].items():
-            ci = int(c)
-            v = sig['val']
-            hist.fill(si+.1, ci+.1, v)
-
+                  cmax-cmin+1, cmin, cmax+1, sparse)
+    hist.fill(sliceids+.1, channels+.1, values)
     return hist
     # fig,ax = plt.subplots(nrows=1, ncols=1)
     # im = hist.imshow(ax)
@@ -78,14 +175,12 @@ def activity(cm):
     # return fig,ax,hist
 
 def blobs(cm, hist):
-    for bnode in cm.nodes_oftype('b'):
-        bdat = cm.gr.nodes[bnode]
-        for wnode in cm.gr[bnode]:
-            wdat = cm.gr.nodes[wnode]
-            if wdat['code'] != 'w':
-                continue;
-            
-            hist.fill(bdat['sliceid']+0.1, wdat['chid']+.1, 1)
+    '''
+    Given a ClusterMap, fill hist with the slice and channel of each
+    blob-wire edge.
+    '''
+    sliceids, channels = blob_channels(cm)
+    hist.fill(sliceids+0.1, channels+.1, 1)
     return hist
     # fig,ax = plt.subplots(nrows=1, ncols=1)
     # im = hist.imshow(ax)
@@ -121,16 +216,14 @@ def wire_blob_slice(cm, sliceid):
     snodes = cm.find('s', ident=sliceid)
     if len(snodes) != 1:
         print('slice IDs:')
-        print([cm.gr.nodes[s]['ident'] for s in cm.find('s')])
+        print([cm.value(s, 'ident') for s in cm.nodes_oftype('s')])
         raise ValueError(f'Unexpected number of slices with ID: {sliceid}, found {len(snodes)}')
     snode = snodes[0]
     by_face = defaultdict(list)
-    sdata = cm.gr.nodes[snode]
-    for cdat,sig in sdata["signal"].items():
+    for cdat,sig in cm.value(snode, "signal").items():
         chid = int(cdat)
         cval = sig['val']
         cnode = cm.channel(chid)
-        cdata = cm.gr.nodes[cnode]
         wnodes = cm.neighbors_oftype(cnode, 'w')
         if not wnodes:
             print("No wires for channel %d" % chid)
@@ -6,16 +6,42 @@ A cluster file is an archive (zip or tar, compressed or not) holding
 an ICluster graph as a JSON object or as a set of Numpy arrays.  As a
 special case, a bare .json file can be read for a single cluster
 graph.
+
+The Numpy form of one graph is a set of arrays with names sharing a
+prefix (eg "cluster_0_"):
+
+    - nodes_code :: int8 (N,) index into typecodes of each node type.
+
+    - nodes_ident :: int64 (N,) the vertex identifier of each node.
+
+    - edges_offsets, edges_targets :: CSR adjacency, the rows of the
+      nodes neighboring node i are edges_targets[edges_offsets[i]:edges_offsets[i+1]].
+
+    - <code>_<key> :: per-type attribute columns with rows in the
+      order of nodes of that type.  Scalar attributes are (Nc,), fixed
+      length lists are (Nc,k) and variable length lists (eg blob
+      corners) and mappings (eg slice signal as (channel, val, unc))
+      are flattened with a <code>_<key>_offsets array.
+
+    - schema :: a JSON object giving the form of each column.
 '''
 
 import json
+import numpy
 from pathlib import Path
 import networkx as nx
 from wirecell.util import ario
 
+# the node type codes in the order of their index in nodes_code.
+typecodes = "cwbsm"
+
+# the name of the member that marks an array graph
+schema_name = "schema"
+
+
 def make_nxgraph(name, dat):
     '''
-    Return networkx graph from dict base data 
+    Return networkx graph from dict base data
     '''
     gr = nx.Graph(name=name)
     for vtx in dat['vertices']:
@@ -24,28 +50,249 @@ def make_nxgraph(name, dat):
         gr.add_edge(*edge)
     return gr
 
-def load(filename):
+
+def csr(rows, cols, nrows):
+    '''
+    Return (offsets, targets) of the symmetric adjacency of edges
+    given as arrays of rows and cols.
+    '''
+    src = numpy.concatenate((rows, cols))
+    dst = numpy.concatenate((cols, rows))
+    order = numpy.argsort(src, kind='stable')
+    counts = numpy.bincount(src, minlength=nrows)
+    offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+    return offsets, dst[order]
+
+
+def _column_form(vals):
+    '''
+    Return the schema entry for a list of attribute values.
+
+    All values are checked.  Lists of differing length or holding
+    lists are "ragged".  A mix of lists, mappings and scalars is an
+    error.
+    '''
+    seqs = [isinstance(val, (list, tuple)) for val in vals]
+    maps = [isinstance(val, dict) for val in vals]
+    if all(maps):
+        fields = set()
+        for val in vals:
+            for one in val.values():
+                fields.update(one)
+        return dict(form="mapping", fields=sorted(fields))
+    if all(seqs):
+        lens = set(map(len, vals))
+        nested = any(isinstance(x, (list, tuple, dict)) for val in vals for x in val)
+        if len(lens) == 1 and not nested:
+            return dict(form="vector")
+        return dict(form="ragged")
+    if any(seqs) or any(maps):
+        raise ValueError('attribute mixes scalar, list and mapping values')
+    return dict(form="scalar")
+
+
+def json2arrays(dat):
+    '''
+    Return dict of arrays holding cluster graph dat in the JSON form.
+    '''
+    verts = dat['vertices']
+    idents = numpy.array([vtx['ident'] for vtx in verts], dtype='i8')
+    codes = numpy.array([typecodes.index(vtx['type']) for vtx in verts], dtype='i1')
+    ret = dict(nodes_code=codes, nodes_ident=idents)
+
+    row_of = {ident: row for row, ident in enumerate(idents.tolist())}
+    edges = numpy.array([(row_of[a], row_of[b]) for a, b in dat['edges']],
+                        dtype='i8').reshape(-1, 2)
+    ret['edges_offsets'], ret['edges_targets'] = csr(edges[:,0], edges[:,1], len(idents))
+
+    schema = dict()
+    for icode, code in enumerate(typecodes):
+        datas = [vtx['data'] for vtx in verts if vtx['type'] == code]
+        if not datas:
+            continue
+        keys = set(datas[0])
+        for one in datas:
+            if set(one) != keys:
+                raise ValueError(f'nodes of type "{code}" differ in attributes')
+        schema[code] = dict()
+        for key in sorted(keys):
+            vals = [one[key] for one in datas]
+            form = _column_form(vals)
+            schema[code][key] = form
+            name = f'{code}_{key}'
+            if form['form'] in ("scalar", "vector"):
+                ret[name] = numpy.array(vals)
+                continue
+            if form['form'] == "ragged":
+                ret[name] = numpy.array([x for val in vals for x in val])
+                lens = list(map(len, vals))
+            else:
+                fields = form['fields']
+                ret[name] = numpy.array([[float(k)] + [float(v.get(f, 0)) for f in fields]
+                                         for val in vals for k, v in val.items()]
+                                        ).reshape(-1, 1 + len(fields))
+                lens = list(map(len, vals))
+            ret[name + '_offsets'] = numpy.concatenate(([0], numpy.cumsum(lens))).astype('i8')
+    ret[schema_name] = schema
+    return ret
+
+
+def _column_values(arrs, name, form):
+    '''
+    Return list of per-node python values of one column.
+    '''
+    col = arrs[name]
+    if form['form'] in ("scalar", "vector"):
+        return col.tolist()
+    offsets = arrs[name + '_offsets'].tolist()
+    if form['form'] == "ragged":
+        rows = col.tolist()
+        return [rows[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+    fields = form['fields']
+    keys = [str(int(k)) for k in col[:,0]]
+    vals = [dict(zip(fields, row)) for row in col[:,1:].tolist()]
+    return [dict(zip(keys[a:b], vals[a:b])) for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def arrays2nodes(arrs):
+    '''
+    Return list of (ident, attributes) of the nodes of a cluster graph
+    in array form, ordered as in the arrays.
+    '''
+    codes = numpy.asarray(arrs['nodes_code'])
+    idents = numpy.asarray(arrs['nodes_ident'])
+    ret = [None]*len(idents)
+    for icode, code in enumerate(typecodes):
+        rows = numpy.nonzero(codes == icode)[0]
+        if not len(rows):
+            continue
+        form = arrs[schema_name].get(code, {})
+        keys = sorted(form)
+        cols = [_column_values(arrs, f'{code}_{key}', form[key]) for key in keys]
+        nodes = idents[rows].tolist()
+        for row, node, vals in zip(rows.tolist(), nodes, zip(*cols) if cols else [()]*len(rows)):
+            ret[row] = (node, dict(zip(keys, vals), code=code))
+    return ret
+
+
+def arrays2edges(arrs):
+    '''
+    Return (N,2) array of the node identifier pairs of each edge.
+    '''
+    idents = numpy.asarray(arrs['nodes_ident'])
+    offsets = numpy.asarray(arrs['edges_offsets'])
+    targets = numpy.asarray(arrs['edges_targets'])
+    src = numpy.repeat(numpy.arange(len(idents)), numpy.diff(offsets))
+    keep = src < targets
+    return numpy.vstack((idents[src[keep]], idents[targets[keep]])).T
+
+
+def make_nxgraph_arrays(name, arrs):
+    '''
+    Return networkx graph from cluster graph arrays.
+    '''
+    gr = nx.Graph(name=name)
+    gr.add_nodes_from(arrays2nodes(arrs))
+    gr.add_edges_from(arrays2edges(arrs).tolist())
+    return gr
+
+
+def array_prefixes(keys):
+    '''
+    Return the name prefixes of array graphs among archive keys.
+    '''
+    return [key[:-len(schema_name)] for key in keys if key.endswith(schema_name)]
+
+
+def _key_prefix(key, prefixes):
+    '''
+    Return the longest of prefixes ending at a "_" in key or None.
+    '''
+    cut = key.rfind("_")
+    while cut >= 0:
+        if key[:cut+1] in prefixes:
+            return key[:cut+1]
+        cut = key.rfind("_", 0, cut)
+    if "" in prefixes:
+        return ""
+    return None
+
+
+def load(filename, typed=False):
     '''
     Yield a sequence of graphs loaded from file like object.
+
+    Graphs are networkx graphs unless typed is true in which case they
+    are the more compact wirecell.img.graph.TypedGraph.
     '''
+    if typed:
+        from .graph import TypedGraph
+        make_json = lambda name, dat: TypedGraph.from_json(dat, name)
+        make_arrays = lambda name, arrs: TypedGraph(arrs, name)
+    else:
+        make_json = make_nxgraph
+        make_arrays = make_nxgraph_arrays
+
     path = Path(filename)
     if path.suffix in (".json",):
         dat = ario.transform(filename, open(filename).read())
         if not isinstance(dat, list):
             dat = [dat]
         for count, one in enumerate(dat):
-            yield make_nxgraph(f'{path.stem}_{count}', one)
+            yield make_json(f'{path.stem}_{count}', one)
         return
 
     arf = ario.load(filename, False)
+    groups = {prefix: dict() for prefix in array_prefixes(arf)}
+    owners = dict()
     for key in arf:
+        prefix = _key_prefix(key, groups)
+        if prefix is not None:
+            owners[key] = prefix
+            groups[prefix][key[len(prefix):]] = arf[key]
+
+    for key in arf:
+        prefix = owners.get(key)
+        if prefix is not None:
+            if key == prefix + schema_name:
+                yield make_arrays(prefix.rstrip("_"), groups[prefix])
+            continue
         member = arf.member_names[key]
         if '.json' in member:
             dat = arf[key]
             if not isinstance(dat, list):
                 dat = [dat]
             for count, one in enumerate(dat):
-                yield make_nxgraph(f'{path.stem}_{count}', one)
+                yield make_json(f'{path.stem}_{count}', one)
         else:
-            raise ValueError("Cluster graphs in Numpy format not yet supported")
+            raise ValueError(f'Unknown cluster file member: {member}')
+
+
+def load_json(filename):
+    '''
+    Yield cluster graphs in their JSON form from a JSON file or an
+    archive of JSON members.
+    '''
+    if Path(filename).suffix in (".json",):
+        dats = [ario.transform(filename, open(filename).read())]
+    else:
+        arf = ario.load(filename)
+        dats = [arf[key] for key in arf if '.json' in arf.member_names[key]]
+    for dat in dats:
+        if not isinstance(dat, list):
+            dat = [dat]
+        yield from dat
 
+
+def save_arrays(filename, dats, compression=None):
+    '''
+    Save cluster graphs given in JSON form to an archive in array form.
+
+    Return the number of graphs saved.
+    '''
+    count = 0
+    with ario.Writer(filename, compression) as out:
+        for count, dat in enumerate(dats, 1):
+            for name, arr in json2arrays(dat).items():
+                out.add(f'cluster_{count-1}_{name}', arr)
+    return count
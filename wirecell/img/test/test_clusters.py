@@ -0,0 +1,56 @@
+#!/usr/bin/env pytest
+
+from wirecell.img import tap, plots
+from wirecell.img.clusters import ClusterMap, match_dict
+from wirecell.img.graph import TypedGraph
+from wirecell.img.test.test_tap import make_graph
+
+
+def brute_find(gr, typecode=None, **kwds):
+    return [n for n, d in gr.nodes.data()
+            if (not typecode or d['code'] == typecode) and match_dict(d, kwds)]
+
+
+def test_indices():
+    dat = make_graph()
+    nx = tap.make_nxgraph("g", dat)
+    for gr in (nx, TypedGraph.from_json(dat)):
+        cm = ClusterMap(gr)
+        for code in tap.typecodes:
+            assert sorted(cm.nodes_oftype(code)) == sorted(brute_find(nx, code))
+        for query in [dict(typecode='s', ident=2), dict(ident=2), dict(typecode='w', wpid=1),
+                      dict(typecode='w', wpid=1, seg=0), dict(typecode='b', sliceid=3, faceid=0),
+                      dict(typecode='c', index=4), dict(typecode='m', wpid=0, value=1.0)]:
+            assert sorted(cm.find(**query)) == sorted(brute_find(nx, **query))
+        for node in nx:
+            for code in tap.typecodes:
+                want = [n for n in nx[node] if nx.nodes[n]['code'] == code]
+                assert sorted(cm.neighbors_oftype(node, code)) == sorted(want)
+        assert cm.value(cm.channel(101), 'index') == 1
+        assert cm.value(cm.wire_wid(2, 5), 'chid') == 102
+        # as networkx, the last of nodes sharing a key is found
+        nxcm = ClusterMap(nx)
+        for node, d in nx.nodes.data():
+            if d['code'] == 'c':
+                assert cm.channel(d['ident']) == nxcm.channel(d['ident'])
+                key = (d['wpid'], d['index'])
+                assert cm.channel(key) == nxcm.channel(key)
+            if d['code'] == 'w':
+                assert cm.wire_chanseg(d['chid'], d['seg']) == nxcm.wire_chanseg(d['chid'], d['seg'])
+                assert cm.wire_wip(d['wpid'], d['index']) == nxcm.wire_wip(d['wpid'], d['index'])
+                assert cm.wire_wid(d['wpid'], d['ident']) == nxcm.wire_wid(d['wpid'], d['ident'])
+        try:
+            cm.channel(-1)
+        except KeyError:
+            pass
+        else:
+            assert False, "expected KeyError"
+
+
+def test_hists():
+    dat = make_graph()
+    ahists = [plots.activity(ClusterMap(gr)) for gr in (tap.make_nxgraph("g", dat), TypedGraph.from_json(dat))]
+    assert (ahists[0].arr == ahists[1].arr).all()
+    bhists = [plots.blobs(ClusterMap(gr), ahists[0].like()) for gr in (tap.make_nxgraph("g", dat), TypedGraph.from_json(dat))]
+    assert (bhists[0].arr == bhists[1].arr).all()
+    assert bhists[0].arr.sum() > 0
@@ -0,0 +1,64 @@
+#!/usr/bin/env pytest
+
+import base64
+import numpy
+import xml.etree.ElementTree as ET
+from wirecell.img import tap, converter
+from wirecell.img.graph import TypedGraph
+from wirecell.img.test.test_tap import make_graph
+
+
+def old_blobs(gr):
+    'Return points and face streams as the per-blob code makes them'
+    points = list()
+    streams = list()
+    for node, ndata in gr.nodes.data():
+        if ndata['code'] != 'b':
+            continue
+        pts, cells = converter.extrude(converter.orderpoints(ndata['corners']), ndata['span'])
+        ids = [len(cells)]
+        for cell in cells:
+            ids.append(len(cell))
+            ids += [len(points) + cid for cid in cell]
+        points += pts
+        streams += ids
+    return numpy.array(points), numpy.array(streams)
+
+
+def read_vtu(filename):
+    'Return dict of the arrays in a .vtu file'
+    ret = dict()
+    for da in ET.parse(filename).getroot().iter('DataArray'):
+        raw = base64.b64decode(da.text)
+        dtype = dict(Int64='<i8', UInt8='u1', Float64='<f8')[da.get('type')]
+        ret[da.get('Name')] = numpy.frombuffer(raw[8:], dtype=dtype)
+    return ret
+
+
+def test_polyhedra(tmp_path):
+    dat = make_graph(nslices=10)
+    nx = tap.make_nxgraph("g", dat)
+    wpts, wfaces = old_blobs(nx)
+    for gr in (nx, TypedGraph.from_json(dat)):
+        polys, values = converter.blob_grid(gr)
+        assert numpy.allclose(polys['points'], wpts)
+        assert numpy.array_equal(polys['faces'], wfaces)
+        assert sorted(values) == ['error', 'faceid', 'ident', 'sliceid', 'start', 'value']
+
+    path = str(tmp_path / "blobs.vtu")
+    converter.write_blobs(nx, path)
+    got = read_vtu(path)
+    assert numpy.allclose(got['Points'].reshape(-1, 3), wpts)
+    assert numpy.array_equal(got['faces'], wfaces)
+    assert numpy.array_equal(got['faceoffsets'], polys['faceoffsets'])
+    assert numpy.array_equal(got['indices'], numpy.arange(10))
+
+
+def test_no_span():
+    dat = make_graph(nslices=3)
+    for vtx in dat['vertices']:
+        vtx['data'].pop('span', None)
+    for gr in (tap.make_nxgraph("g", dat), TypedGraph.from_json(dat)):
+        corners, counts, spans, values = converter.blob_arrays(gr)
+        assert numpy.array_equal(spans, numpy.ones(len(counts)))
+        assert 'span' not in values
@@ -0,0 +1,42 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.img import tap, converter
+from wirecell.img.graph import TypedGraph
+from wirecell.img.test.test_tap import make_graph
+
+
+def test_typed():
+    dat = make_graph()
+    # non-contiguous vertex identifiers
+    for vtx in dat['vertices']:
+        vtx['ident'] = 3*vtx['ident'] + 7
+    dat['edges'] = [(3*a + 7, 3*b + 7) for a, b in dat['edges']]
+
+    want = tap.make_nxgraph("g", dat)
+    got = TypedGraph.from_json(dat, "g")
+    assert got.number_of_nodes() == want.number_of_nodes()
+    assert got.number_of_edges() == want.number_of_edges()
+    assert dict(got.nodes.data()) == dict(want.nodes.data())
+    assert dict(got.nodes(data='code')) == dict(want.nodes(data='code'))
+    for node in want:
+        assert sorted(got[node]) == sorted(want[node])
+        for code in tap.typecodes:
+            assert sorted(got.neighbors_oftype(node, code)) == \
+                sorted(n for n in want[node] if want.nodes[n]['code'] == code)
+    assert sorted(got.nodes_oftype('b')) == sorted(n for n, c in want.nodes(data='code') if c == 'b')
+    assert 7 in got and 8 not in got
+
+    nx = got.to_networkx()
+    assert dict(nx.nodes.data()) == dict(want.nodes.data())
+
+
+def test_undrift():
+    dat = make_graph()
+    want = converter.undrift(tap.make_nxgraph("g", dat), 2.0, 1.0)
+    got = converter.undrift(TypedGraph.from_json(dat), 2.0, 1.0)
+    for node in want.nodes:
+        if want.nodes[node]['code'] != 'b':
+            continue
+        assert numpy.allclose(got.nodes[node]['corners'], want.nodes[node]['corners'])
+        assert got.nodes[node]['span'] == want.nodes[node]['span']
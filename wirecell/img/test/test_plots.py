@@ -0,0 +1,28 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.img.plots import Hist2D
+
+
+def test_hist2d():
+    rng = numpy.random.default_rng(3)
+    x = rng.uniform(-1, 11, 1000)
+    y = rng.uniform(-5, 25, 1000)
+    v = rng.uniform(size=1000)
+
+    want = numpy.zeros((20, 10))
+    for one in zip(x, y, v):
+        xi = min(9, int(min(1.0, max(0, one[0]/10)) * 10))
+        yi = min(19, int(min(1.0, max(0, one[1]/20)) * 20))
+        want[yi, xi] += one[2]
+
+    dense = Hist2D(10, 0, 10, 20, 0, 20)
+    sparse = Hist2D(10, 0, 10, 20, 0, 20, sparse=True)
+    for hist in (dense, sparse):
+        hist.fill(x[:500], y[:500], v[:500])
+        for one in zip(x[500:], y[500:], v[500:]):
+            hist.fill(*one)
+        assert numpy.allclose(hist.arr, want)
+        assert numpy.allclose(hist.dense(slice(2, 5)), want[:, 2:5])
+    yi, xi, vals = sparse.coo()
+    assert numpy.allclose(want[yi, xi], vals)
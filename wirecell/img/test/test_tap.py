@@ -0,0 +1,93 @@
+#!/usr/bin/env pytest
+
+import json
+import numpy
+from wirecell.img import tap
+
+
+def make_graph(nslices=4, nchans=6, seed=0):
+    '''
+    Return a small cluster graph in JSON form.
+    '''
+    rng = numpy.random.default_rng(seed)
+    verts = list()
+    edges = list()
+
+    def add(code, data):
+        verts.append(dict(ident=len(verts), type=code, data=data))
+        return len(verts) - 1
+
+    chans = [add('c', dict(ident=100+ind, wpid=ind%3, index=ind, val=0.0, unc=0.0))
+             for ind in range(nchans)]
+    wires = list()
+    for ind, cnode in enumerate(chans):
+        for seg in range(2):
+            head = rng.uniform(size=3).tolist()
+            tail = rng.uniform(size=3).tolist()
+            wnode = add('w', dict(ident=2*ind+seg, wpid=ind%3, index=ind, chid=100+ind,
+                                  seg=seg, head=head, tail=tail))
+            edges.append((cnode, wnode))
+            wires.append(wnode)
+    for sid in range(nslices):
+        chosen = rng.choice(nchans, size=3, replace=False)
+        signal = {str(100+ch): dict(val=float(rng.uniform(1, 10)), unc=0.1) for ch in chosen}
+        snode = add('s', dict(ident=sid, frameid=0, start=sid*2.0, span=2.0, signal=signal))
+        ncorn = int(rng.integers(3, 7))
+        corners = rng.uniform(size=(ncorn, 3)).tolist()
+        bnode = add('b', dict(ident=sid, value=float(rng.uniform(1, 10)), error=0.5,
+                              faceid=0, sliceid=sid, start=sid*2.0, span=2.0,
+                              corners=corners))
+        edges.append((bnode, snode))
+        for ch in chosen:
+            edges.append((bnode, wires[2*ch]))
+        mnode = add('m', dict(ident=sid, value=1.0, error=0.1, wpid=0))
+        edges.append((mnode, bnode))
+        edges.append((mnode, chans[chosen[0]]))
+    return dict(vertices=verts, edges=edges)
+
+
+def test_roundtrip(tmp_path):
+    dat = make_graph()
+    want = tap.make_nxgraph("json", dat)
+
+    path = tmp_path / "clusters.json"
+    path.write_text(json.dumps(dat))
+    npz = str(tmp_path / "clusters.npz")
+    assert tap.save_arrays(npz, tap.load_json(str(path)), "gz") == 1
+
+    got = list(tap.load(npz))
+    assert len(got) == 1
+    got = got[0]
+    assert got.name == "cluster_0"
+    assert dict(got.nodes.data()) == dict(want.nodes.data())
+    assert set(map(frozenset, got.edges)) == set(map(frozenset, want.edges))
+
+
+def test_csr():
+    offsets, targets = tap.csr(numpy.array([0, 0, 2]), numpy.array([1, 2, 3]), 4)
+    assert offsets.tolist() == [0, 2, 3, 5, 6]
+    assert targets.tolist() == [1, 2, 0, 3, 0, 2]
+
+
+def test_column_form():
+    assert tap._column_form([1, 2.0])['form'] == "scalar"
+    assert tap._column_form([[1, 2], [3, 4]])['form'] == "vector"
+    assert tap._column_form([[1, 2], [3, 4, 5]])['form'] == "ragged"
+    assert tap._column_form([[1, 2], [[3, 4]]])['form'] == "ragged"
+    try:
+        tap._column_form([[1, 2], 3])
+    except ValueError:
+        pass
+    else:
+        assert False, "mixed values accepted"
+
+
+def test_load_many(tmp_path):
+    dats = [make_graph(seed=seed) for seed in range(12)]
+    npz = str(tmp_path / "clusters.npz")
+    assert tap.save_arrays(npz, dats) == 12
+    got = list(tap.load(npz))
+    assert [gr.name for gr in got] == [f'cluster_{ind}' for ind in range(12)]
+    for gr, dat in zip(got, dats):
+        want = tap.make_nxgraph("json", dat)
+        assert dict(gr.nodes.data()) == dict(want.nodes.data())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+'''
+Write VTK XML unstructured grid (.vtu) files with numpy alone.
+
+Arrays are written inline in the "binary" (base64) encoding so the
+files are read by ParaView like those written with tvtk.
+'''
+
+import base64
+import numpy
+
+# VTK cell type codes
+VTK_POLYHEDRON = 42
+
+vtk_types = {
+    numpy.dtype('int8'): "Int8",
+    numpy.dtype('uint8'): "UInt8",
+    numpy.dtype('int32'): "Int32",
+    numpy.dtype('int64'): "Int64",
+    numpy.dtype('float32'): "Float32",
+    numpy.dtype('float64'): "Float64",
+}
+
+
+def data_array(name, arr, ncomp=1):
+    '''
+    Return the XML text of one DataArray element.
+    '''
+    arr = numpy.ascontiguousarray(arr)
+    if arr.dtype not in vtk_types:
+        arr = arr.astype('f8' if arr.dtype.kind == 'f' else 'i8')
+    raw = arr.astype(arr.dtype.newbyteorder('<'), copy=False).tobytes()
+    head = numpy.array([len(raw)], dtype='<u8').tobytes()
+    text = base64.b64encode(head + raw).decode()
+    return (f'<DataArray type="{vtk_types[arr.dtype]}" Name="{name}" '
+            f'NumberOfComponents="{ncomp}" format="binary">{text}</DataArray>')
+
+
+def write(filename, points, connectivity, offsets, types,
+          faces=None, faceoffsets=None, cell_data=None, scalars=None):
+    '''
+    Write an unstructured grid to a .vtu file.
+
+    The points are (N,3) and the cells are given as in VTK XML: the
+    point ids of all cells in connectivity, the end of each cell in
+    offsets and the cell types.  Polyhedral cells also need their
+    face streams in faces and the end of each in faceoffsets (-1 for
+    other cells).  Cell data is a dict of arrays with one value per
+    cell and scalars the name of one of them.
+    '''
+    points = numpy.asarray(points, dtype='f8').reshape(-1, 3)
+    ncells = len(offsets)
+    cell_data = cell_data or dict()
+
+    cells = [data_array("connectivity", numpy.asarray(connectivity, dtype='i8')),
+             data_array("offsets", numpy.asarray(offsets, dtype='i8')),
+             data_array("types", numpy.asarray(types, dtype='u1'))]
+    if faces is not None:
+        cells += [data_array("faces", numpy.asarray(faces, dtype='i8')),
+                  data_array("faceoffsets", numpy.asarray(faceoffsets, dtype='i8'))]
+
+    cdata = list()
+    for name, arr in cell_data.items():
+        arr = numpy.asarray(arr)
+        if len(arr) != ncells:
+            raise ValueError(f'cell data "{name}" has {len(arr)} values for {ncells} cells')
+        cdata.append(data_array(name, arr))
+    scalars = f' Scalars="{scalars}"' if scalars else ''
+
+    with open(filename, "w") as fp:
+        fp.write('<?xml version="1.0"?>\n')
+        fp.write('<VTKFile type="UnstructuredGrid" version="1.0" '
+                 'byte_order="LittleEndian" header_type="UInt64">\n')
+        fp.write('<UnstructuredGrid>\n')
+        fp.write(f'<Piece NumberOfPoints="{len(points)}" NumberOfCells="{ncells}">\n')
+        fp.write('<Points>\n' + data_array("Points", points, 3) + '\n</Points>\n')
+        fp.write('<Cells>\n' + '\n'.join(cells) + '\n</Cells>\n')
+        fp.write(f'<CellData{scalars}>\n' + '\n'.join(cdata) + '\n</CellData>\n')
+        fp.write('</Piece>\n</UnstructuredGrid>\n</VTKFile>\n')
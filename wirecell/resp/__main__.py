@@ -4,7 +4,6 @@ Main CLI to wirecell.resp.
 '''
 
 import click
-from wirecell.util.fileio import load as source_loader
 from wirecell import units
 import numpy
 
@@ -27,8 +26,12 @@ def cli(ctx):
               help="Set drift origin (give units, eg '10*cm').")
 @click.option("--speed", type=str,
               help="Set drift speed at start of response (give untis, eg '1.114*mm/us').")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to parse files, def: serial")
+@click.option("--cache/--no-cache", default=False,
+              help="Use the cache of parsed datasets, def: no")
 @click.argument("dataset")
-def gf2npz(output, origin, speed, dataset):
+def gf2npz(output, origin, speed, jobs, cache, dataset):
     '''
     Convert a Garfield data set to a "WCT response NPZ" file.
     '''
@@ -36,9 +39,8 @@ def gf2npz(output, origin, speed, dataset):
         raise ValueError("You MUST give --speed and --origin")
 
     from wirecell.resp.garfield import (
-        dataset_asdict, dsdict2arrays)
-    source = source_loader(dataset, pattern="*.dat")
-    ds = dataset_asdict(source)
+        load_dataset, dsdict2arrays)
+    ds = load_dataset(dataset, workers=jobs, cache=cache)
 
     origin = eval(origin, units.__dict__)
     speed = eval(speed, units.__dict__)
@@ -46,15 +48,18 @@ def gf2npz(output, origin, speed, dataset):
     numpy.savez(output, **arrs)
 
 @cli.command("gf-info")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to parse files, def: serial")
+@click.option("--cache/--no-cache", default=False,
+              help="Use the cache of parsed datasets, def: no")
 @click.argument("dataset")
-def gf_info(dataset):
+def gf_info(jobs, cache, dataset):
     '''
     Give info about a garfield dataset
     '''
     from wirecell.resp.garfield import (
-        dataset_asdict, dsdict_dump)
-    source = source_loader(dataset, pattern="*.dat")
-    ds = dataset_asdict(source)
+        load_dataset, dsdict_dump)
+    ds = load_dataset(dataset, workers=jobs, cache=cache)
     dsdict_dump(ds)
 
 
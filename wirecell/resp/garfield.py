@@ -3,10 +3,16 @@
 Support for garfield files
 '''
 
+import os
+import json
 import numpy
+import hashlib
 import os.path as osp
+from pathlib import Path
 from collections import defaultdict
 from wirecell import units
+from wirecell.util import cache_directory
+from wirecell.util.fileio import load as source_loader, source_type
 
 def split_text_records(text):
     '''
@@ -67,22 +73,32 @@ def parse_text_record(text):
     ret['xlabel'] = xunit[0]
     ret['ylabel'] = yunit[0]
 
-    xdata = list()
-    ydata = list()
+    xy = parse_numeric_block(lines[9:9+nbins])
+    if xy.shape != (nbins, 2):
+        raise ValueError('parse error for "%s"' % wire)
+    ret['x'] = xy[:,0]*xscale
+    ret['y'] = xy[:,1]*yscale
+    return ret
+
+
+def parse_numeric_block(lines):
+    '''
+    Return (N,2) array of the (x,y) pairs from the lines of the
+    numeric block of a Garfield record.
+    '''
     #  + (  0.00000000E+00   0.00000000E+00
     #  +     0.10000000E+00   0.00000000E+00
     # ...
     #  +     0.99800003E+02   0.00000000E+00
     #  +     0.99900002E+02   0.00000000E+00 )
-    for line in lines[9:9+nbins]:
-        xy = line[4:].split()
-        xdata.append(float(xy[0]))
-        ydata.append(float(xy[1]))
-    if nbins != len(xdata) or nbins != len(ydata):
-        raise ValueError('parse error for "%s"' % wire)
-    ret['x'] = numpy.asarray(xdata)*xscale
-    ret['y'] = numpy.asarray(ydata)*yscale
-    return ret
+    #
+    # A " + " only appears as a line prefix as exponent signs are not
+    # preceded by a space so the block is converted in one call.
+    text = '\n'.join(lines).replace(' + ', ' ').replace('(', ' ').replace(')', ' ')
+    xy = numpy.fromstring(text, sep=' ')
+    if xy.size % 2:
+        return xy
+    return xy.reshape(-1, 2)
 
 
 def parse_filename(filename):
@@ -97,7 +113,45 @@ def parse_filename(filename):
     return dict(impact=float(dist), plane=plane, filename=filename)
 
 
-def dataset_asdict(source):
+def parse_file(filename, text):
+    '''
+    Return (filename info dict, list of record dicts) parsed from the
+    text of one Garfield file.
+
+    The info dict is None if the file name can not be parsed.
+    '''
+    try:
+        fnamedat = parse_filename(filename)
+    except ValueError as ve:
+        print(f'fail to parse {ve}, skip {filename}')
+        return None, []
+    return fnamedat, [parse_text_record(rec) for rec in split_text_records(text)]
+
+
+def parse_source(source, workers=0):
+    '''
+    Yield (filename, info, records) for each (filename, text) in source.
+
+    If workers is nonzero the files are parsed in a pool of that many
+    processes while keeping the source order.
+    '''
+    if not workers:
+        for filename, text in source:
+            yield (filename,) + parse_file(filename, text)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    filenames = list()
+    texts = list()
+    for filename, text in source:
+        filenames.append(filename)
+        texts.append(text)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename, parsed in zip(filenames, pool.map(parse_file, filenames, texts)):
+            yield (filename,) + parsed
+
+
+def dataset_asdict(source, workers=0):
     '''
     Return a dictionary representation of a garfield dataset source
 
@@ -109,21 +163,18 @@ def dataset_asdict(source):
 
     This tuple is used as a key to assure uniqueness.  The value for a
     key also includes entries for the last three ntuple elements.
+
+    If workers is nonzero, files are parsed in parallel processes.
     '''
 
     uniq = defaultdict(dict)
 
-    for filename, text in source:
+    for filename, fnamedat, recs in parse_source(source, workers):
 
-        try:
-            fnamedat = parse_filename(filename)
-        except ValueError as ve:
-            print(f'fail to parse {ve}, skip {filename}')
+        if fnamedat is None:
             continue
 
-        gen = split_text_records(text)
-        for rec in gen:
-            dat = parse_text_record(rec)
+        for dat in recs:
 
             key = tuple([filename] + [dat[k] for k in ['group', 'wire_region', 'label']])
 
@@ -139,6 +190,134 @@ def dataset_asdict(source):
     return uniq
 
 
+# Bump when a parsing change would alter the dataset dict so that
+# previously cached results are not used.
+parser_version = 2
+
+# Non-array record entries held in the cache metadata.
+record_tuples = ('wire_region_pos',)
+
+
+def source_digest(dataset, pattern="*.dat"):
+    '''
+    Return a hex digest of the content of a dataset source and the
+    parameters used to parse it.
+    '''
+    hsh = hashlib.sha256()
+    hsh.update(json.dumps(dict(parser=parser_version, pattern=pattern)).encode())
+    path = Path(dataset)
+    if path.is_dir():
+        patterns = [pattern] if isinstance(pattern, str) else pattern
+        paths = sorted(set(sum([list(path.glob(p)) for p in patterns], [])))
+    else:
+        paths = [path]
+    for one in paths:
+        hsh.update(one.name.encode())
+        with open(one, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1<<20), b''):
+                hsh.update(chunk)
+    return hsh.hexdigest()
+
+
+def dsdict_save(ds, filename):
+    '''
+    Save a dataset dict to an archive file.
+
+    Sample arrays are concatenated into flat "x" and "y" arrays with
+    "offsets" delimiting each record.  Keys and other record values
+    are held in "meta".
+    '''
+    from wirecell.util import ario
+    meta = list()
+    offsets = [0]
+    for key, dat in ds.items():
+        rec = {k:v for k,v in dat.items() if k not in ('x', 'y')}
+        meta.append(dict(key=list(key), rec=rec))
+        offsets.append(offsets[-1] + dat['x'].size)
+    with ario.Writer(filename) as out:
+        out.add("meta", meta)
+        out.add("offsets", numpy.array(offsets))
+        out.add("x", numpy.concatenate([numpy.zeros(0)] + [d['x'] for d in ds.values()]))
+        out.add("y", numpy.concatenate([numpy.zeros(0)] + [d['y'] for d in ds.values()]))
+
+
+def dsdict_load(filename):
+    '''
+    Return a dataset dict from a file made by dsdict_save().
+    '''
+    from wirecell.util import ario
+    arf = ario.load(filename)
+    offsets = arf["offsets"]
+    xs = arf["x"]
+    ys = arf["y"]
+    ds = dict()
+    for ind, one in enumerate(arf["meta"]):
+        rec = one['rec']
+        for name in record_tuples:
+            rec[name] = tuple(rec[name])
+        beg, end = offsets[ind], offsets[ind+1]
+        rec['x'] = xs[beg:end]
+        rec['y'] = ys[beg:end]
+        ds[tuple(one['key'])] = rec
+    return ds
+
+
+def rename_sources(ds, func):
+    '''
+    Return a dataset dict like ds with each file name mapped by func.
+    '''
+    ret = dict()
+    for key, dat in ds.items():
+        dat = dict(dat, filename=func(dat['filename']))
+        ret[(func(key[0]),) + tuple(key[1:])] = dat
+    return ret
+
+
+def source_namers(dataset):
+    '''
+    Return functions mapping file names from a dataset source to and
+    from names which do not depend on where the source is found.
+    '''
+    typ = source_type(dataset)
+    if typ == "dir":
+        return (lambda f: osp.relpath(f, dataset),
+                lambda f: str(Path(dataset) / f))
+    if typ == "dat":
+        return (osp.basename, lambda f: dataset)
+    # archive member names are already relative
+    return (lambda f: f, lambda f: f)
+
+
+def load_dataset(dataset, pattern="*.dat", workers=0, cache=False):
+    '''
+    Return dataset_asdict() of the named dataset file or directory.
+
+    If cache is true, the result is kept on disk under
+    wirecell.util.cache_directory("garfield") (or in the directory
+    given as cache) keyed by source_digest() so later loads of
+    identical input skip parsing.  File names are cached relative to
+    the dataset so an identical dataset found elsewhere gets its own.
+    '''
+    if not cache:
+        return dataset_asdict(source_loader(dataset, pattern=pattern), workers)
+
+    to_rel, from_rel = source_namers(dataset)
+    cdir = cache_directory("garfield") if cache is True else Path(cache)
+    cfile = cdir / (source_digest(dataset, pattern) + ".npz")
+    if cfile.exists():
+        return rename_sources(dsdict_load(str(cfile)), from_rel)
+
+    ds = dataset_asdict(source_loader(dataset, pattern=pattern), workers)
+    try:
+        cdir.mkdir(parents=True, exist_ok=True)
+        tmp = cdir / f'{cfile.stem}.{os.getpid()}.npz'
+        dsdict_save(rename_sources(ds, to_rel), str(tmp))
+        os.replace(tmp, cfile)
+    except OSError as err:
+        print(f'failed to cache {dataset}: {err}')
+    return ds
+
+
 def dsdict_dump(ds):
     '''
     Print info about a garfield dataset dict
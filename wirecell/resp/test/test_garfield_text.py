@@ -0,0 +1,82 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell import units
+from wirecell.resp import garfield
+
+
+def make_record(wire, nbins=100, signal="Direct signal"):
+    ys = numpy.random.normal(size=nbins) * 1e-3
+    lines = [
+        f'Created 31/07/16 At 19.52.20 < none > SIGNAL   "{signal}, group   1     "',
+        '  Group 1 consists of:',
+        '  Group 1 consists of:',
+        f'     Wire {wire} with label X at (x,y)=({wire*0.3-3},0.6) and at -110 V',
+        f' Number of signal records:  {nbins}',
+        ' Units used: time in micro second, current in micro Ampere.',
+        ' Time range:', ' x', ' y',
+    ]
+    for ind, y in enumerate(ys):
+        pre = " + (" if ind == 0 else " +  "
+        lines.append(f'{pre}   {ind*0.1:.8E}   {y:.8E}')
+    lines[-1] += " )"
+    return '\n'.join(lines), ys
+
+
+def test_parse_text_record():
+    text, ys = make_record(243)
+    got = garfield.parse_text_record(text)
+    assert got['wire_region'] == 243
+    assert got['nbins'] == 100
+    assert numpy.allclose(got['x'], 0.1*numpy.arange(100)*units.us)
+    assert numpy.allclose(got['y'], ys*units.microampere)
+
+
+def test_dataset_parallel():
+    source = list()
+    for imp in range(4):
+        recs = [make_record(w)[0] for w in range(5)]
+        source.append((f'{imp*0.5}_U.dat', '\n% ' + '\n% '.join(recs)))
+    serial = garfield.dataset_asdict(source)
+    par = garfield.dataset_asdict(source, workers=2)
+    assert list(serial) == list(par)
+    assert len(serial) == 20
+    for key in serial:
+        assert numpy.array_equal(serial[key]['y'], par[key]['y'])
+
+
+def test_cache(tmp_path):
+    import tarfile
+    ddir = tmp_path / "dataset"
+    ddir.mkdir()
+    for imp in range(3):
+        recs = [make_record(w)[0] for w in range(4)]
+        (ddir / f'{imp*0.5}_V.dat').write_text('\n% ' + '\n% '.join(recs))
+    tarname = tmp_path / "dataset.tar"
+    with tarfile.open(tarname, "w") as tf:
+        tf.add(ddir, "dataset")
+    cdir = tmp_path / "cache"
+    want = garfield.load_dataset(str(tarname), cache=False)
+    first = garfield.load_dataset(str(tarname), cache=str(cdir))
+    assert len(list(cdir.glob("*.npz"))) == 1
+    again = garfield.load_dataset(str(tarname), cache=str(cdir))
+    for got in (first, again):
+        assert list(got) == list(want)
+        for key in want:
+            assert got[key]['wire_region_pos'] == want[key]['wire_region_pos']
+            assert got[key]['impact'] == want[key]['impact']
+            assert numpy.array_equal(got[key]['y'], want[key]['y'])
+            assert numpy.array_equal(got[key]['x'], want[key]['x'])
+    garfield.load_dataset(str(ddir), cache=str(cdir))
+    assert len(list(cdir.glob("*.npz"))) == 2
+
+    # an identical copy elsewhere hits the cache with its own names
+    import shutil
+    other = tmp_path / "elsewhere" / "dataset"
+    shutil.copytree(ddir, other)
+    want = garfield.load_dataset(str(other))
+    got = garfield.load_dataset(str(other), cache=str(cdir))
+    assert len(list(cdir.glob("*.npz"))) == 2
+    assert sorted(got) == sorted(want)
+    assert all(got[key]['filename'] == key[0] for key in got)
+    assert all(key[0].startswith(str(other)) for key in got)
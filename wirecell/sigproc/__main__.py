@@ -22,11 +22,13 @@ def cli(ctx):
                   help="Set gain in mV/fC.")
 @click.option("-s", "--shaping", default=0.0, type=float,
                   help="Set shaping time in us.")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of threads to convolve large responses, def: serial")
 @click.argument("json-file")
 @click.argument("npz-file")
-def fr2npz(gain, shaping, json_file, npz_file):
+def fr2npz(gain, shaping, jobs, json_file, npz_file):
     '''
-    Convert field response file to numpy (.json or .json.bz2 to .npz)
+    Convert field response file to numpy (.json, .json.bz2 or .npz to .npz)
 
     If gain and shaping are non zero then convolve each field response
     function with the corresponding electronics response function.
@@ -81,7 +83,7 @@ def fr2npz(gain, shaping, json_file, npz_file):
     fr = per.load(json_file)
     gain *= units.mV/units.fC
     shaping *= units.us
-    dat = arrs.fr2arrays(fr, gain, shaping)
+    dat = arrs.fr2arrays(fr, gain, shaping, jobs)
     numpy.savez(npz_file, **dat)
 
 
@@ -139,11 +141,15 @@ def response_info(ctx, json_file):
               help="Set location of zero wires.  def: 0 0 0")
 @click.option("-d", "--delay", default=0, type=int,
               help="Set additional delay of bins in the output field response.  def=0")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to parse Garfield files, def: serial")
+@click.option("--cache/--no-cache", default=False,
+              help="Use the cache of parsed Garfield files, def: no")
 @click.argument("garfield-fileset")
 @click.argument("wirecell-field-response-file")
 @click.pass_context
 def convert_garfield(ctx, origin, speed, normalization, zero_wire_locs,
-                    delay, garfield_fileset, wirecell_field_response_file):
+                    delay, jobs, cache, garfield_fileset, wirecell_field_response_file):
     '''
     Convert an archive of a Garfield fileset (zip, tar, tgz) into a
     Wire Cell field response file (.json with optional .gz or .bz2
@@ -155,7 +161,7 @@ def convert_garfield(ctx, origin, speed, normalization, zero_wire_locs,
 
     origin = eval(origin, units.__dict__)
     speed = eval(speed, units.__dict__)
-    rflist = gar.load(garfield_fileset, normalization, zero_wire_locs, delay)
+    rflist = gar.load(garfield_fileset, normalization, zero_wire_locs, delay, jobs, cache)
     fr = rf1dtoschema(rflist, origin, speed)
     per.dump(wirecell_field_response_file, fr)
 
@@ -167,16 +173,20 @@ def convert_garfield(ctx, origin, speed, normalization, zero_wire_locs,
               help="Set normalization: 0:none, <0:electrons, >0:multiplicative scale.  def=0")
 @click.option("-z", "--zero-wire-locs", default=[0.0,0.0,0.0], nargs=3, type=float,
               help="Set location of zero wires.  def: 0 0 0")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to parse Garfield files, def: serial")
+@click.option("--cache/--no-cache", default=False,
+              help="Use the cache of parsed Garfield files, def: no")
 @click.argument("garfield-fileset")
 @click.argument("pdffile")
 @click.pass_context
-def plot_garfield_exhaustive(ctx, normalization, zero_wire_locs,
+def plot_garfield_exhaustive(ctx, normalization, zero_wire_locs, jobs, cache,
                                  garfield_fileset, pdffile):
     '''
     Plot all the Garfield current responses.
     '''
     import wirecell.sigproc.garfield as gar
-    dat = gar.load(garfield_fileset, normalization, zero_wire_locs)
+    dat = gar.load(garfield_fileset, normalization, zero_wire_locs, workers=jobs, cache=cache)
     import wirecell.sigproc.plots as plots
     plots.garfield_exhaustive(dat, pdffile)
 
@@ -211,6 +221,10 @@ def plot_garfield_exhaustive(ctx, normalization, zero_wire_locs,
                   help="Set how many wire regions to use, default to all")
 @click.option("--dump-data", default="", type=str,
                   help="Dump the plotted data in format given by extension (.json, .txt or .npz/.npy)")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to parse Garfield files, def: serial")
+@click.option("--cache/--no-cache", default=False,
+              help="Use the cache of parsed Garfield files, def: no")
 @click.argument("garfield-fileset")
 @click.argument("pdffile")
 @click.pass_context
@@ -218,7 +232,7 @@ def plot_garfield_track_response(ctx, gain, shaping, tick, tick_padding, electro
                                      elec_type, adc_gain, adc_voltage, adc_resolution,
                                      normalization, zero_wire_locs,
                                      ymin, ymax, regions,
-                                     dump_data,
+                                     dump_data, jobs, cache,
                                      garfield_fileset, pdffile):
     '''
     Plot Garfield response assuming a perpendicular track.
@@ -240,7 +254,7 @@ def plot_garfield_track_response(ctx, gain, shaping, tick, tick_padding, electro
     adc_resolution = 1<<adc_resolution
     adc_per_voltage = adc_gain*adc_resolution/adc_voltage
 
-    dat = gar.load(garfield_fileset, normalization, zero_wire_locs)
+    dat = gar.load(garfield_fileset, normalization, zero_wire_locs, workers=jobs, cache=cache)
 
     if regions:
         print ("Limiting to %d regions" % regions)
@@ -563,6 +577,74 @@ def channel_responses(ctx, tscale, scale, name, infile, outfile):
     return
 
 
+@cli.command("deconvolve")
+@click.option("-f", "--field", default=None,
+              help="A WCT field response file (.json, .json.bz2, .npz)")
+@click.option("--garfield", default=None,
+              help="A Garfield fileset to use instead of a field response file")
+@click.option("--gain", default=14.0, type=float,
+              help="Set gain in mV/fC, def: 14")
+@click.option("--shaping", default=2.0, type=float,
+              help="Set shaping time in us, def: 2")
+@click.option("-t", "--tick", default="0.5*us", type=str,
+              help="The sample period of the frames, def: 0.5*us")
+@click.option("-c", "--chunk", default=2048, type=int,
+              help="Number of ticks deconvolved at once, def: 2048")
+@click.option("-p", "--pad", default=0, type=int,
+              help="Ticks of overlap on each side of a chunk, def: response length")
+@click.option("--tier", default="orig",
+              help="The frame tag to deconvolve, def: orig")
+@click.option("-o", "--output-tag", default="decon",
+              help="The frame tag for the output, def: decon")
+@click.option("-j", "--jobs", default=0, type=int,
+              help="Number of processes to deconvolve planes, def: serial")
+@click.argument("input-archive")
+@click.argument("output-archive")
+def deconvolve(field, garfield, gain, shaping, tick, chunk, pad, tier, output_tag, jobs,
+               input_archive, output_archive):
+    '''
+    Apply 2D deconvolution and filters to frames in an archive.
+
+    Frames are split into planes as in wirecell-util frame-split and
+    each plane is divided by the nominal field and electronics
+    response spectrum from response_spect_nominal() and filtered.
+    Each deconvolved frame, with its channels and tickinfo, is written
+    to the output archive under the output tag.
+    '''
+    from wirecell.util import ario
+    from wirecell.sigproc import response, deconv
+    import wirecell.sigproc.response.persist as per
+    import wirecell.sigproc.garfield as gar
+
+    if bool(field) == bool(garfield):
+        raise click.BadParameter("give exactly one of --field or --garfield")
+    if field:
+        rflist = response.schematorf1d(per.load(field))
+    else:
+        rflist = gar.load(garfield)
+    tick = eval(tick, units.__dict__)
+    # both sources give regions on either side of the central wire
+    spectra = response.response_spect_nominal(rflist, gain*units.mV/units.fC,
+                                              shaping*units.us, tick, mirror=False)
+
+    fp = ario.load(input_archive)
+    with ario.Writer(output_archive) as out:
+        for aname in fp.keys():
+            parts = aname.split("_")
+            if parts[0] != "frame" or (parts[1] or "orig") != tier:
+                continue
+            index = parts[2]
+            channels = fp[f'channels_{parts[1]}_{index}']
+            click.echo(f'deconvolving: {aname}')
+            sig = deconv.deconvolve_frame(fp[aname], channels, spectra, tick,
+                                          chunk, pad, jobs)
+            out.add(f'frame_{output_tag}_{index}', sig)
+            out.add(f'channels_{output_tag}_{index}', channels)
+            tikey = f'tickinfo_{parts[1]}_{index}'
+            if tikey in fp:
+                out.add(f'tickinfo_{output_tag}_{index}', fp[tikey])
+
+
 def main():
     cli(obj=dict())
 
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+'''
+Offline 2D deconvolution of frames.
+
+Each plane of a frame is transformed over channel and time, divided by
+the field and electronics response spectrum and filtered as in the
+toolkit signal processing.  A plane is processed in time chunks with
+overlap-save so memory is bounded by the chunk size and not the
+readout length.
+'''
+
+import numpy
+from .. import units
+from . import response
+
+
+def plane_kernel(Rpf):
+    '''
+    Return (Rct, center) from a plane response spectrum as made by
+    response.response_spect_nominal() with mirror false.
+
+    Rct is the real channel/time response at the sampling tick and
+    center is the row of the wire nearest to the drift paths.
+    '''
+    Rct = numpy.real(numpy.fft.ifft2(Rpf))
+    return Rct, Rct.shape[0]//2
+
+
+def kernel_spectrum(Rct, center, nchan, nticks):
+    '''
+    Return the rfft2 of response Rct laid on a (nchan, nticks) grid
+    with its center row on channel 0.
+    '''
+    nrows, nresp = Rct.shape
+    if nrows > nchan or nresp > nticks:
+        raise ValueError(f'response {Rct.shape} larger than grid {(nchan, nticks)}')
+    kern = numpy.zeros((nchan, nticks))
+    rows = (numpy.arange(nrows) - center) % nchan
+    kern[rows, :nresp] = Rct
+    return numpy.fft.rfft2(kern)
+
+
+def plane_filters(planeid, nchan, nticks, tick=0.5*units.us):
+    '''
+    Return (Fc, Ft) filters over the channel frequencies of a full FFT
+    of nchan and the time frequencies of an rfft of nticks.  Both
+    sizes must be even.
+    '''
+    if nchan % 2 or nticks % 2:
+        raise ValueError(f'filter sizes must be even, got {(nchan, nticks)}')
+    fu, fv, fw, fc = response.filters(nticks//2 + 1, tick, nchan//2 + 1)
+    Ft = (fu, fv, fw)[planeid]
+    Fc = fc[numpy.abs(numpy.fft.fftfreq(nchan, 1.0/nchan)).astype(int)]
+    return Fc, Ft
+
+
+def even(num):
+    return num + num % 2
+
+
+def deconvolve_plane(Mct, Rpf, planeid, tick=0.5*units.us, chunk=2048, pad=0):
+    '''
+    Return the deconvolved signal of one plane of measured ADC Mct
+    shaped (nchannels, nticks).
+
+    Rpf is the plane response spectrum and planeid its index for the
+    time filter.  Time is processed in chunks of chunk ticks, each
+    extended by pad ticks on either side which default to the
+    response length.  Channels are padded by the response width to
+    avoid wrapping around the plane edges.
+    '''
+    Rct, center = plane_kernel(Rpf)
+    nrows, nresp = Rct.shape
+    pad = pad or nresp
+    nchan, nticks = Mct.shape
+    chunk = min(chunk, nticks)
+
+    cpad = even(nchan + nrows)
+    tpad = even(max(chunk + 2*pad, nresp))
+    Rsp = kernel_spectrum(Rct, center, cpad, tpad)
+    Fc, Ft = plane_filters(planeid, cpad, tpad, tick)
+    # inverse response with filters, zero where the response vanishes
+    Ksp = numpy.zeros_like(Rsp)
+    numpy.divide(Fc.reshape(-1, 1) * Ft.reshape(1, -1), Rsp, out=Ksp, where=Rsp != 0)
+
+    out = numpy.zeros(Mct.shape, dtype='f4')
+    buf = numpy.zeros((cpad, tpad))
+    for start in range(0, nticks, chunk):
+        # buffer column j holds time start - pad + j
+        t0 = max(0, start - pad)
+        t1 = min(nticks, start - pad + tpad)
+        buf[:] = 0
+        buf[:nchan, t0 - (start - pad) : t1 - (start - pad)] = Mct[:, t0:t1]
+        sig = numpy.fft.irfft2(numpy.fft.rfft2(buf) * Ksp, s=buf.shape)
+        nkeep = min(chunk, nticks - start)
+        out[:, start:start+nkeep] = sig[:nchan, pad:pad+nkeep]
+    return out
+
+
+def _deconvolve_job(args):
+    return deconvolve_plane(*args)
+
+
+def deconvolve_frame(frame, channels, spectra, tick=0.5*units.us,
+                     chunk=2048, pad=0, workers=0):
+    '''
+    Return a frame like frame holding its deconvolved signal.
+
+    The frame is split into planes of each anode by its channel count
+    as in wirecell-util frame-split and spectra gives the response
+    spectrum of each plane.  Planes are deconvolved by a pool of
+    workers processes if nonzero.
+    '''
+    from wirecell.util.frame_split import guess_splitter
+
+    frame = numpy.asarray(frame)
+    order = numpy.argsort(channels, kind='stable')
+    splitter = guess_splitter(frame.shape[0])
+    jobs = [(parr, spectra[md['planeid']], md['planeid'], tick, chunk, pad)
+            for parr, md in splitter(frame[order], "", 0)]
+
+    if workers:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            planes = list(pool.map(_deconvolve_job, jobs))
+    else:
+        planes = list(map(_deconvolve_job, jobs))
+
+    out = numpy.zeros(frame.shape, dtype='f4')
+    out[order] = numpy.vstack(planes)
+    return out
@@ -27,12 +27,10 @@ import numpy
 
 import os.path as osp
 
-from wirecell.util.fileio import load as source_loader
+from wirecell.resp.garfield import load_dataset
 
-from wirecell.resp.garfield import dataset_asdict
 
-
-def load(source, normalization = None, zero_wire_loc = 0.0, delay=0):
+def load(source, normalization = None, zero_wire_loc = 0.0, delay=0, workers=0, cache=False):
     '''Load Garfield data source (eg, tarball).
 
     Return list of response.ResponseFunction objects.
@@ -52,10 +50,12 @@ def load(source, normalization = None, zero_wire_loc = 0.0, delay=0):
     The `zero_wire_loc` is the transverse location of the wire to be
     considered the central wire.
 
-    '''
-    source = source_loader(source, pattern="*.dat")
+    If `workers` is nonzero, files are parsed in that many processes.
+    If `cache` is given, parsed results are cached on disk, see
+    wirecell.resp.garfield.load_dataset().
 
-    uniq = dataset_asdict(source)
+    '''
+    uniq = load_dataset(source, workers=workers, cache=cache)
 
     # This following is a hack previously in the parser where it
     # definitely does not belong.  I move it here where it still
@@ -150,7 +150,7 @@ def convert(inputfile, outputfile = "wire-cell-garfield-fine-response.json.bz2",
     '''
     rflist = load(inputfile)
     if shaped:
-        rflist = [d.shaped() for d in rflist]
+        rflist = response.shaped_responses(rflist)
     if average:
         rflist = response.average(rflist)
     response.write(rflist, outputfile)
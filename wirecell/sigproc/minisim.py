@@ -18,10 +18,9 @@ class Minisim(object):
     '''
     Simulate the response to a distribution of charge.
 
-    todo:
-
-        - for each hit, find all rf's for the hits impact, use each
-          region number as offset to hit's wire number, fill frame.
+    For each hit, the response for the hit's nearest impact is added
+    to the frame with each region number as offset to the hit's wire
+    number.
     '''
 
     defaults = dict(
@@ -48,6 +47,7 @@ class Minisim(object):
                                           (0.0, 0.0),
                                           (0.0, 0.5*self.pitch)))
 
+        self._sampled = dict()
         self.frame = None       # becomes 3-tuple
         self.clear_frame()      # prime
 
@@ -57,6 +57,9 @@ class Minisim(object):
     def wire_space(self, hits):
         '''
         Return the location of a hit in terms of (wire number, impact).
+
+        The impact is the distance along the pitch from the wire
+        rounded to a multiple of the impact spacing.
         '''
         ret = list()
 
@@ -68,35 +71,63 @@ class Minisim(object):
             pit += pwidth       # distance along pitch from wire 0
             wiredist = pit/self.pitch
             wire = numpy.asarray(numpy.round(wiredist), dtype=int)
-            impact = numpy.round((wiredist-wire)/self.impact) * self.impact
+            impact = numpy.round((wiredist-wire)*self.pitch/self.impact) * self.impact
             ret.append(numpy.vstack((wire, impact)).T)
         return ret
-        
 
-    def apply_block(self, block, iplane, ich, time):
+    def sampled_blocks(self, plane):
+        '''
+        Return the plane's response blocks sampled at the digitization
+        tick, shaped (Nimpacts, Nregions, Nsamples).  Each is made once.
         '''
-        Apply block array to plane array with ich and itick offsets
+        try:
+            return self._sampled[plane]
+        except KeyError:
+            pass
+        tfinebin_jmp = max(1, int(round(self.tick/self.pib.tbin)))
+        blocks = self.pib.blocks[plane][:, :, ::tfinebin_jmp]
+        self._sampled[plane] = blocks
+        return blocks
+
+    def kernel_spectrum(self, plane, iimpact, shape):
         '''
-        dch = block.shape[0]//2
-        chm = int(max(ich-dch, 0))
-        chp = int(min(ich+dch, self.nwires[iplane]-1))
-        #print 'ch:',dch, chm, chp
+        Return the rfft2 of a sampled response block laid on an array
+        of shape with region zero on row zero.
 
-        tfinebin_min = int(time/self.pib.tbin)
-        tfinebin_jmp = int(self.tick/self.pib.tbin)
-        #print 'time:',time,tfinebin_min, tfinebin_jmp
+        These are frame sized so they are made on each call and not
+        kept.
+        '''
+        block = self.sampled_blocks(plane)[iimpact]
+        rows = numpy.asarray(self.pib.region_keys) % shape[0]
+        kern = numpy.zeros(shape)
+        kern[rows, :block.shape[1]] = block
+        return numpy.fft.rfft2(kern)
 
-        sampled = block[:,tfinebin_min::tfinebin_jmp]
-        #print 'sampled:',sampled.shape
+    def hit_ticks(self, hits):
+        '''
+        Return the digitization tick at which each hit's response starts.
+        '''
+        hit = Hit(*hits.T)
+        time = (hit.t-self.pib.tmin) + (hit.x-self.pib.xstart)/self.velocity
+        return numpy.asarray(numpy.floor(time/self.tick), dtype=int)
 
-        tsampbin_num = len(sampled[0])
-        tsampbin_min = int(time/self.tick)
-        tsampbin_max = min(tsampbin_min+tsampbin_num, len(self.frame[iplane][0]))
-        print 'samp bin:',tsampbin_num, tsampbin_min, tsampbin_max*self.tick/units.us
+    def apply_block(self, block, iplane, ich, time, charge=1.0):
+        '''
+        Add block array, sampled at the tick, scaled by charge to plane
+        array with ich and time offsets.  Rows land on channel ich plus
+        their region number.
+        '''
+        plane = self.frame[iplane]
+        nwires, nticks = plane.shape
+        tfinebin_jmp = max(1, int(round(self.tick/self.pib.tbin)))
+        sampled = block[:, ::tfinebin_jmp]
 
-        self.frame[iplane][chm:chp+1, tsampbin_min:tsampbin_max] = sampled
+        chans = numpy.asarray(self.pib.region_keys) + ich
+        ticks = numpy.arange(sampled.shape[1]) + int(numpy.floor(time/self.tick))
+        csel = (chans >= 0) & (chans < nwires)
+        tsel = (ticks >= 0) & (ticks < nticks)
+        plane[numpy.ix_(chans[csel], ticks[tsel])] += charge*sampled[numpy.ix_(csel, tsel)]
 
-        
     def clear_frame(self):
         '''
         Initialize a new frame.
@@ -110,13 +141,45 @@ class Minisim(object):
     def add_hits(self, hits):
         '''
         Add response to hits to current frame.
+
+        Hits is an array shaped (Nhits, 5) with columns as in Hit.
+        Per plane, the hit charge is binned into (wire, impact, tick)
+        and each impact group is convolved with its response block by
+        FFT.  Responses beyond the frame are dropped.
         '''
+        hits = numpy.asarray(hits, dtype=float).reshape(-1, len(Hit._fields))
+        charge = Hit(*hits.T).q
+        ticks = self.hit_ticks(hits)
         nearest_chimps = self.wire_space(hits)
         for iplane, chimps in enumerate(nearest_chimps):
-            for ihit, (ch,imp) in enumerate(chimps):
-                x,y,z,q,t = hit = hits[ihit]
-                block = self.pib.region_block("uvw"[iplane], imp)
-                self.apply_block(block, iplane, ch, (t-self.pib.tmin) + (x-self.pib.xstart)/self.velocity)
-            
-            
-            
+            plane_letter = "uvw"[iplane]
+            blocks = self.sampled_blocks(plane_letter)
+            nimpacts, nregions, nsamples = blocks.shape
+            frame = self.frame[iplane]
+            nwires, nticks = frame.shape
+
+            wires = chimps[:,0].astype(int)
+            impacts = self.pib.nearest_impacts(chimps[:,1])
+            ok = (wires >= 0) & (wires < nwires) & (ticks >= 0) & (ticks < nticks)
+
+            # pad to hold the full response without wrap around
+            shape = (nwires + nregions, nticks + nsamples)
+            shape = tuple(n + n%2 for n in shape)
+
+            acc = None
+            for iimp in numpy.unique(impacts[ok]):
+                sel = ok & (impacts == iimp)
+                flat = wires[sel]*shape[1] + ticks[sel]
+                qimg = numpy.bincount(flat, charge[sel], shape[0]*shape[1]).reshape(shape)
+                spec = numpy.fft.rfft2(qimg)
+                del qimg
+                spec *= self.kernel_spectrum(plane_letter, iimp, shape)
+                if acc is None:
+                    acc = spec
+                else:
+                    acc += spec
+            if acc is None:
+                continue
+            # responses on wires below zero wrap into the padding
+            full = numpy.fft.irfft2(acc, s=shape)
+            frame += full[:nwires, :nticks]
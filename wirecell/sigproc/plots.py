@@ -98,11 +98,11 @@ def electronics():
 
     want_gains = [1.0, 4.7, 7.8, 14.0, 25.0]
 
-    engs = numpy.vectorize(response.electronics_no_gain_scale) # by time
+    engs = response.electronics_no_gain_scale
     def engs_maximum(gain, shaping=2.0*units.us):
-        resp = engs(numpy.linspace(0,10*units.us, 100), gain, shaping)
-        return numpy.max(resp)
-    engs_maximum = numpy.vectorize(engs_maximum) # by gain
+        # response is linear in gain
+        resp = engs(numpy.linspace(0,10*units.us, 100), 1.0, shaping)
+        return gain*numpy.max(resp)
                      
     gainpar = numpy.linspace(0,300,6000)
     for ishaping, shaping in enumerate([0.5, 1.0, 2.0, 3.0]):
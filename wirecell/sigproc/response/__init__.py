@@ -8,7 +8,9 @@ from . import schema
 
 import math
 import numpy
+import functools
 import collections
+import collections.abc
 
 def load_text_electronics_response(filename):
     '''
@@ -42,44 +44,74 @@ def load_text_electronics_response(filename):
     data["amplitudes"] = amp_array
     return data
 
+def _electronics_shape(x, elec_type="cold"):
+    '''
+    Unit gain electronics response on array x of time in units of the
+    shaping time.
+    '''
+    exp, cos, sin = numpy.exp, numpy.cos, numpy.sin
+    if elec_type == "warm":
+        return (1. - exp(-0.5 * (0.9 * x)**2)) * exp(-0.5 * (0.5 * x)**2)
+
+    e1 = exp(-2.94809*x)
+    e2 = exp(-2.82833*x)
+    e3 = exp(-2.40318*x)
+    c1, s1 = cos(1.19361*x), sin(1.19361*x)
+    c2, s2 = cos(2.38722*x), sin(2.38722*x)
+    c3, s3 = cos(2.5928*x), sin(2.5928*x)
+    c4, s4 = cos(5.18561*x), sin(5.18561*x)
+    return 4.31054*e1 \
+        + e2*(-2.6202*c1*(1 + c2) + 0.762456*s1*(1 - c2)
+              + 0.762456*c1*s2 - 2.6202*s1*s2) \
+        + e3*(0.464924*c3*(1 + c4) - 0.327684*s3*(1 - c4)
+              - 0.327684*c3*s4 + 0.464924*s3*s4)
+
+
 def electronics_no_gain_scale(time, gain, shaping=2.0*units.us, elec_type="cold"):
     '''
     This version takes gain parameter already scaled such that the
     gain actually desired is obtained.
     Both the "cold" and "warm" electroinics reponse functions are adapted from
     wire-cell-toolkit/util/src/Response.cxx.  
+
+    The time may be a scalar or an array.
     '''
     domain=(0, 10*units.us)
-    if time <= domain[0] or time >= domain[1]:
-        return 0.0
+    time = numpy.asarray(time, dtype=float)
+    inside = (time > domain[0]) & (time < domain[1])
+    ret = numpy.zeros_like(time)
+    x = time[inside]/units.us / (shaping/units.us)
+    ret[inside] = gain*_electronics_shape(x, elec_type)
+    if ret.ndim == 0:
+        return float(ret)
+    return ret
 
-    time = time/units.us
-    st = shaping/units.us
-        
-    from math import sin, cos, exp
-    ret = 0
-    if elec_type == "warm":
-        reltime = time / st
-        leftArg = (0.9 * reltime) * (0.9 * reltime)
-        rightArg = (0.5 * reltime) * (0.5 * reltime)
-        ret = ((1. - exp(-0.5 * leftArg)) * exp(-0.5 * rightArg))
-    else:
-        ret = 4.31054*exp(-2.94809*time/st) \
-              -2.6202*exp(-2.82833*time/st)*cos(1.19361*time/st) \
-              -2.6202*exp(-2.82833*time/st)*cos(1.19361*time/st)*cos(2.38722*time/st) \
-              +0.464924*exp(-2.40318*time/st)*cos(2.5928*time/st) \
-              +0.464924*exp(-2.40318*time/st)*cos(2.5928*time/st)*cos(5.18561*time/st) \
-              +0.762456*exp(-2.82833*time/st)*sin(1.19361*time/st) \
-              -0.762456*exp(-2.82833*time/st)*cos(2.38722*time/st)*sin(1.19361*time/st) \
-              +0.762456*exp(-2.82833*time/st)*cos(1.19361*time/st)*sin(2.38722*time/st) \
-              -2.6202*exp(-2.82833*time/st)*sin(1.19361*time/st)*sin(2.38722*time/st)  \
-              -0.327684*exp(-2.40318*time/st)*sin(2.5928*time/st) +  \
-              +0.327684*exp(-2.40318*time/st)*cos(5.18561*time/st)*sin(2.5928*time/st) \
-              -0.327684*exp(-2.40318*time/st)*cos(2.5928*time/st)*sin(5.18561*time/st) \
-              +0.464924*exp(-2.40318*time/st)*sin(2.5928*time/st)*sin(5.18561*time/st)
-    ret *= gain
+
+def electronics_gain_scale(peak_gain, shaping, elec_type="cold"):
+    '''
+    Return the gain to give electronics_no_gain_scale() for a peak gain.
+    '''
+    # see wirecell.sigproc.plots.electronics() for these magic numbers.
+    if elec_type != "cold":
+        return peak_gain
+    if shaping <= 0.5*units.us:
+        return peak_gain*10.146826
+    if shaping <= 1.0*units.us:
+        return peak_gain*10.146828
+    if shaping <= 2.0*units.us:
+        return peak_gain*10.122374
+    return peak_gain*10.120179
+
+
+@functools.lru_cache(maxsize=64)
+def _electronics_grid(start, step, nticks, peak_gain, shaping, elec_type):
+    times = start + step*numpy.arange(nticks)
+    gain = electronics_gain_scale(peak_gain, shaping, elec_type)
+    ret = electronics_no_gain_scale(times, gain, shaping, elec_type)
+    ret.flags.writeable = False
     return ret
 
+
 def electronics(time, peak_gain=14*units.mV/units.fC, shaping=2.0*units.us, elec_type="cold"):
     '''
     Electronics response function.
@@ -89,22 +121,21 @@ def electronics(time, peak_gain=14*units.mV/units.fC, shaping=2.0*units.us, elec
         - shaping :: the shaping time in Wire Cell system of units
 
         - domain :: outside this pair, the response is identically zero
+
+    The time may be a scalar or an array.  Responses on uniformly
+    sampled time arrays are remembered by (gain, shaping, elec_type,
+    time grid) and a copy returned.
     '''
-    # see wirecell.sigproc.plots.electronics() for these magic numbers.
-    gain = peak_gain
-    if elec_type=="cold":
-        if shaping <= 0.5*units.us:
-            gain = peak_gain*10.146826
-        elif shaping <= 1.0*units.us:
-            gain = peak_gain*10.146828
-        elif shaping <= 2.0*units.us:
-            gain = peak_gain*10.122374
-        else:
-            gain = peak_gain*10.120179
+    time = numpy.asarray(time, dtype=float)
+    if time.ndim == 1 and time.size > 1:
+        step = (time[-1] - time[0])/(time.size - 1)
+        grid = time[0] + step*numpy.arange(time.size)
+        if numpy.allclose(grid, time, rtol=1e-12, atol=1e-12*abs(step)):
+            return _electronics_grid(float(time[0]), float(step), time.size,
+                                     peak_gain, shaping, elec_type).copy()
+    gain = electronics_gain_scale(peak_gain, shaping, elec_type)
     return electronics_no_gain_scale(time, gain, shaping, elec_type)
 
-electronics = numpy.vectorize(electronics)
-
 def convolve(f1, f2):
     '''
     Return the simple convolution of the two arrays using FFT+mult+invFFT method.
@@ -112,11 +143,32 @@ def convolve(f1, f2):
     # fftconvolve adds an unwanted time shift
     #from scipy.signal import fftconvolve
     #return fftconvolve(field, elect, "same")
-    s1 = numpy.fft.fft(f1)
-    s2 = numpy.fft.fft(f2)
-    sig = numpy.fft.ifft(s1*s2)
+    s1 = numpy.fft.rfft(f1)
+    s2 = numpy.fft.rfft(f2)
+    return numpy.fft.irfft(s1*s2, len(f1))
 
-    return numpy.real(sig)
+def convolve_spectrum(spec, rows, workers=0, chunk=1024):
+    '''
+    Return the circular convolution of each row of rows with a kernel
+    given as its rfft spectrum over the row length.
+
+    All rows are transformed at once.  If workers is nonzero and there
+    are more than chunk rows, chunks of rows are transformed by a pool
+    of that many threads.
+    '''
+    rows = numpy.asarray(rows)
+    nticks = rows.shape[-1]
+
+    def conv(block):
+        return numpy.fft.irfft(numpy.fft.rfft(block, axis=-1)*spec, nticks, axis=-1)
+
+    if not workers or rows.ndim < 2 or len(rows) <= chunk:
+        return conv(rows)
+
+    from concurrent.futures import ThreadPoolExecutor
+    blocks = [rows[ind:ind+chunk] for ind in range(0, len(rows), chunk)]
+    with ThreadPoolExecutor(workers) as pool:
+        return numpy.concatenate(list(pool.map(conv, blocks)))
 
 def _convolve(f1, f2):
     '''
@@ -187,7 +239,7 @@ class ResponseFunction(object):
             newfr = self.resample(nbins)
         # integrate the current over the sample to get charge
         dt = newfr.times[1]-newfr.times[0]
-        newfr.response = [r*dt for r in newfr.response]
+        newfr.response = numpy.asarray(newfr.response)*dt
         elecr = electronics(newfr.times, gain, shaping, elec_type)
         newfr.response = convolve(elecr, newfr.response)
         return newfr
@@ -201,14 +253,178 @@ class ResponseFunction(object):
         return blah
 
 
+class ResponseSet(object):
+    '''
+    A collection of response functions held in dense arrays.
+
+    The .current array is shaped (nplanes, nregions, nimpacts, nticks)
+    with its first three axes labeled by the sorted .planes, .regions
+    and .impacts lists.  The .index structured array, shaped (nplanes,
+    nregions, nimpacts), holds per-response metadata and a "valid"
+    flag marking which cells hold a response.
+
+    Impacts may be all None, as for responses averaged over impacts.
+    '''
+
+    index_dtype = numpy.dtype([('valid', bool), ('pos', 'f8', (2,)),
+                               ('tmin', 'f8'), ('tmax', 'f8')])
+
+    def __init__(self, planes, regions, impacts, current, index):
+        self.planes = list(planes)
+        self.regions = list(regions)
+        self.impacts = list(impacts)
+        self.current = current
+        self.index = index
+
+    @classmethod
+    def from_list(cls, rflist):
+        '''
+        Return a ResponseSet made from a list of ResponseFunction.
+        '''
+        planes = sorted(set(rf.plane for rf in rflist))
+        regions = sorted(set(rf.region for rf in rflist))
+        impacts = sorted(set(rf.impact for rf in rflist),
+                         key=lambda i: -math.inf if i is None else i)
+        nticks = set(len(rf.response) for rf in rflist)
+        if len(nticks) != 1:
+            raise ValueError(f'responses must have one length, got: {nticks}')
+        shape = (len(planes), len(regions), len(impacts))
+
+        pind = {k:i for i,k in enumerate(planes)}
+        rind = {k:i for i,k in enumerate(regions)}
+        iind = {k:i for i,k in enumerate(impacts)}
+        current = numpy.zeros(shape + (nticks.pop(),))
+        index = numpy.zeros(shape, dtype=cls.index_dtype)
+        for rf in rflist:
+            cell = (pind[rf.plane], rind[rf.region], iind[rf.impact])
+            if index['valid'][cell]:
+                raise ValueError(f'duplicate response: {rf}')
+            current[cell] = rf.response
+            index[cell] = (True, rf.pos, rf.domainls[0], rf.domainls[1])
+        return cls(planes, regions, impacts, current, index)
+
+    def to_list(self):
+        '''
+        Return list of ResponseFunction ordered by plane, region, impact.
+
+        Responses are views into the current array.
+        '''
+        nticks = self.nticks
+        ret = list()
+        for cell in zip(*numpy.nonzero(self.index['valid'])):
+            ind = self.index[cell]
+            p,r,i = cell
+            ret.append(ResponseFunction(self.planes[p], self.regions[r],
+                                        tuple(ind['pos']),
+                                        (ind['tmin'], ind['tmax'], nticks),
+                                        self.current[cell], self.impacts[i]))
+        return ret
+
+    def dup(self, **kwds):
+        '''
+        Return a shallow copy with any attributes in kwds overriding.
+        '''
+        args = dict(planes=self.planes, regions=self.regions, impacts=self.impacts,
+                    current=self.current, index=self.index)
+        args.update(kwds)
+        return ResponseSet(**args)
+
+    @property
+    def nticks(self):
+        return self.current.shape[-1]
+
+    @property
+    def tbin(self):
+        '''
+        The sample period, assumed common to all responses.
+        '''
+        ind = self.index[self.index['valid']][0]
+        return (ind['tmax'] - ind['tmin']) / (self.nticks - 1)
+
+    @property
+    def impact_values(self):
+        '''
+        Impacts as an array with None as NaN.
+        '''
+        return numpy.array([numpy.nan if i is None else i for i in self.impacts])
+
+    def plane_block(self, plane):
+        '''
+        Return (regions, impact indices, block) for the plane (index or
+        letter) restricted to the regions and impacts it populates.
+        The block is shaped (nregions, nimpacts, nticks).
+        '''
+        if isinstance(plane, str):
+            plane = self.planes.index(plane)
+        valid = self.index['valid'][plane]
+        rinds = numpy.nonzero(valid.any(axis=1))[0]
+        iinds = numpy.nonzero(valid.any(axis=0))[0]
+        if not valid[numpy.ix_(rinds, iinds)].all():
+            raise ValueError(f'plane {self.planes[plane]} lacks responses for some region/impact')
+        block = self.current[plane][numpy.ix_(rinds, iinds)]
+        return rinds, iinds, block
+
+
+def as_response_set(rfs):
+    '''
+    Return rfs as a ResponseSet, converting from a list if needed.
+    '''
+    if isinstance(rfs, ResponseSet):
+        return rfs
+    return ResponseSet.from_list(rfs)
+
+
 def group_by(rflist, field):
     '''
     Return a list of lists grouping by like values of the field.
     '''
-    ret = list()
-    for thing in sorted(set(getattr(d, field) for d in rflist)):
-        bything = [d for d in rflist if getattr(d, field) == thing]
-        ret.append(bything)
+    groups = collections.defaultdict(list)
+    for d in rflist:
+        groups[getattr(d, field)].append(d)
+    return [groups[thing] for thing in sorted(groups)]
+
+def shaped_responses(rfs, gain=14*units.mV/units.fC, shaping=2.0*units.us,
+                     nbins=None, elec_type="cold", workers=0):
+    '''
+    Return the ResponseFunction.shaped() of each in a list or a
+    ResponseSet, returning the same type.
+
+    Responses sharing a time domain are convolved as one block and the
+    electronics spectrum is computed once per domain.  See
+    convolve_spectrum() for workers.
+    '''
+    if isinstance(rfs, ResponseSet):
+        if nbins is not None:
+            rs = ResponseSet.from_list([rf.resample(nbins) for rf in rfs.to_list()])
+        else:
+            rs = rfs
+        valid = rs.index['valid']
+        current = numpy.zeros_like(rs.current)
+        domains = numpy.stack((rs.index['tmin'], rs.index['tmax']), axis=-1)
+        for tmin, tmax in numpy.unique(domains[valid], axis=0):
+            sel = valid & (domains[...,0] == tmin) & (domains[...,1] == tmax)
+            times = numpy.linspace(tmin, tmax, rs.nticks)
+            elecr = electronics(times, gain, shaping, elec_type)
+            dt = times[1]-times[0]
+            current[sel] = convolve_spectrum(numpy.fft.rfft(elecr),
+                                             rs.current[sel]*dt, workers)
+        return rs.dup(current=current)
+
+    if nbins is not None:
+        rfs = [rf.resample(nbins) for rf in rfs]
+    bydomain = collections.defaultdict(list)
+    for ind, rf in enumerate(rfs):
+        bydomain[tuple(rf.domainls)].append(ind)
+
+    ret = [None]*len(rfs)
+    for domainls, inds in bydomain.items():
+        times = rfs[inds[0]].times
+        elecr = electronics(times, gain, shaping, elec_type)
+        dt = times[1]-times[0]
+        rows = numpy.array([rfs[ind].response for ind in inds])*dt
+        rows = convolve_spectrum(numpy.fft.rfft(elecr), rows, workers)
+        for ind, row in zip(inds, rows):
+            ret[ind] = rfs[ind].dup(response=row)
     return ret
 
 def by_region(rflist, region=0):
@@ -237,9 +453,42 @@ def normalize(rflist, plane='w', region=0, impact=None):
     then the average collection signal is used.  If not given, all
     impacts for the given plane/region are used.
     '''
+    if not isinstance(rflist, ResponseSet):
+        return _normalize_list(rflist, plane, region, impact)
+    rs = rflist
+
+    sel = numpy.zeros(rs.index.shape, dtype=bool)
+    if plane in rs.planes and region in rs.regions:
+        isel = numpy.ones(len(rs.impacts), dtype=bool)
+        if impact is not None:
+            if not isinstance(impact, collections.abc.Sequence):
+                impact = [impact]
+            isel = numpy.array([i in impact for i in rs.impacts], dtype=bool)
+        sel[rs.planes.index(plane), rs.regions.index(region)] = isel
+    sel &= rs.index['valid']
+
+    num = numpy.count_nonzero(sel)
+    if 0 == num:
+        msg = "No fields to average out of %d for nomalize(%s, %d, %s)" % (numpy.count_nonzero(rs.index['valid']), plane, region, impact)
+        raise ValueError(msg)
+
+    ind = rs.index[sel]
+    dt = (ind['tmax'] - ind['tmin']) / (rs.nticks - 1)
+    if numpy.any(dt == 0.0):
+        raise ValueError("Corrupt response function for plane %s, region %d" % (plane, region))
+    qavg = numpy.sum(dt * rs.current[sel].sum(axis=1))/num
+    scale = -units.eplus/qavg
+    return rs.dup(current = rs.current*scale)
+
+
+def _normalize_list(rflist, plane, region, impact):
+    '''
+    The normalize() of a list, which may mix lengths or repeat
+    responses.
+    '''
     toaverage = [rf for rf in rflist if rf.plane == plane and rf.region == region]
     if impact is not None:
-        if not isinstance(impact, collections.Sequence):
+        if not isinstance(impact, collections.abc.Sequence):
             impact = [impact]
         toaverage = [rf for rf in toaverage if rf.impact in impact]
 
@@ -251,12 +500,7 @@ def normalize(rflist, plane='w', region=0, impact=None):
     qtot = sum([total_charge(rf) for rf in toaverage])
     qavg = qtot/num
     scale = -units.eplus/qavg
-
-    out = list()
-    for rf in rflist:
-        newrf = rf.dup(response = rf.response*scale)
-        out.append(newrf)
-    return out
+    return [rf.dup(response = rf.response*scale) for rf in rflist]
 
 
 def _average(fine):
@@ -307,7 +551,47 @@ def average(fine):
     exactly on a half-way line between neighboring wires.
 
     Return list of new response.ResponseFunction objects ordered by
-    plane, region which cover the same regions.
+    plane, region which cover the same regions.  If fine is a
+    ResponseSet, so is the return.  A list which does not fill a
+    ResponseSet is averaged response by response.
+    '''
+    if not isinstance(fine, ResponseSet):
+        try:
+            return average(ResponseSet.from_list(fine)).to_list()
+        except ValueError:
+            return _average_list(fine)
+    rs = fine
+    impacts = rs.impact_values
+
+    current = numpy.zeros(rs.current.shape[:2] + (1, rs.nticks))
+    index = numpy.zeros(rs.current.shape[:2] + (1,), dtype=rs.index_dtype)
+    for iplane in range(len(rs.planes)):
+        rinds, iinds, block = rs.plane_block(iplane)
+
+        # Assure each region is ordered so first is impact=0
+        order = numpy.argsort(numpy.abs(impacts[iinds]), kind='stable')
+        block = block[:, order]
+        nimpacts = len(order)
+        binsize = numpy.ones(nimpacts)  # unit impact bin size
+        binsize[0] = 0.5;               # each center impact only covers 1/2 impact bin
+        binsize[-1] = 0.5;              # same for the edge impacts
+
+        # For each region, we need to take impacts from the region on
+        # the other side of center, ie the region axis reversed.
+        tot = numpy.einsum('rit,i->rt', block + block[::-1], binsize)
+
+        # normalize by total number of impact bins
+        tot /= 2*(nimpacts-1)
+        current[iplane, rinds, 0] = tot
+        index[iplane, rinds, 0] = rs.index[iplane][rinds, iinds[order[0]]]
+
+    return rs.dup(impacts=[None], current=current, index=index)
+
+
+def _average_list(fine):
+    '''
+    The average() of a list, which may mix lengths or repeat
+    responses.
     '''
     coarse = list()
     for inplane in group_by(fine, 'plane'):
@@ -340,32 +624,63 @@ def average(fine):
             tot /= 2*(nimpacts-1)
             dat = regp[0].dup(response=tot, impact=None)
             coarse.append(dat)
-        continue
     return coarse
 
 
 
 
-def field_response_spectra(rflist):
+def field_response_spectra(rflist, mirror=True):
     '''
     Return a tuple of response spectra as collection of per-plane
     matrices in channel periodicity vs frequency.  The rflist is both
     averaged over impacts (if needed) and normalized.
+
+    With mirror, the regions are taken to be on one side of the
+    central wire and are reflected to the other side.  Give false for
+    responses which already span both sides, as from Garfield or WCT
+    field response files, so they are not doubled.
+    '''
+    if not isinstance(rflist, ResponseSet):
+        try:
+            rs = ResponseSet.from_list(rflist)
+        except ValueError:
+            return _field_response_spectra_list(rflist, mirror)
+    else:
+        rs = rflist
+    if len(rs.impacts) > 1:
+        rs = average(rs)
+    rs = normalize(rs)
+
+    ret = list()
+    for iplane in range(len(rs.planes)):
+        rinds, _, block = rs.plane_block(iplane)
+        mat = block[:, 0]
+        if mirror:
+            # mirror and don't double add region==0
+            mat = numpy.concatenate((mat[::-1], mat[1:]))
+        spect = numpy.fft.fft2(mat, axes=(0,1))
+        ret.append(spect)
+    return tuple(ret)
+
+
+def _field_response_spectra_list(rflist, mirror=True):
+    '''
+    The field_response_spectra() of a list which does not fill a
+    ResponseSet.
     '''
     impacts = set([rf.impact for rf in rflist])
     if len(impacts) > 1:
-        rflist = average(rflist)
-    rflist = normalize(rflist)
+        rflist = _average_list(rflist)
+    rflist = _normalize_list(rflist, 'w', 0, None)
 
     ret = list()
-
-    byplane = group_by(rflist, 'plane')
-    for inplane in byplane:
+    for inplane in group_by(rflist, 'plane'):
         inplane.sort(key=lambda x: x.region)
         responses = [rf.response for rf in inplane]
         rows = list(responses)
-        rows.reverse()          # mirror 
-        rows += responses[1:]   # don't double add region==0
+        if mirror:
+            rows.reverse()          # mirror 
+            rows += responses[1:]   # don't double add region==0
         mat = numpy.asarray(rows)
         spect = numpy.fft.fft2(mat, axes=(0,1))
         ret.append(spect)
@@ -388,25 +703,14 @@ def plane_impact_blocks(rflist, eresp = None):
     # impact j is same as response on wire i, due to path at wire
     # region 0, impact j.
 
+    rs = as_response_set(rflist)
     ret = list()
-    byplane = group_by(rflist, 'plane')
-    for inplane in byplane:
-        byimpact = group_by(inplane, 'impact')
-        impacts = [d[0].impact for d in byimpact]
-        nimpacts = len(impacts)
-        regions = list(set([rf.region for rf in inplane]))
-        regions.sort()
-        nregions = len(regions)
-        ntbins = len(inplane[0].response)
-        pib_shape = (nimpacts, nregions, ntbins)
-
-        pib = numpy.zeros(pib_shape)
-        for inimpact in byimpact:
-            impact_index = impacts.index(inimpact[0].impact)
-            for inregion in inimpact:
-                region_index = regions.index(inregion.region)
-                pib[impact_index, region_index] = inregion.response
-        ret.append(pib)
+    for iplane in range(len(rs.planes)):
+        valid = rs.index['valid'][iplane]
+        rinds = numpy.nonzero(valid.any(axis=1))[0]
+        iinds = numpy.nonzero(valid.any(axis=0))[0]
+        block = rs.current[iplane][numpy.ix_(rinds, iinds)]
+        ret.append(numpy.ascontiguousarray(block.transpose(1, 0, 2)))
     return ret
 
 
@@ -446,55 +750,54 @@ class PlaneImpactBlocks(object):
         self.plane_keys = sorted(set([rf.plane for rf in rflist]))
         self.region_keys = sorted(set([rf.region for rf in rflist]))
         self.impact_keys = sorted(set([rf.impact for rf in rflist] + [-rf.impact for rf in rflist]))
-
-        # Organize flat rflist into tree [plane][impact][region]
-        tree = dict()
-        byplane = group_by(rflist, 'plane') # uvw
-        for inplane in byplane:
-            plane_letter = inplane[0].plane
-            tree[plane_letter] = tree_plane = dict()
-            byimpact = group_by(inplane, 'impact')
-            for inimpact in byimpact:
-                # WARNING: Garfield seems to measure either wire
-                # region number xor impact position in a different
-                # direction than is assumed here.  Garfield impact
-                # positions are always positive.
-                impact = -1*inimpact[0].impact
-                assert impact <= 0.0
-
-                tree_plane[-impact] = tree_impact_pos = dict()
-                tree_plane[impact] = tree_impact_neg = dict()
-                
-                byregion = group_by(inimpact, 'region')
-                for inregion in byregion:
-                    assert len(inregion) == 1
-                    rf = inregion[0]
-                    region = rf.region
-                    tree_impact_pos[region] = rf
-                    tree_impact_neg[-region] = rf
-        self._tree = tree
-        self._by_plane_impact = dict()
+        self.impact_index = {imp:ind for ind,imp in enumerate(self.impact_keys)}
+        region_index = {reg:ind for ind,reg in enumerate(self.region_keys)}
+
+        # Precompute dense blocks per plane shaped (Nimpacts, Nregions,
+        # Ntbins) following impact_keys and region_keys.
+        shape = (len(self.impact_keys), len(self.region_keys), self.ntbins)
+        self.blocks = {p:numpy.zeros(shape) for p in self.plane_keys}
+        filled = {p:numpy.zeros(shape[:2], dtype=bool) for p in self.plane_keys}
+        for rf in rflist:
+            # WARNING: Garfield seems to measure either wire
+            # region number xor impact position in a different
+            # direction than is assumed here.  Garfield impact
+            # positions are always positive.
+            impact = -1*rf.impact
+            assert impact <= 0.0
+            blocks = self.blocks[rf.plane]
+            # the negative impact is filled last so it wins at zero
+            for imp, reg in ((-impact, rf.region), (impact, -rf.region)):
+                if reg not in region_index:
+                    continue
+                cell = (self.impact_index[imp], region_index[reg])
+                blocks[cell] = rf.response
+                filled[rf.plane][cell] = True
+        self._filled = filled
 
     def region_block(self, plane, impact):
         '''
         Return an array shaped (Nregions, Ntbins) for the given plane
-        and impact.  Row=0 corresponds to the highest region (wire 10).
+        and impact.  Rows follow region_keys, lowest region first.
         '''
-        key = (plane,impact)    # cache the built array
-        try:
-            return self._by_plane_impact[key]
-        except KeyError:
-            pass
-        ppi = self._tree[plane][impact]
-        rfs = [ppi[r] for r in self.region_keys]
-        mat = numpy.zeros((len(self.region_keys), len(rfs[0].response)))
-        for row,rf in enumerate(rfs):
-            mat[row] = rf.response
-        self._by_plane_impact[key] = mat
-        return mat
-            
+        return self.blocks[plane][self.impact_index[impact]]
+
+    def nearest_impacts(self, impacts):
+        '''
+        Return indices into impact_keys nearest to the array of impacts.
+        '''
+        keys = numpy.asarray(self.impact_keys)
+        ind = numpy.clip(numpy.searchsorted(keys, impacts), 1, len(keys)-1)
+        lo = keys[ind-1]
+        hi = keys[ind]
+        return numpy.where(numpy.abs(impacts - lo) <= numpy.abs(hi - impacts), ind-1, ind)
+
     def response(self, plane, impact, region):
-        return self._tree[plane][impact][region].response
+        iimp = self.impact_index[impact]
+        ireg = self.region_keys.index(region)
+        if not self._filled[plane][iimp, ireg]:
+            raise KeyError((plane, impact, region))
+        return self.blocks[plane][iimp, ireg]
 
 class foo():
         
@@ -547,15 +850,15 @@ class foo():
         
 
 
-def response_spect_nominal(rflist, gain, shaping, tick=0.5*units.us):
+def response_spect_nominal(rflist, gain, shaping, tick=0.5*units.us, mirror=True):
     '''
     Return the a response matrix such as passed to `deconvolve()`.
 
     Only the frequencies corresponding to a sampling period of `tick`
-    are retained.  
+    are retained.  See field_response_spectra() for mirror.
     '''
     first = rflist[0]
-    frm = field_response_spectra(rflist)
+    frm = field_response_spectra(rflist, mirror)
 
     elect = electronics(first.times, gain, shaping)
     elesp = numpy.fft.fft(elect)
@@ -587,19 +890,22 @@ def filter_expower(sig, power, nbins, nyquist):
     this is likely Hz.  For channel-domain this is likely in units of
     per pitch (unitless).  Caller assures this consistency.
     '''
-    freqs = numpy.linspace(0, nyquist, nbins)
-    def filt(f):
-        return math.exp(-0.5*((f/sig)**power))
-    filt = numpy.vectorize(filt)
-    return filt(freqs)
+    from .filterbank import expower
+    return expower(numpy.linspace(0, nyquist, nbins), sig, power)
 
     
-def filters(nticks=9600, tick=0.5*units.us, npitches=3000, pitch=1.0):
+def filters(nticks=9600, tick=0.5*units.us, npitches=3000, pitch=1.0, bank=None):
     '''
     Return (fu,fv,fw,fc) filters.
 
-    See `filter_expower()` for details.
+    See `filter_expower()` for details.  The filters are taken from
+    the bank, a filterbank.FilterBank, which defaults to the shared
+    filterbank.default_bank().  The returned arrays are read-only.
     '''
+    if bank is None:
+        from .filterbank import default_bank
+        bank = default_bank()
+
     tick_seconds = tick/units.s
     nyquist_hz = 1.0/(2*tick_seconds)
 
@@ -610,9 +916,9 @@ def filters(nticks=9600, tick=0.5*units.us, npitches=3000, pitch=1.0):
     # to a toy simulation using 2D microboone response and electronics
     # functions and noise model.  They may need to be re-evaluated for
     # other detectors.
-    fu = filter_expower(2*1.43555e+07/200.0, 4.95096e+00, nticks, nyquist_hz)
-    fv = filter_expower(2*1.47404e+07/200.0, 4.97667e+00, nticks, nyquist_hz)
-    fw = filter_expower(2*1.45874e+07/200.0, 5.02219e+00, nticks, nyquist_hz)
+    fu = bank("expower", nticks, nyquist_hz, 2*1.43555e+07/200.0, 4.95096e+00)
+    fv = bank("expower", nticks, nyquist_hz, 2*1.47404e+07/200.0, 4.97667e+00)
+    fw = bank("expower", nticks, nyquist_hz, 2*1.45874e+07/200.0, 5.02219e+00)
 
     nyquist_pp = 1.0/(2*pitch)  # pp = per pitch
 
@@ -620,15 +926,16 @@ def filters(nticks=9600, tick=0.5*units.us, npitches=3000, pitch=1.0):
     # (us) number that was used in the prototype out of the "freq" and
     # into the "sig".  In microboone, this filter appears to be only
     # needed for simulation.
-    fc = filter_expower((1.4*0.5)/math.sqrt(math.pi), 2.0, npitches, nyquist_pp)
+    fc = bank("expower", npitches, nyquist_pp, (1.4*0.5)/math.sqrt(math.pi), 2.0)
 
     return (fu, fv, fw, fc)
 
 
 def deconvolve(Mct, Rpf, Ff, Fp):
     '''
-    Return a matrix like Mct which is deconvolved by Rpf and filtered
-    with the Ff and Fp.
+    Return a real matrix like Mct which is deconvolved by Rpf and
+    filtered with the Ff and Fp.  See wirecell.sigproc.deconv for a
+    chunked version.
 
     Indices are c=channel, t=time, p=periodicity, f=frequency.
 
@@ -648,32 +955,37 @@ def deconvolve(Mct, Rpf, Ff, Fp):
     nchan,ntick = Mct.shape
     nperi,nfreq = Rpf.shape
 
+    # keep the low and high halves to match the shape of Rpf
     Mpf = numpy.fft.fft2(Mct, axes=(0,1))
-    Mpf = numpy.delete(Mpf, range(nperi/2, nchan-nperi/2), axis=0)
-    Mpf = numpy.delete(Mpf, range(nfreq/2, ntick-nfreq/2), axis=1)
+    Mpf = numpy.delete(Mpf, range((nperi+1)//2, nchan-nperi//2), axis=0)
+    Mpf = numpy.delete(Mpf, range((nfreq+1)//2, ntick-nfreq//2), axis=1)
 
     Spf = Mpf/Rpf * Fp[:nperi].reshape(1,nperi).T
     Scf = numpy.fft.ifft2(Spf, axes=(1,))
     Scf = Scf * Ff[:nfreq]
     Sct = numpy.fft.ifft2(Scf, axes=(0,))
-    return Sct
+    return numpy.real(Sct)
 
 
 def schematorf1d(fr):
     '''
     Convert response.schema objects to 1D ResponseFunction objects.
 
-    Fixme: this has not yet been validated.
+    Paths are assigned to regions as in the Garfield convention with
+    impacts in [-pitch/2, pitch/2) and both are snapped so paths at
+    like impact positions share an impact across regions.
     '''
     ret = list()
     for pr in fr.planes:
         for path in pr.paths:
-            region = int(round(path.pitchpos/pr.pitch))
-            pos = (pr.wirepos, pr.pitchpos)
+            ratio = round(path.pitchpos/pr.pitch, 6)
+            region = int(math.floor(ratio + 0.5))
+            impact = round(ratio - region, 6) * pr.pitch
+            pos = (path.wirepos, path.pitchpos)
             nsamples = len(path.current)
-            times = (fr.tstart, nsamples*fr.period, nsamples)
-            impact = pathc.pitchpos - region*pr.pitch
-            rf = ResponseFunction(pr.planeid, region, pos, times, path.current, impact)
+            times = (fr.tstart, fr.tstart + (nsamples-1)*fr.period, nsamples)
+            rf = ResponseFunction("uvw"[pr.planeid], region, pos, times,
+                                  numpy.asarray(path.current), impact)
             ret.append(rf)
     return ret
                                       
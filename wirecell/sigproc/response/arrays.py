@@ -41,10 +41,11 @@ def pr2array(pr, nimperwire = 6, nbinsperwire = 10):
     #     print ("%.3f mm"%(path.pitchpos/units.mm))
     return res,pitches
 
-def fr2arrays(fr, gain=0, shaping=0):
+def fr2arrays(fr, gain=0, shaping=0, workers=0):
     '''
     Return a dict of Numpy arrays.  IF gain and shaping are nonzero,
-    convolve with corresponding electronics response.
+    convolve with corresponding electronics response.  See
+    response.convolve_spectrum() for workers.
     '''
     nplanes = len(fr.planes)
     planeid = numpy.zeros(nplanes)
@@ -71,29 +72,23 @@ def fr2arrays(fr, gain=0, shaping=0):
     
 
     if gain != 0.0 and shaping != 0.0:
-        from . import electronics
+        from . import electronics, convolve_spectrum
         
         dat["gain"] = gain;
         dat["shaping"] = shaping;
 
-        ncols = 0
+        # electronics response and its spectrum by number of ticks
+        especs = dict()
         eresp = None
-        espec = None
-        smeared = list()
         for r in responses:
-            if ncols != r.shape[1]:
-                ncols = r.shape[1]
-                times = [units.ns*(fr.tstart + fr.period * ind) for ind in range(ncols)]
+            ncols = r.shape[1]
+            if ncols not in especs:
+                times = units.ns*(fr.tstart + fr.period * numpy.arange(ncols))
                 eresp = electronics(times, gain, shaping)
-                espec = numpy.fft.fft(eresp)
-
-            nrows = r.shape[0]
-            #print ("shaping %d x %s" % (nrows, ncols))
-            for irow in range(nrows):
-                rspec = numpy.fft.fft(r[irow])
-                r[irow] = numpy.real(numpy.fft.ifft(rspec*espec))
+                especs[ncols] = numpy.fft.rfft(eresp)
+            r[:] = convolve_spectrum(especs[ncols], r, workers)
         dat['eresp'] = eresp
-        dat['espec'] = espec
+        dat['espec'] = numpy.fft.fft(eresp)
     for ind, pr in enumerate(fr.planes):
         dat['resp%d' % pr.planeid] = responses[ind]
         
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+'''
+A bank of Fourier-space filters.
+
+Filters are sampled over the low half of a Fourier domain, nbins from
+zero to a "nyquist" frequency as in response.filter_expower().  The
+shapes follow the toolkit:
+
+    - expower :: exp(-0.5*(f/sigma)^power), the toolkit HfFilter and
+      the form of its "Wiener" filters.
+
+    - gaussian :: expower with power=2.
+
+    - lowfreq :: 1 - exp(-(f/sigma)^2), the toolkit LfFilter.
+'''
+
+import os
+import json
+import hashlib
+import numpy
+from pathlib import Path
+from wirecell.util import cache_directory
+
+
+def expower(freqs, sigma, power=2.0):
+    '''
+    Return exp(-0.5*(freqs/sigma)^power).
+    '''
+    return numpy.exp(-0.5*(numpy.asarray(freqs)/sigma)**power)
+
+
+def gaussian(freqs, sigma, power=2.0):
+    '''
+    Return expower() with a power of 2.  The power is ignored.
+    '''
+    return expower(freqs, sigma, 2.0)
+
+
+def lowfreq(freqs, sigma, power=2.0):
+    '''
+    Return 1 - exp(-(freqs/sigma)^2).  The power is ignored.
+    '''
+    return 1.0 - numpy.exp(-(numpy.asarray(freqs)/sigma)**2)
+
+
+shapes = dict(expower=expower, wiener=expower, gaussian=gaussian, lowfreq=lowfreq)
+
+# toolkit component type for each shape
+wct_types = dict(expower="HfFilter", wiener="HfFilter", gaussian="HfFilter", lowfreq="LfFilter")
+
+
+class FilterBank(object):
+    '''
+    Make and remember sampled filters.
+
+    Each distinct (kind, nbins, nyquist, sigma, power) is computed
+    once and kept in memory and, if cache is given, as a .npy file
+    under wirecell.util.cache_directory("filters") for a true value or
+    in the directory given as cache.  Filters may be added under a
+    name to be exported together.
+    '''
+
+    def __init__(self, cache=False):
+        if cache is True:
+            cache = cache_directory("filters")
+        self.cache = Path(cache) if cache else None
+        self.memo = dict()
+        self.named = dict()
+
+    @staticmethod
+    def key(kind, nbins, nyquist, sigma, power=2.0):
+        if kind not in shapes:
+            raise ValueError(f'unknown filter kind: {kind}')
+        return (kind, int(nbins), float(nyquist), float(sigma), float(power))
+
+    def cache_file(self, key):
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return self.cache / (digest + ".npy")
+
+    def __call__(self, kind, nbins, nyquist, sigma, power=2.0):
+        '''
+        Return the read-only filter array.
+        '''
+        key = self.key(kind, nbins, nyquist, sigma, power)
+        got = self.memo.get(key)
+        if got is not None:
+            return got
+
+        cfile = self.cache_file(key) if self.cache else None
+        if cfile and cfile.exists():
+            got = numpy.load(str(cfile))
+        else:
+            freqs = numpy.linspace(0, key[2], key[1])
+            got = shapes[kind](freqs, key[3], key[4])
+            if cfile:
+                try:
+                    self.cache.mkdir(parents=True, exist_ok=True)
+                    tmp = self.cache / f'{cfile.stem}.{os.getpid()}.npy'
+                    numpy.save(str(tmp), got)
+                    os.replace(tmp, cfile)
+                except OSError as err:
+                    print(f'failed to cache filter {key}: {err}')
+        got.flags.writeable = False
+        self.memo[key] = got
+        return got
+
+    def scan(self, kind, nbins, nyquist, sigmas, powers=2.0):
+        '''
+        Return filters for each pair of sigmas and powers as an array
+        shaped (npoints, nbins).  Sigmas and powers are broadcast.
+
+        The scan is evaluated at once and is not remembered.
+        '''
+        self.key(kind, nbins, nyquist, 1.0)
+        sigmas, powers = numpy.broadcast_arrays(numpy.atleast_1d(sigmas),
+                                                numpy.atleast_1d(powers))
+        freqs = numpy.linspace(0, float(nyquist), int(nbins))
+        return shapes[kind](freqs[None,:],
+                            sigmas.astype(float)[:,None],
+                            powers.astype(float)[:,None])
+
+    def add(self, name, kind, nbins, nyquist, sigma, power=2.0):
+        '''
+        Add a named filter and return it.
+        '''
+        self.named[name] = self.key(kind, nbins, nyquist, sigma, power)
+        return self(kind, nbins, nyquist, sigma, power)
+
+    def __getitem__(self, name):
+        return self(*self.named[name])
+
+    def wct_config(self, name):
+        '''
+        Return a toolkit configuration object for a named filter.
+
+        The toolkit max_freq spans the full domain and is taken as
+        twice the nyquist.  Frequencies must be in WCT system of units
+        for the result to be used as-is.
+        '''
+        kind, nbins, nyquist, sigma, power = self.named[name]
+        data = dict(max_freq=2*nyquist, flag=True)
+        if wct_types[kind] == "HfFilter":
+            data.update(sigma=sigma, power=2.0 if kind == "gaussian" else power)
+        else:
+            data.update(tau=sigma)
+        return dict(type=wct_types[kind], name=name, data=data)
+
+    def save(self, filename):
+        '''
+        Save named filters to a file.
+
+        A .json file (possibly .bz2 or .gz compressed) receives the
+        list of toolkit configuration objects.  Any other name is
+        taken as an ario archive holding each sampled filter as an
+        array and the configuration list as "filters".
+        '''
+        cfgs = [self.wct_config(name) for name in self.named]
+        if filename.endswith((".json", ".json.bz2", ".json.gz")):
+            text = json.dumps(cfgs, indent=4).encode()
+            if filename.endswith(".bz2"):
+                import bz2
+                text = bz2.compress(text)
+            elif filename.endswith(".gz"):
+                import gzip
+                text = gzip.compress(text)
+            with open(filename, "wb") as fp:
+                fp.write(text)
+            return
+
+        from wirecell.util import ario
+        with ario.Writer(filename) as out:
+            out.add("filters", cfgs)
+            for name in self.named:
+                out.add(name, numpy.array(self[name]))
+
+
+_default_bank = None
+
+def default_bank():
+    '''
+    Return a module-wide FilterBank.
+
+    Filters are kept only in memory unless $WIRECELL_FILTER_CACHE is
+    set to a directory, or to "1" for cache_directory("filters").
+    '''
+    global _default_bank
+    if _default_bank is None:
+        cache = os.environ.get("WIRECELL_FILTER_CACHE") or False
+        if cache == "1":
+            cache = True
+        _default_bank = FilterBank(cache)
+    return _default_bank
@@ -43,6 +43,52 @@ def fromdict(obj):
     return obj
 
 
+def toarrays(fr):
+    '''
+    Return a dict of arrays representing a FieldResponse.
+
+    Each plane's path currents are held in one contiguous (npaths,
+    nticks) matrix "current<N>" along with "pitchpos<N>" and
+    "wirepos<N>" vectors where N counts planes in order.  Per-plane
+    scalars are collected in "planeid", "location" and "pitch" arrays.
+    '''
+    dat = dict(axis=numpy.asarray(fr.axis, dtype=float),
+               origin=numpy.asarray(fr.origin, dtype=float),
+               tstart=numpy.asarray(fr.tstart, dtype=float),
+               period=numpy.asarray(fr.period, dtype=float),
+               speed=numpy.asarray(fr.speed, dtype=float),
+               planeid=numpy.array([pr.planeid for pr in fr.planes], dtype=int),
+               location=numpy.array([pr.location for pr in fr.planes], dtype=float),
+               pitch=numpy.array([pr.pitch for pr in fr.planes], dtype=float))
+    for ind, pr in enumerate(fr.planes):
+        sizes = set(len(path.current) for path in pr.paths)
+        if len(sizes) > 1:
+            raise ValueError(f'plane {pr.planeid} has paths of differing lengths: {sizes}')
+        dat[f'current{ind}'] = numpy.array([path.current for path in pr.paths], dtype=float)
+        dat[f'pitchpos{ind}'] = numpy.array([path.pitchpos for path in pr.paths], dtype=float)
+        dat[f'wirepos{ind}'] = numpy.array([path.wirepos for path in pr.paths], dtype=float)
+    return dat
+
+
+def fromarrays(dat):
+    '''
+    Undo `toarrays()`.
+
+    Path currents are rows of their plane's current matrix.
+    '''
+    planes = list()
+    for ind, planeid in enumerate(dat['planeid']):
+        current = numpy.asarray(dat[f'current{ind}'])
+        paths = [PathResponse(cur, float(pp), float(wp)) for cur, pp, wp
+                 in zip(current, dat[f'pitchpos{ind}'], dat[f'wirepos{ind}'])]
+        planes.append(PlaneResponse(paths, int(planeid),
+                                    float(dat['location'][ind]),
+                                    float(dat['pitch'][ind])))
+    return FieldResponse(planes, dat['axis'].tolist(),
+                         float(dat['origin']), float(dat['tstart']),
+                         float(dat['period']), float(dat['speed']))
+
+
 def dumps(obj):
     '''
     Dump object to JSON text.
@@ -57,11 +103,70 @@ def loads(text):
     return fromdict(json.loads(text))
 
 
-def dump(filename, obj):
+json_exts = (".json", ".json.bz2", ".json.gz")
+array_exts = (".npz", ".zip", ".tar", ".tar.gz", ".tar.bz2", ".tar.xz",
+              ".tgz", ".tbz2", ".txz", ".tix", ".tpxz", ".tar.pixz")
+
+
+def file_type(filename):
+    '''
+    Return (format, codec) of the file.
+
+    The format is "json" or "arrays".  A JSON codec is None, "bz2" or
+    "gz".  An arrays codec is None for an ario archive named by its
+    extension or "zip" for a zip file found by its leading bytes.
+
+    The file name extension is consulted first and then, for an
+    existing file, its leading bytes.
+    '''
+    if filename.endswith(".json"):
+        return ("json", None)
+    if filename.endswith(".json.bz2"):
+        return ("json", "bz2")
+    if filename.endswith(".json.gz"):
+        return ("json", "gz")
+    if filename.endswith(array_exts):
+        return ("arrays", None)
+    try:
+        with open(filename, 'rb') as fp:
+            magic = fp.read(4)
+    except OSError:
+        magic = b''
+    if magic.startswith(b'PK'):
+        return ("arrays", "zip")
+    if magic.startswith(b'BZh'):
+        return ("json", "bz2")
+    if magic.startswith(b'\x1f\x8b'):
+        return ("json", "gz")
+    if magic.startswith(b'{'):
+        return ("json", None)
+    raise ValueError("unknown file format: %s" % filename)
+
+
+def file_format(filename):
+    '''
+    Return "json" or "arrays" for the format of the file, see
+    file_type().
+    '''
+    return file_type(filename)[0]
+
+
+def dump(filename, obj, compression=None):
     '''
     Save a response object (typically response.schema.FieldResponse)
     to a file of the given name.
+
+    A .json, .json.bz2 or .json.gz file holds the original JSON
+    schema.  A .npz (or any other ario archive type) holds the binary
+    form from `toarrays()` with members optionally compressed.
     '''
+    if filename.endswith(array_exts):
+        from wirecell.util import ario
+        with ario.Writer(filename, compression=compression) as out:
+            for key, arr in toarrays(obj).items():
+                out.add(key, arr)
+        return
+
     text = dumps(obj)
     if filename.endswith(".json"):
         open(filename, 'w').write(text)
@@ -81,16 +186,21 @@ def load(filename):
     '''
     Return response.schema object representation of the data in the
     file of the given name.
-    '''
-    if filename.endswith(".json"):
-        return loads(open(filename, 'r').read())
 
-    if filename.endswith(".json.bz2"):
+    Either the JSON schema or the binary form is accepted, see dump()
+    and file_type().
+    '''
+    fmt, codec = file_type(filename)
+    if fmt == "arrays":
+        from wirecell.util import ario
+        if codec == "zip":
+            return fromarrays(ario.Zip(filename))
+        return fromarrays(ario.load(filename))
+
+    if codec == "bz2":
         import bz2
         return loads(bz2.BZ2File(filename, 'r').read())
-
-    if filename.endswith(".json.gz"):
+    if codec == "gz":
         import gzip
         return loads(gzip.open(filename, "rb").read())
-
-    raise ValueError("unknown file format: %s" % filename)
+    return loads(open(filename, 'r').read())
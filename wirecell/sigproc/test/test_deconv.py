@@ -0,0 +1,104 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell import units
+from wirecell.sigproc import response, deconv
+
+
+def make_spectra():
+    times = numpy.linspace(0, 50*units.us, 501)
+    rflist = list()
+    for plane in 'uvw':
+        for region in range(-3, 4):
+            for impact in [0.0, -0.5, -1.0, -1.5]:
+                resp = numpy.exp(-0.5*((times - 10*units.us)/(2*units.us))**2 - abs(region))
+                rflist.append(response.ResponseFunction(
+                    plane, region, (3*region + impact, 0), (0, 50*units.us, 501), resp, impact))
+    return response.response_spect_nominal(rflist, 14*units.mV/units.fC, 2*units.us,
+                                           mirror=False)
+
+
+def measure(signal, Rpf):
+    'Convolve signal with the response without wrapping.'
+    Rct, center = deconv.plane_kernel(Rpf)
+    nchan, nticks = signal.shape
+    shape = (nchan + 8, nticks + 2*Rct.shape[1])
+    big = numpy.zeros(shape)
+    big[:nchan, :nticks] = signal
+    Rsp = deconv.kernel_spectrum(Rct, center, *shape)
+    return numpy.fft.irfft2(numpy.fft.rfft2(big)*Rsp, s=shape)[:nchan, :nticks]
+
+
+def test_chunked():
+    spectra = make_spectra()
+    assert [s.shape for s in spectra] == [(7, 100)]*3
+    signal = numpy.zeros((200, 600))
+    signal[50, 150] = 1
+    signal[120, 400] = 2
+    Mct = measure(signal, spectra[2])
+
+    whole = deconv.deconvolve_plane(Mct, spectra[2], 2, chunk=600)
+    chunked = deconv.deconvolve_plane(Mct, spectra[2], 2, chunk=64)
+    assert numpy.allclose(whole, chunked, atol=1e-6*numpy.max(whole))
+
+    for ch, tick in [(50, 150), (120, 400)]:
+        near = chunked[ch-5:ch+5, tick-20:tick+20]
+        assert numpy.unravel_index(numpy.argmax(near), near.shape) == (5, 20)
+    assert abs(chunked[120, 400]/chunked[50, 150] - 2) < 0.01
+
+
+def test_frame():
+    spectra = make_spectra()
+    nticks = 300
+    frame = numpy.zeros((2560, nticks))
+    frame[1700, 100] = 1
+    channels = numpy.arange(2560)[::-1]
+    frame = frame[::-1]
+    for workers in (0, 2):
+        got = deconv.deconvolve_frame(frame, channels, spectra, workers=workers)
+        assert got.shape == frame.shape
+        want = deconv.deconvolve_plane(frame[::-1][1600:], spectra[2], 2)
+        assert numpy.allclose(got[::-1][1600:], want)
+        assert numpy.allclose(got[::-1][:1600], 0)
+
+
+def test_field_roundtrip(tmp_path):
+    from click.testing import CliRunner
+    from wirecell.util import ario
+    from wirecell.sigproc.__main__ import cli
+    import wirecell.sigproc.response.persist as per
+
+    times = numpy.linspace(0, 50*units.us, 101)
+    rflist = list()
+    for plane in 'uvw':
+        for region in range(-3, 4):
+            for impact in [0.0, -0.3, -0.6, -0.9, -1.2, -1.5]:
+                resp = numpy.exp(-0.5*((times - 10*units.us)/(2*units.us))**2 - abs(region))
+                rflist.append(response.ResponseFunction(
+                    plane, region, (3*region + impact, 0), (0, 50*units.us, 101), resp, impact))
+
+    field = str(tmp_path / "field.json.bz2")
+    per.dump(field, response.rf1dtoschema(rflist))
+    back = response.schematorf1d(per.load(field))
+    assert len(back) == len(rflist)
+    rs = response.ResponseSet.from_list(back)
+    assert rs.current.shape == (3, 7, 6, 101)
+    assert numpy.allclose(sorted(rs.impacts), [-1.5, -1.2, -0.9, -0.6, -0.3, 0.0])
+    assert [int(r) for r in rs.regions] == list(range(-3, 4))
+
+    frame = numpy.zeros((2560, 300))
+    frame[1700, 100] = 1
+    channels = numpy.arange(2560)
+    inp = str(tmp_path / "frames.npz")
+    with ario.Writer(inp) as out:
+        out.add("frame_orig_0", frame)
+        out.add("channels_orig_0", channels)
+    outp = str(tmp_path / "decon.npz")
+    got = CliRunner().invoke(cli, ["deconvolve", "--field", field, inp, outp])
+    assert got.exit_code == 0, got.output
+
+    spectra = response.response_spect_nominal(rflist, 14*units.mV/units.fC, 2*units.us,
+                                              mirror=False)
+    want = deconv.deconvolve_frame(frame, channels, spectra)
+    decon = ario.load(outp)["frame_decon_0"]
+    assert numpy.allclose(decon, want, atol=1e-6*numpy.max(numpy.abs(want)))
@@ -0,0 +1,51 @@
+#!/usr/bin/env pytest
+
+import math
+import numpy
+from wirecell import units
+from wirecell.sigproc import response
+
+
+def scalar_cold(time, gain, shaping):
+    'The original per-sample form of the cold response'
+    if time <= 0 or time >= 10*units.us:
+        return 0.0
+    time = time/units.us
+    st = shaping/units.us
+    from math import sin, cos, exp
+    return gain*(4.31054*exp(-2.94809*time/st)
+                 -2.6202*exp(-2.82833*time/st)*cos(1.19361*time/st)
+                 -2.6202*exp(-2.82833*time/st)*cos(1.19361*time/st)*cos(2.38722*time/st)
+                 +0.464924*exp(-2.40318*time/st)*cos(2.5928*time/st)
+                 +0.464924*exp(-2.40318*time/st)*cos(2.5928*time/st)*cos(5.18561*time/st)
+                 +0.762456*exp(-2.82833*time/st)*sin(1.19361*time/st)
+                 -0.762456*exp(-2.82833*time/st)*cos(2.38722*time/st)*sin(1.19361*time/st)
+                 +0.762456*exp(-2.82833*time/st)*cos(1.19361*time/st)*sin(2.38722*time/st)
+                 -2.6202*exp(-2.82833*time/st)*sin(1.19361*time/st)*sin(2.38722*time/st)
+                 -0.327684*exp(-2.40318*time/st)*sin(2.5928*time/st)
+                 +0.327684*exp(-2.40318*time/st)*cos(5.18561*time/st)*sin(2.5928*time/st)
+                 -0.327684*exp(-2.40318*time/st)*cos(2.5928*time/st)*sin(5.18561*time/st)
+                 +0.464924*exp(-2.40318*time/st)*sin(2.5928*time/st)*sin(5.18561*time/st))
+
+
+def test_cold():
+    times = numpy.linspace(-1*units.us, 12*units.us, 1301)
+    for shaping in (0.5, 1.0, 2.0, 3.0):
+        shaping *= units.us
+        want = numpy.array([scalar_cold(t, 1.0, shaping) for t in times])
+        got = response.electronics_no_gain_scale(times, 1.0, shaping)
+        assert numpy.allclose(got, want, atol=1e-9*numpy.max(want))
+        assert math.isclose(response.electronics_no_gain_scale(times[200], 1.0, shaping),
+                            want[200], rel_tol=1e-9)
+
+
+def test_memo():
+    gain = 14*units.mV/units.fC
+    times = numpy.linspace(0, 20*units.us, 2001)
+    one = response.electronics(times, gain, 2*units.us, "warm")
+    one[:] = 0
+    two = response.electronics(times, gain, 2*units.us, "warm")
+    assert numpy.max(two) > 0
+    assert response._electronics_grid.cache_info().hits >= 1
+    peak = numpy.max(response.electronics(times, gain, 2*units.us))
+    assert abs(peak/gain - 1) < 0.01
@@ -0,0 +1,69 @@
+#!/usr/bin/env pytest
+
+import json
+import math
+import numpy
+from wirecell.util import ario
+from wirecell.sigproc import response
+from wirecell.sigproc.response.filterbank import FilterBank
+
+
+def test_shapes(tmp_path):
+    bank = FilterBank(tmp_path)
+    freqs = numpy.linspace(0, 1.0, 101)
+    got = bank("expower", 101, 1.0, 0.3, 4.0)
+    assert numpy.allclose(got, [math.exp(-0.5*(f/0.3)**4) for f in freqs])
+    assert not got.flags.writeable
+    assert numpy.allclose(bank("gaussian", 101, 1.0, 0.3), numpy.exp(-0.5*(freqs/0.3)**2))
+    assert numpy.allclose(bank("lowfreq", 101, 1.0, 0.3), 1 - numpy.exp(-(freqs/0.3)**2))
+
+    assert bank("expower", 101, 1.0, 0.3, 4.0) is got
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+    again = FilterBank(tmp_path)("expower", 101, 1.0, 0.3, 4.0)
+    assert numpy.array_equal(again, got)
+
+    scan = bank.scan("expower", 101, 1.0, numpy.linspace(0.1, 0.5, 5), [2.0, 3.0, 4.0, 5.0, 6.0])
+    assert scan.shape == (5, 101)
+    assert numpy.allclose(scan[2], got)
+
+
+def test_filters(tmp_path):
+    bank = FilterBank(tmp_path)
+    fu, fv, fw, fc = response.filters(480, npitches=100, bank=bank)
+    want = response.filter_expower(2*1.43555e+07/200.0, 4.95096e+00, 480, 1.0e6)
+    assert numpy.allclose(fu, want)
+    assert fc.shape == (100,)
+
+
+def test_save(tmp_path):
+    bank = FilterBank(False)
+    bank.add("Wiener_tight_U", "wiener", 100, 1.0, 0.15, 5.0)
+    bank.add("ROI_loose_lf", "lowfreq", 100, 1.0, 0.002)
+    jpath = str(tmp_path / "filters.json")
+    bank.save(jpath)
+    cfgs = json.load(open(jpath))
+    assert [c['type'] for c in cfgs] == ["HfFilter", "LfFilter"]
+    assert cfgs[0]['data']['power'] == 5.0
+    assert cfgs[1]['data']['tau'] == 0.002
+
+    apath = str(tmp_path / "filters.npz")
+    bank.save(apath)
+    arf = ario.load(apath)
+    assert arf["filters"] == cfgs
+    assert numpy.array_equal(arf["Wiener_tight_U"], bank["Wiener_tight_U"])
+
+
+def test_default_cache(tmp_path, monkeypatch):
+    from wirecell.sigproc.response import filterbank
+    monkeypatch.setenv("WIRECELL_CACHE", str(tmp_path / "base"))
+    monkeypatch.delenv("WIRECELL_FILTER_CACHE", raising=False)
+    monkeypatch.setattr(filterbank, "_default_bank", None)
+    assert filterbank.default_bank().cache is None
+    response.filters(480, npitches=100)
+    assert not (tmp_path / "base").exists()
+
+    assert FilterBank(True).cache == tmp_path / "base" / "filters"
+    monkeypatch.setenv("WIRECELL_FILTER_CACHE", str(tmp_path / "filters"))
+    monkeypatch.setattr(filterbank, "_default_bank", None)
+    response.filters(480, npitches=100)
+    assert len(list((tmp_path / "filters").glob("*.npy"))) == 4
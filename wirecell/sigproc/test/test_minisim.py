@@ -0,0 +1,61 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell import units
+from wirecell.sigproc import response
+from wirecell.sigproc.minisim import Minisim
+
+
+def make_pib():
+    rng = numpy.random.default_rng(1)
+    rflist = list()
+    for plane in 'uvw':
+        for region in range(-3, 4):
+            for impact in numpy.arange(6)*0.3*units.mm:
+                rflist.append(response.ResponseFunction(
+                    plane, region, (3*region + impact, 0), (0, 20*units.us, 201),
+                    rng.normal(size=201), impact))
+    return response.PlaneImpactBlocks(rflist)
+
+
+def test_blocks():
+    pib = make_pib()
+    assert len(pib.impact_keys) == 11
+    block = pib.region_block('u', -0.3*units.mm)
+    assert block.shape == (7, 201)
+    assert numpy.shares_memory(block, pib.blocks['u'])
+    # geometry symmetry
+    assert numpy.array_equal(pib.response('v', 0.6*units.mm, 2),
+                             pib.response('v', -0.6*units.mm, -2))
+    got = pib.nearest_impacts(numpy.array([-2.0, 0.01, 0.29, 0.46, 5.0]))
+    assert [pib.impact_keys[i] for i in got] == [-1.5, 0.0, 0.3, 0.6, 1.5]
+
+
+def test_add_hits():
+    pib = make_pib()
+    cfg = dict(nticks=300, nwires=(100, 100, 120))
+    rng = numpy.random.default_rng(2)
+    nhits = 200
+    hits = numpy.vstack((rng.uniform(0, 10*units.mm, nhits),
+                         rng.uniform(-150*units.mm, 150*units.mm, nhits),
+                         rng.uniform(-150*units.mm, 150*units.mm, nhits),
+                         rng.uniform(0, 150*units.us, nhits),
+                         rng.uniform(1, 2, nhits))).T
+
+    fast = Minisim(pib, **cfg)
+    fast.add_hits(hits)
+    fast.add_hits(hits)
+
+    slow = Minisim(pib, **cfg)
+    ticks = slow.hit_ticks(hits)
+    for iplane, chimps in enumerate(slow.wire_space(hits)):
+        impacts = pib.nearest_impacts(chimps[:,1])
+        for (wire, _), iimp, tick, q in zip(chimps, impacts, ticks, hits[:,4]):
+            if not 0 <= wire < slow.nwires[iplane] or not 0 <= tick < slow.nticks:
+                continue
+            block = pib.region_block("uvw"[iplane], pib.impact_keys[iimp])
+            slow.apply_block(block, iplane, int(wire), tick*slow.tick, 2*q)
+
+    for got, want in zip(fast.frame, slow.frame):
+        assert numpy.max(numpy.abs(want)) > 0
+        assert numpy.allclose(got, want)
@@ -0,0 +1,46 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.sigproc.response import persist
+from wirecell.sigproc.response.schema import FieldResponse, PlaneResponse, PathResponse
+
+
+def make_fr(nplanes=3, npaths=11, nticks=50):
+    planes = list()
+    for planeid in range(nplanes):
+        paths = [PathResponse(numpy.random.normal(size=nticks), 0.3*ind, 0.0)
+                 for ind in range(npaths)]
+        planes.append(PlaneResponse(paths, planeid, 3.0 - planeid, 1.5))
+    return FieldResponse(planes, [1.0, 0.0, 0.0], 100.0, 0.0, 100.0, 1.6)
+
+
+def test_roundtrip(tmp_path):
+    fr = make_fr()
+    want = persist.dumps(fr)
+    jpath = str(tmp_path / "fr.json.bz2")
+    persist.dump(jpath, fr)
+    fromjson = persist.load(jpath)
+    for ext in ("npz", "tar"):
+        path = str(tmp_path / f"fr.{ext}")
+        persist.dump(path, fromjson)
+        got = persist.load(path)
+        assert persist.dumps(got) == want
+
+
+def test_detect(tmp_path):
+    fr = make_fr()
+    path = str(tmp_path / "fr.npz")
+    persist.dump(path, fr, compression="gz")
+    renamed = tmp_path / "fr-response"
+    (tmp_path / "fr.npz").rename(renamed)
+    assert persist.file_format(str(renamed)) == "arrays"
+    got = persist.load(str(renamed))
+    assert numpy.array_equal(got.planes[2].paths[4].current, fr.planes[2].paths[4].current)
+
+    # compressed JSON without its extension
+    jpath = tmp_path / "fr.json.gz"
+    persist.dump(str(jpath), fr)
+    jrenamed = tmp_path / "fr-json"
+    jpath.rename(jrenamed)
+    assert persist.file_type(str(jrenamed)) == ("json", "gz")
+    assert persist.dumps(persist.load(str(jrenamed))) == persist.dumps(fr)
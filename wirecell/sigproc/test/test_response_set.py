@@ -0,0 +1,107 @@
+#!/usr/bin/env pytest
+
+import numpy
+from wirecell.sigproc import response
+
+
+def make_rflist(nticks=100):
+    rng = numpy.random.default_rng(42)
+    rflist = list()
+    for plane in 'uvw':
+        for region in range(-3, 4):
+            for impact in [0.0, -0.3, -0.6, -0.9, -1.2, -1.5]:
+                rflist.append(response.ResponseFunction(
+                    plane, region, (3.0*region + impact, 0.0), (0, 99, nticks),
+                    rng.normal(size=nticks) + 0.1, impact))
+    return rflist
+
+
+def test_roundtrip():
+    rflist = make_rflist()
+    rs = response.ResponseSet.from_list(rflist)
+    assert rs.current.shape == (3, 7, 6, 100)
+    assert rs.impacts[0] == -1.5
+    back = rs.to_list()
+    assert len(back) == len(rflist)
+    byid = {(rf.plane, rf.region, rf.impact): rf for rf in rflist}
+    for rf in back:
+        want = byid[(rf.plane, rf.region, rf.impact)]
+        assert numpy.array_equal(rf.response, want.response)
+        assert rf.pos == want.pos
+        assert rf.domainls == want.domainls
+
+
+def test_average():
+    rflist = make_rflist()
+    coarse = response.average(rflist)
+    assert len(coarse) == 3*7
+    assert all(rf.impact is None for rf in coarse)
+
+    # explicit sum for one region against its mirror
+    u1 = sorted([rf for rf in rflist if rf.plane == 'u' and rf.region == 1],
+                key=lambda rf: abs(rf.impact))
+    um1 = sorted([rf for rf in rflist if rf.plane == 'u' and rf.region == -1],
+                 key=lambda rf: abs(rf.impact))
+    binsize = [0.5, 1, 1, 1, 1, 0.5]
+    want = sum(b*(p.response + m.response) for b, p, m in zip(binsize, u1, um1)) / 10
+    got = [rf for rf in coarse if rf.plane == 'u' and rf.region == 1][0]
+    assert numpy.allclose(got.response, want)
+
+    rs = response.average(response.ResponseSet.from_list(rflist))
+    assert rs.current.shape == (3, 7, 1, 100)
+    assert numpy.allclose(rs.current[0, 4, 0], want)
+
+
+def test_spectra():
+    rflist = make_rflist()
+    pibs = response.plane_impact_blocks(rflist)
+    assert [p.shape for p in pibs] == [(6, 7, 100)]*3
+    specs = response.field_response_spectra(rflist)
+    assert [s.shape for s in specs] == [(13, 100)]*3
+    specs = response.field_response_spectra(rflist, mirror=False)
+    assert [s.shape for s in specs] == [(7, 100)]*3
+
+
+def test_shaped():
+    rflist = make_rflist()
+    want = [rf.shaped(nbins=150) for rf in rflist]
+    got = response.shaped_responses(rflist, nbins=150)
+    for w, g in zip(want, got):
+        assert numpy.allclose(w.response, g.response)
+
+    rs = response.shaped_responses(response.ResponseSet.from_list(rflist))
+    want = response.ResponseSet.from_list([rf.shaped() for rf in rflist])
+    assert numpy.allclose(rs.current, want.current)
+
+    rows = numpy.random.normal(size=(3000, 64))
+    spec = numpy.fft.rfft(numpy.random.normal(size=64))
+    assert numpy.allclose(response.convolve_spectrum(spec, rows, workers=2),
+                          response.convolve_spectrum(spec, rows))
+
+
+def test_ragged_list():
+    rflist = make_rflist()
+    # a duplicate and a response of another length are taken as lists
+    dup = rflist + [rflist[0]]
+    odd = rflist + [rflist[0].dup(region=10, response=numpy.ones(50))]
+    for bad in (dup, odd):
+        try:
+            response.ResponseSet.from_list(bad)
+        except ValueError:
+            pass
+        else:
+            assert False, "expected ValueError"
+
+    want = response.normalize(rflist)
+    for bad in (dup, odd):
+        got = response.normalize(bad)
+        assert len(got) == len(bad)
+        for w, g in zip(want, got):
+            assert numpy.allclose(w.response, g.response)
+
+    # a duplicate on both sides of the central wire, as the old code allows
+    mirrored = [rf for rf in rflist if rf.plane == 'u' and abs(rf.region) == 3 and rf.impact == 0]
+    got = response.average(dup + mirrored[1:])
+    assert len(got) == 3*7
+    specs = response.field_response_spectra(dup + mirrored[1:])
+    assert len(specs) == 3
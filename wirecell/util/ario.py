@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
 '''Array / archive IO
 
-Read-only dict-like, sometimes efficient, random access to files.
+Read-only dict-like, sometimes efficient, random access to files and
+a streaming Writer to produce them.
 
 '''
 import io
+import os
 import json
+import sys
+import zlib
+import time
+import struct
+import bisect
 import numpy
 import pathlib
 import zipfile
 import tarfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from collections.abc import Mapping
 
 def stem_if(fname, exts):
@@ -29,6 +38,25 @@ decompressors = dict(
     bz2 = bz2.decompress,
     xz = lzma.decompress
 )
+# Factories of streaming compressor objects for Writer.
+compressors = dict(
+    gz = lambda: zlib.compressobj(wbits=31),
+    bz2 = bz2.BZ2Compressor,
+    xz = lzma.LZMACompressor,
+)
+
+try:
+    import zstandard
+except ImportError:
+    pass
+else:
+    def zst_decompress(data):
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    decompressors["zst"] = zst_decompress
+    compressors["zst"] = lambda: zstandard.ZstdCompressor().compressobj()
+
+# Known member compression extensions
+compression_exts = ('gz', 'xz', 'bz2', 'zst')
 
 
 def transform(fname, data):
@@ -49,13 +77,117 @@ def transform(fname, data):
     raise ValueError(f'unsupported member type: {ext}')
 
 
+def finish(fname, data):
+    '''
+    Transform data unless it is already an object.
+    '''
+    if isinstance(data, bytes):
+        return transform(fname, data)
+    return data
+
+
+def transform_all(fnames, datas, workers):
+    '''
+    Return list of objects from finishing each of fnames and datas.
+
+    Only the bytes are transformed in a pool, objects (eg memmaps) are
+    passed through.  If workers is a number, a process pool of that
+    size is used.  Otherwise it is taken as a
+    concurrent.futures.Executor (eg, a ThreadPoolExecutor) which is
+    used as-is.
+    '''
+    fnames = list(fnames)
+    ret = list(datas)
+    todo = [ind for ind, data in enumerate(ret) if isinstance(data, bytes)]
+    if not todo:
+        return ret
+    args = ([fnames[ind] for ind in todo], [ret[ind] for ind in todo])
+    if isinstance(workers, int):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            objs = list(pool.map(transform, *args))
+    else:
+        objs = list(workers.map(transform, *args))
+    for ind, obj in zip(todo, objs):
+        ret[ind] = obj
+    return ret
+
+
+def npy_memmap(path, offset):
+    '''
+    Return a copy-on-write numpy.memmap of the .npy data found
+    uncompressed at byte offset in the file at path.
+
+    The .npy header is parsed in place.  Return None if the array
+    can not be memory mapped (eg, it holds Python objects).
+    '''
+    fmt = numpy.lib.format
+    with open(path, 'rb') as fp:
+        fp.seek(offset)
+        version = fmt.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran, dtype = fmt.read_array_header_1_0(fp)
+        elif version in ((2, 0), (3, 0)):
+            shape, fortran, dtype = fmt.read_array_header_2_0(fp)
+        else:
+            return
+        start = fp.tell()
+    if dtype.hasobject:
+        return
+    if not shape or 0 in shape:
+        # memmap rejects empty arrays, scalars are trivial to read
+        return
+    return numpy.memmap(path, dtype=dtype, mode='c', offset=start,
+                        shape=shape, order='F' if fortran else 'C')
+
+
+def object_nbytes(obj):
+    '''
+    Return an estimate of the memory held by a loaded object.
+    '''
+    if isinstance(obj, numpy.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(object_nbytes(k) + object_nbytes(v)
+                                        for k,v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(object_nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
 class Arf(Mapping):
     '''
     Base for common methods in Tar/Zip.
 
     Subclass provide keymap() and greedy_load.
+
+    When lazy loading, up to cache_bytes worth of the most recently
+    accessed objects are kept so that repeated access does not repeat
+    the load.  The hits, misses and evictions counters and the nbytes
+    held by this cache are available as attributes and summarized by
+    cache_info().  As each hit returns the same object, arrays are
+    returned read-only and decoded JSON objects are shared and must
+    not be modified.
     '''
 
+    cache_bytes = 0
+    hits = misses = evictions = nbytes = 0
+
+    def init_cache(self, cache_bytes=0):
+        '''
+        Set a byte budget for the cache of lazily loaded objects.
+        '''
+        self.cache_bytes = cache_bytes or 0
+        self.hits = self.misses = self.evictions = self.nbytes = 0
+        self._cache = OrderedDict()
+
+    def cache_info(self):
+        '''
+        Return dict summarizing the cache of lazily loaded objects.
+        '''
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, count=len(self._cache),
+                    nbytes=self.nbytes, cache_bytes=self.cache_bytes)
+
     def lazy_load(self, fileobj, infoobj):
         '''
         Return a callable that loads an object given a file and info
@@ -65,11 +197,72 @@ class Arf(Mapping):
             return self.greedy_load(fileobj, infoobj)
         return loader
 
+    def greedy_load(self, fileobj, infoobj):
+        '''
+        Immediately load the member described by the info object from
+        the file object and return object.
+        '''
+        name, data = self.read_raw(fileobj, infoobj)
+        return finish(name, data)
+
+    def build_index(self, fileobj, members, workers=0):
+        '''
+        Fill the index from a sequence of (key, name, info object).
+
+        When greedy loading with workers, the raw member data is read
+        in order and their transforms are spread over a pool.
+        '''
+        self._index = dict()
+        self.member_names = dict()
+        if self._lazy or not workers:
+            tran = self.lazy_load if self._lazy else self.greedy_load
+            for key, name, info in members:
+                self._index[key] = tran(fileobj, info)
+                self.member_names[key] = name
+            return
+
+        keys = list()
+        names = list()
+        datas = list()
+        for key, name, info in members:
+            keys.append(key)
+            names.append(name)
+            datas.append(self.read_raw(fileobj, info)[1])
+        objs = transform_all(names, datas, workers)
+        for key, name, obj in zip(keys, names, objs):
+            self._index[key] = obj
+            self.member_names[key] = name
+
     def __getitem__(self, key):
         val = self._index[key]
-        if self._lazy:
+        if not self._lazy:
+            return val
+        if not self.cache_bytes:
             return val()
-        return val
+
+        try:
+            obj, size = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return obj
+
+        self.misses += 1
+        obj = val()
+        if isinstance(obj, numpy.ndarray):
+            obj.setflags(write=False)
+        size = object_nbytes(obj)
+        if size > self.cache_bytes:
+            return obj
+        while self._cache and self.nbytes + size > self.cache_bytes:
+            _, (_, old) = self._cache.popitem(last=False)
+            self.nbytes -= old
+            self.evictions += 1
+        self._cache[key] = (obj, size)
+        self.nbytes += size
+        return obj
 
     def __iter__(self):
         return iter(self._index)
@@ -82,10 +275,14 @@ class Tar(Arf):
     Apply a mapping interface to a tar file
     '''
 
-    def __init__(self, path, lazy=True):
+    def __init__(self, path, lazy=True, mmap=True, cache_bytes=0, workers=0):
         '''
         Create a Tar mapping on file path.  
+
+        If mmap, uncompressed .npy members of an uncompressed tar
+        file are returned as memory mapped arrays.
         '''
+        path = str(path)
         mode = "r"
         if path.endswith(('.gz', '.tgz')):
             mode += ':gz'
@@ -97,20 +294,17 @@ class Tar(Arf):
             mode += ':bz2'
             lazy = False
         tf = tarfile.open(path, mode)
+        self._path = path
+        self._mmap = mmap and isinstance(tf.fileobj, io.BufferedReader)
         self._lazy = lazy
-        if lazy:
-            tran = self.lazy_load
-        else:
-            tran = self.greedy_load
-        self._index = dict()
-        self.member_names = dict()
+        self.init_cache(cache_bytes)
+        members = list()
         for ti in tf.getmembers():
             key = self.keymap(ti)
             if not key:
                 continue
-            self._index[key] = tran(tf, ti)
-            self.member_names[key] = ti.name
-
+            members.append((key, ti.name, ti))
+        self.build_index(tf, members, workers)
 
     def keymap(self, ti):
         '''
@@ -119,42 +313,47 @@ class Tar(Arf):
         if not ti.isfile():
             return
         # strip internal compression extension
-        key = stem_if(ti.name, ('gz', 'xz', 'bz2'))
+        key = stem_if(ti.name, compression_exts)
         # strip of object extension
         key = stem_if(key, ('npy', 'json'))
         return key
 
-    def greedy_load(self, tf, ti):
+    def read_raw(self, tf, ti):
         '''
-        Immediately load the TarInfo ti from TarFile tf and return
-        object.
+        Return (name, data) for TarInfo ti from TarFile tf.
+
+        The data is bytes or a memory mapped array.
         '''
-        data = tf.extractfile(ti).read()
-        return transform(ti.name, data)
+        if self._mmap and ti.name.endswith(".npy") and not ti.issparse():
+            arr = npy_memmap(self._path, ti.offset_data)
+            if arr is not None:
+                return ti.name, arr
+        return ti.name, tf.extractfile(ti).read()
 
 
 class Zip(Arf):
     '''
     Apply a mapping interface to a zip file.
 
-    This will lazy load.
+    This will lazy load.  If mmap, .npy members stored without
+    compression (eg, from numpy.savez()) are returned as memory mapped
+    arrays.
     '''
-    def __init__(self, path, lazy=True):
+    def __init__(self, path, lazy=True, mmap=True, cache_bytes=0, workers=0):
 
+        path = str(path)
         zf = zipfile.ZipFile(path)
+        self._path = path
+        self._mmap = mmap
         self._lazy = lazy
-        if lazy:
-            tran = self.lazy_load
-        else:
-            tran = self.greedy_load
-        self._index = dict()
-        self.member_names = dict()
+        self.init_cache(cache_bytes)
+        members = list()
         for zi in zf.infolist():
             key = self.keymap(zi)
             if not key:
                 continue
-            self._index[key] = tran(zf, zi)
-            self.member_names[key] = zi.filename
+            members.append((key, zi.filename, zi))
+        self.build_index(zf, members, workers)
 
     def keymap(self, zi):
         '''
@@ -163,22 +362,564 @@ class Zip(Arf):
         if zi.is_dir():
             return
         # strip internal compression extension
-        key = stem_if(zi.filename, ('gz', 'xz', 'bz2'))
+        key = stem_if(zi.filename, compression_exts)
         # strip of object extension
         key = stem_if(key, ('npy', 'json'))
         return key
 
-    def greedy_load(self, zf, zi):
+    def read_raw(self, zf, zi):
         '''
-        Immediately load the ZipInfo zi from ZipFile zf and return
-        object.
+        Return (name, data) for ZipInfo zi from ZipFile zf.
+
+        The data is bytes or a memory mapped array.
+        '''
+        if self._mmap and zi.filename.endswith(".npy") \
+           and zi.compress_type == zipfile.ZIP_STORED \
+           and not zi.flag_bits & 0x1:
+            arr = npy_memmap(self._path, self.data_offset(zi))
+            if arr is not None:
+                return zi.filename, arr
+        return zi.filename, zf.open(zi.filename).read()
+
+    def data_offset(self, zi):
+        '''
+        Return the file offset to the start of the data of member zi.
         '''
-        data = zf.open(zi.filename).read()
-        return transform(zi.filename, data)
+        # The local header's extra field may differ from the central
+        # directory's so it must be read.
+        with open(self._path, 'rb') as fp:
+            fp.seek(zi.header_offset)
+            local = fp.read(30)
+        nname, nextra = struct.unpack('<HH', local[26:30])
+        return zi.header_offset + 30 + nname + nextra
 
 
-class Pixz:
-    pass
+def xz_varint(buf, pos):
+    '''
+    Decode an xz multibyte integer from buf at pos.
+
+    Return tuple (value, new position).
+    '''
+    val = 0
+    for shift in range(0, 63, 7):
+        byte = buf[pos]
+        pos += 1
+        val |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return val, pos
+    raise ValueError("corrupt xz multibyte integer")
+
+
+def xz_varint_encode(val):
+    '''
+    Encode an integer as an xz multibyte integer.
+    '''
+    ret = bytearray()
+    while val >= 0x80:
+        ret.append((val & 0x7f) | 0x80)
+        val >>= 7
+    ret.append(val)
+    return bytes(ret)
+
+
+class XzBlocks:
+    '''
+    Random access to the uncompressed content of an .xz file.
+
+    The block index held at the end of each xz stream is used to
+    locate the block(s) spanning a requested range of uncompressed
+    bytes and only those blocks are decompressed.  An .xz file made
+    of a single block (the default for plain "xz") gains nothing,
+    while files made by pixz or other block-parallel compressors
+    allow true random access.
+
+    Each entry of .blocks is a tuple:
+
+        (stream header, compressed offset, unpadded size,
+         uncompressed offset, uncompressed size)
+    '''
+
+    header_magic = b'\xfd7zXZ\x00'
+    footer_magic = b'YZ'
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.blocks = list()
+        self._cache = (None, None)
+        with open(self.path, 'rb') as fp:
+            self._parse(fp)
+
+    def _parse(self, fp):
+        fp.seek(0, io.SEEK_END)
+        end = fp.tell()
+        streams = list()
+        while end > 0:
+            # skip stream padding
+            fp.seek(end-4)
+            if fp.read(4) == b'\x00\x00\x00\x00':
+                end -= 4
+                continue
+            fp.seek(end-12)
+            footer = fp.read(12)
+            if footer[10:] != self.footer_magic:
+                raise ValueError(f'not an xz file: {self.path}')
+            backward = (int.from_bytes(footer[4:8], 'little') + 1) * 4
+            index_start = end - 12 - backward
+            fp.seek(index_start)
+            index = fp.read(backward)
+            if index[0] != 0:
+                raise ValueError(f'corrupt xz index: {self.path}')
+            nrec, pos = xz_varint(index, 1)
+            records = list()
+            for _ in range(nrec):
+                unpadded, pos = xz_varint(index, pos)
+                usize, pos = xz_varint(index, pos)
+                records.append((unpadded, usize))
+            ctot = sum((unpadded+3) & ~3 for unpadded,_ in records)
+            start = index_start - ctot - 12
+            fp.seek(start)
+            header = fp.read(12)
+            if header[:6] != self.header_magic:
+                raise ValueError(f'corrupt xz stream: {self.path}')
+            streams.append((start, header, records))
+            end = start
+
+        uoff = 0
+        for start, header, records in reversed(streams):
+            coff = start + 12
+            for unpadded, usize in records:
+                self.blocks.append((header, coff, unpadded, uoff, usize))
+                coff += (unpadded+3) & ~3
+                uoff += usize
+        self.size = uoff
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def block(self, ind):
+        '''
+        Return the uncompressed bytes of block number ind.
+        '''
+        if self._cache[0] == ind:
+            return self._cache[1]
+        header, coff, unpadded, _, usize = self.blocks[ind]
+        with open(self.path, 'rb') as fp:
+            fp.seek(coff)
+            body = fp.read((unpadded+3) & ~3)
+
+        # Wrap the block in a minimal single-block stream.
+        index = b'\x00\x01' + xz_varint_encode(unpadded) + xz_varint_encode(usize)
+        index += b'\x00' * (-len(index) % 4)
+        index += zlib.crc32(index).to_bytes(4, 'little')
+        flags = header[6:8]
+        back = (len(index)//4 - 1).to_bytes(4, 'little') + flags
+        footer = zlib.crc32(back).to_bytes(4, 'little') + back + self.footer_magic
+        data = lzma.decompress(header + body + index + footer, lzma.FORMAT_XZ)
+        if len(data) != usize:
+            raise ValueError(f'corrupt xz block {ind}: {self.path}')
+        self._cache = (ind, data)
+        return data
+
+    def read(self, offset, size):
+        '''
+        Return size uncompressed bytes starting at offset.
+        '''
+        starts = [b[3] for b in self.blocks]
+        ind = max(bisect.bisect_right(starts, offset) - 1, 0)
+        parts = list()
+        stop = offset + size
+        while size > 0 and ind < len(self.blocks):
+            uoff, usize = self.blocks[ind][3:]
+            if uoff >= stop:
+                break
+            data = self.block(ind)
+            parts.append(data[max(offset-uoff, 0):stop-uoff])
+            ind += 1
+        return b''.join(parts)
+
+
+class Pixz(Arf):
+    '''
+    Apply a mapping interface to a block-indexed xz compressed tar file.
+
+    The member index is taken from the file index that pixz embeds
+    as the last block of its output.  Lacking that, it is read from a
+    sidecar file "<path>.ario.json" which is built (with a single
+    full decompression pass) and saved if it does not yet exist.
+
+    Loading a member decompresses only the blocks that hold it.  As
+    the content is compressed, mmap is accepted but has no effect.
+    '''
+
+    pixz_magic = 0xDBAE14D62E324CA6
+
+    def __init__(self, path, lazy=True, mmap=False, cache_bytes=0, workers=0):
+        path = str(path)
+        self._xz = XzBlocks(path)
+        self._lazy = lazy
+        self.init_cache(cache_bytes)
+
+        entries = self.pixz_index()
+        if entries is None:
+            entries = self.sidecar_index(path)
+
+        members = list()
+        for ent in entries:
+            key = self.keymap(ent[0])
+            if not key:
+                continue
+            members.append((key, ent[0], ent))
+        self.build_index(self._xz, members, workers)
+
+    def pixz_index(self):
+        '''
+        Return member entries from an embedded pixz file index or None.
+
+        Entries are (name, offset, size, True) with offset/size
+        spanning the member's tar header(s) and data.
+        '''
+        if len(self._xz) < 2:
+            return
+        data = self._xz.block(len(self._xz)-1)
+        if int.from_bytes(data[:8], 'little') != self.pixz_magic:
+            return
+        pos = 8
+        named = list()
+        while pos < len(data):
+            nul = data.index(b'\x00', pos)
+            name = data[pos:nul].decode()
+            offset = int.from_bytes(data[nul+1:nul+9], 'little')
+            pos = nul + 9
+            named.append((name, offset))
+            if not name:
+                break
+        ret = list()
+        for (name, offset), (_, nxt) in zip(named[:-1], named[1:]):
+            if name.endswith('/'):
+                continue
+            ret.append((name, offset, nxt-offset, True))
+        return ret
+
+    def sidecar_index(self, path):
+        '''
+        Return member entries from a sidecar index, building it if needed.
+
+        Entries are (name, offset, size, False) with offset/size
+        spanning just the member data.
+        '''
+        sidecar = pathlib.Path(path + ".ario.json")
+        if sidecar.exists() and sidecar.stat().st_mtime >= os.stat(path).st_mtime:
+            members = json.loads(sidecar.read_text())["members"]
+        else:
+            members = list()
+            with tarfile.open(path, 'r:xz') as tf:
+                for ti in tf:
+                    if ti.isfile():
+                        members.append((ti.name, ti.offset_data, ti.size))
+            try:
+                sidecar.write_text(json.dumps(dict(members=members)))
+            except OSError:
+                pass
+        return [(n, o, s, False) for n,o,s in members]
+
+    def keymap(self, name):
+        '''
+        Return lookup key.
+        '''
+        # strip internal compression extension
+        key = stem_if(name, compression_exts)
+        # strip of object extension
+        key = stem_if(key, ('npy', 'json'))
+        return key
+
+    def read_raw(self, xz, ent):
+        '''
+        Return (name, bytes) for the member entry from the XzBlocks.
+        '''
+        name, offset, size, header = ent
+        data = xz.read(offset, size)
+        if header:
+            tf = tarfile.open(fileobj=io.BytesIO(data), mode='r:')
+            data = tf.extractfile(tf.firstmember).read()
+        return name, data
+
+
+class XzBlockWriter:
+    '''
+    A write-only file-like object producing a single xz stream made of
+    independently compressed blocks.
+
+    Each block_size bytes written (or fewer at a call to
+    flush_block()) are compressed into one block so that XzBlocks may
+    later decompress them independently.
+    '''
+
+    check = lzma.CHECK_CRC64
+
+    def __init__(self, fileobj, block_size=1<<24, preset=6):
+        self._fp = fileobj
+        self.block_size = block_size
+        self.preset = preset
+        self._buf = bytearray()
+        self._pos = 0
+        self._records = list()
+        self._flags = bytes([0, self.check])
+        fileobj.write(XzBlocks.header_magic + self._flags
+                      + zlib.crc32(self._flags).to_bytes(4, 'little'))
+
+    def write(self, data):
+        self._buf += data
+        self._pos += len(data)
+        while len(self._buf) >= self.block_size:
+            self._compress(bytes(self._buf[:self.block_size]))
+            del self._buf[:self.block_size]
+        return len(data)
+
+    def tell(self):
+        '''
+        Return the number of uncompressed bytes written.
+        '''
+        return self._pos
+
+    def flush_block(self):
+        '''
+        Compress any pending data to a block.
+        '''
+        if self._buf:
+            self._compress(bytes(self._buf))
+            self._buf.clear()
+
+    def _compress(self, chunk):
+        # Compress as a one-block stream and keep only the block.
+        comp = lzma.compress(chunk, format=lzma.FORMAT_XZ,
+                             check=self.check, preset=self.preset)
+        backward = (int.from_bytes(comp[-8:-4], 'little') + 1) * 4
+        index = comp[-12-backward:-12]
+        _, pos = xz_varint(index, 1)
+        unpadded, pos = xz_varint(index, pos)
+        usize, pos = xz_varint(index, pos)
+        self._fp.write(comp[12:12 + ((unpadded+3) & ~3)])
+        self._records.append((unpadded, usize))
+
+    def close(self):
+        '''
+        Finish the stream.  The underlying file is not closed.
+        '''
+        self.flush_block()
+        index = b'\x00' + xz_varint_encode(len(self._records))
+        for unpadded, usize in self._records:
+            index += xz_varint_encode(unpadded) + xz_varint_encode(usize)
+        index += b'\x00' * (-len(index) % 4)
+        index += zlib.crc32(index).to_bytes(4, 'little')
+        back = (len(index)//4 - 1).to_bytes(4, 'little') + self._flags
+        self._fp.write(index + zlib.crc32(back).to_bytes(4, 'little')
+                       + back + XzBlocks.footer_magic)
+
+
+def npy_parts(arr):
+    '''
+    Return list of buffers which together give the .npy encoding of
+    arr without copying its data when it is contiguous.
+    '''
+    arr = numpy.asanyarray(arr)
+    fmt = numpy.lib.format
+    if arr.dtype.hasobject:
+        bio = io.BytesIO()
+        numpy.save(bio, arr)
+        return [bio.getvalue()]
+    hdr = fmt.header_data_from_array_1_0(arr)
+    bio = io.BytesIO()
+    try:
+        fmt.write_array_header_1_0(bio, hdr)
+    except ValueError:
+        bio = io.BytesIO()
+        fmt.write_array_header_2_0(bio, hdr)
+    if hdr['fortran_order']:
+        arr = arr.T
+    arr = numpy.ascontiguousarray(arr)
+    return [bio.getvalue(), memoryview(arr.reshape(-1).view(numpy.uint8))]
+
+
+class BufferChain:
+    '''
+    A minimal read-only file-like object over a sequence of buffers.
+    '''
+
+    def __init__(self, parts):
+        self._parts = [memoryview(p).cast('B') for p in parts]
+        self.size = sum(len(p) for p in self._parts)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size
+        out = list()
+        while size > 0 and self._parts:
+            part = self._parts[0]
+            take = part[:size]
+            out.append(bytes(take))
+            size -= len(take)
+            if len(take) == len(part):
+                self._parts.pop(0)
+            else:
+                self._parts[0] = part[len(take):]
+        return b''.join(out)
+
+
+class Writer:
+    '''
+    Stream named objects into an archive file.
+
+    Numpy arrays are saved as .npy and other objects as .json members.
+    Each is encoded and written as it is added so memory use does not
+    grow with the number of members.  The archive type follows from
+    the file name as for reader_class().
+
+    Each member may be individually compressed with one of the codecs
+    in compressors ("gz", "bz2", "xz" and, if the zstandard package is
+    available, "zst") which is reflected in its file name extension.
+    For .zip/.npz archives "gz" instead uses the native zip deflate
+    compression, as numpy.savez_compressed() does.
+
+    If index is True, or the file name is .tix, .tpxz or .tar.pixz, a
+    tar is xz compressed in independent blocks of block_size bytes and
+    a pixz file index is appended so that load() may randomly access
+    its members.
+    '''
+
+    def __init__(self, path, compression=None, index=None, block_size=1<<24):
+        path = str(path)
+        self.path = path
+        self.compression = compression
+        self._fp = None
+        self._xz = None
+        self._zip = None
+        self._tar = None
+        self._pixz = None
+
+        if path.endswith(('.zip', '.npz')):
+            self._zip = zipfile.ZipFile(path, 'w', allowZip64=True)
+            return
+
+        if path.endswith(('.tix', '.tar.pixz', '.tpxz')) \
+           or (index and path.endswith(('.tar.xz', '.txz'))):
+            self._fp = open(path, 'wb')
+            self._xz = XzBlockWriter(self._fp, block_size)
+            self._tar = tarfile.open(fileobj=self._xz, mode='w',
+                                     format=tarfile.GNU_FORMAT)
+            self._pixz = list()
+            return
+
+        for exts, mode in (((".tar",), "w"),
+                           ((".tar.gz", ".tgz"), "w:gz"),
+                           ((".tar.bz2", ".tbz2"), "w:bz2"),
+                           ((".tar.xz", ".txz"), "w:xz")):
+            if path.endswith(exts):
+                self._tar = tarfile.open(path, mode, format=tarfile.GNU_FORMAT)
+                return
+        raise ValueError(f'unsupported archive type: {path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, name, obj, compression=None):
+        '''
+        Add object as name, return the full member name.
+
+        The name may lack the .npy or .json extension in which case it
+        is added based on the object type.  The compression codec
+        defaults to the one given to the constructor.
+        '''
+        compression = compression or self.compression
+        if compression == "none":
+            compression = None
+        if compression and compression not in compressors:
+            raise ValueError(f'unsupported compression: {compression}')
+
+        if isinstance(obj, numpy.ndarray):
+            if not name.endswith(".npy"):
+                name += ".npy"
+            parts = npy_parts(obj)
+        else:
+            if not name.endswith(".json"):
+                name += ".json"
+            parts = [json.dumps(obj).encode()]
+
+        if self._zip is not None:
+            return self._add_zip(name, parts, compression)
+
+        if compression:
+            name += "." + compression
+            parts = [self.compress(compression, parts)]
+        chain = BufferChain(parts)
+        ti = tarfile.TarInfo(name)
+        ti.size = chain.size
+        ti.mtime = int(time.time())
+        if self._pixz is not None:
+            self._pixz.append((name, self._tar.offset))
+        self._tar.addfile(ti, chain)
+        return name
+
+    def _add_zip(self, name, parts, compression):
+        zi = zipfile.ZipInfo(name, time.localtime()[:6])
+        zi.compress_type = zipfile.ZIP_STORED
+        if compression == "gz":
+            zi.compress_type = zipfile.ZIP_DEFLATED
+        elif compression:
+            name += "." + compression
+            zi.filename = name
+            parts = [self.compress(compression, parts)]
+        size = sum(memoryview(p).nbytes for p in parts)
+        with self._zip.open(zi, 'w', force_zip64=size > 0x7fffffff) as out:
+            for part in parts:
+                out.write(part)
+        return name
+
+    def compress(self, codec, parts):
+        '''
+        Return bytes compressing the concatenated parts with codec.
+        '''
+        comp = compressors[codec]()
+        out = [comp.compress(part) for part in parts]
+        out.append(comp.flush())
+        return b''.join(out)
+
+    def close(self):
+        '''
+        Finish and close the archive file.
+        '''
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._tar is None:
+            return
+        if self._pixz is not None:
+            self._pixz.append(("", self._tar.offset))
+        self._tar.close()
+        self._tar = None
+        if self._xz is None:
+            return
+        index = io.BytesIO()
+        index.write(Pixz.pixz_magic.to_bytes(8, 'little'))
+        for name, offset in self._pixz:
+            index.write(name.encode() + b'\x00' + offset.to_bytes(8, 'little'))
+        self._xz.flush_block()
+        self._xz.write(index.getvalue())
+        self._xz.close()
+        self._fp.close()
+        self._xz = self._fp = self._pixz = None
+
+
+def xz_blocked(path):
+    '''
+    Return True if the .xz file at path holds more than one block.
+    '''
+    try:
+        return len(XzBlocks(path)) > 1
+    except (ValueError, OSError):
+        return False
 
 
 def reader_class(path):
@@ -188,6 +929,8 @@ def reader_class(path):
     path = pathlib.Path(path)
     if not path.exists():
         raise ValueError(f'no such file: {path.name}')
+    if path.name.endswith(('.tar.xz', '.txz')) and xz_blocked(path):
+        return Pixz
     if path.name.endswith(('.tar', '.tar.gz', '.tar.bz2', '.tar.xz', '.tgz', '.txz', '.tbz2')):
         return Tar
     if path.name.endswith(('.zip', '.npz')):
@@ -198,16 +941,35 @@ def reader_class(path):
     raise ValueError(f'unsupported archive type: {path.name}')    
     
 
-def load(path, lazy=True):
+def load(path, lazy=True, mmap=True, cache_bytes=0, workers=0):
     '''
     Load a file into a dict of fledged objects.
 
     If lazy, delay loading until a key is accessed.  Compressed tar
     archives which lack indices (eg, non-pixz) can not be lazy loaded
-    and will always be greedy-loaded.  If application intends to load
-    the entire archive then greedy-loading it faster.
+    and will always be greedy-loaded.  A block-indexed xz compressed
+    tar (eg, from pixz, including when named .tar.xz) is lazy loaded
+    by decompressing only the blocks holding the requested member.
+    If application intends to load the entire archive then
+    greedy-loading it faster.
+
+    If mmap, arrays held as uncompressed .npy members of uncompressed
+    .tar files or of stored (not deflated) .zip/.npz files are
+    returned as copy-on-write numpy.memmap objects which read their
+    data from the file only as it is accessed.
+
+    If cache_bytes is nonzero, lazily loaded objects are kept in a
+    least-recently-used cache holding at most this many bytes so that
+    repeated access to the same key does not repeat the load.  Arrays
+    are then returned read-only and other objects are shared between
+    accesses.  See Arf.cache_info() for hit/miss/eviction counts.
+
+    If workers is given and the archive is greedy-loaded, member data
+    is read sequentially while decompression and parsing is spread
+    over a pool of that many processes.  An Executor instance may be
+    given instead, eg to use threads.  Keys keep their archive order.
     '''
     Reader = reader_class(path)
-    ret = Reader(path, lazy)
+    ret = Reader(path, lazy, mmap, cache_bytes, workers)
     #print(list(ret.keys()))
     return ret
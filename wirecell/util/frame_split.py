@@ -6,6 +6,7 @@ Util functions for the frame-split command
 import os
 import json
 import numpy
+from . import ario
 
 def save_one(path, aname, array, md=None, compress=True):
     '''
@@ -14,11 +15,10 @@ def save_one(path, aname, array, md=None, compress=True):
     dname = os.path.dirname(path)
     if dname and not os.path.exists(dname):
         os.makedirs(dname)
-    tosave = {aname: array}
-    if compress:
-        numpy.savez_compressed(path, **tosave)
-    else:
-        numpy.savez(path, **tosave)        
+    if not path.endswith(".npz"):
+        path += ".npz"
+    with ario.Writer(path, "gz" if compress else None) as out:
+        out.add(aname, array)
     if not md:
         return
     jpath = path.replace(".npz",".json")
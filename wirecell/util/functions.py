@@ -23,3 +23,18 @@ def unitify_parse(string):
     vals = [eval(v, units.__dict__) for v in vals]
     return vals
 
+
+def cache_directory(sub):
+    '''
+    Return the directory for cached files of kind sub.
+
+    This is $WIRECELL_CACHE/<sub> if set else
+    $XDG_CACHE_HOME/wirecell/<sub> defaulting to ~/.cache.
+    '''
+    import os
+    from pathlib import Path
+    base = os.environ.get("WIRECELL_CACHE")
+    if base:
+        return Path(base) / sub
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "wirecell" / sub
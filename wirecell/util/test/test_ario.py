@@ -0,0 +1,209 @@
+#!/usr/bin/env pytest
+
+import io
+import bz2
+import gzip
+import json
+import lzma
+import tarfile
+import numpy
+from wirecell.util import ario
+
+
+def make_arrays():
+    return {f'frame_orig_{ind}': numpy.arange(1000*(ind+1), dtype='f4').reshape(-1, 10)
+            for ind in range(4)}
+
+
+def npy_bytes(arr):
+    bio = io.BytesIO()
+    numpy.save(bio, arr)
+    return bio.getvalue()
+
+
+def tar_bytes(arrays):
+    bio = io.BytesIO()
+    with tarfile.open(fileobj=bio, mode='w', format=tarfile.GNU_FORMAT) as tf:
+        for name, arr in arrays.items():
+            dat = npy_bytes(arr)
+            ti = tarfile.TarInfo(name + '.npy')
+            ti.size = len(dat)
+            tf.addfile(ti, io.BytesIO(dat))
+    return bio.getvalue()
+
+
+def blocked_xz(raw, bsize=4096, index=None):
+    'Compress raw bytes as one xz stream per bsize block'
+    parts = [lzma.compress(raw[ind:ind+bsize]) for ind in range(0, len(raw), bsize)]
+    if index is not None:
+        parts.append(lzma.compress(index))
+    return b''.join(parts)
+
+
+def test_xz_blocks(tmp_path):
+    raw = numpy.random.bytes(20000)
+    path = tmp_path / "blob.xz"
+    path.write_bytes(blocked_xz(raw))
+    xzb = ario.XzBlocks(path)
+    assert len(xzb) == 5
+    assert xzb.size == len(raw)
+    assert xzb.read(0, len(raw)) == raw
+    assert xzb.read(4000, 5000) == raw[4000:9000]
+
+
+def test_pixz_sidecar(tmp_path):
+    arrays = make_arrays()
+    path = tmp_path / "frames.tar.xz"
+    path.write_bytes(blocked_xz(tar_bytes(arrays)))
+    assert ario.reader_class(path) is ario.Pixz
+    arf = ario.load(str(path))
+    assert (tmp_path / "frames.tar.xz.ario.json").exists()
+    assert set(arf) == set(arrays)
+    for key, arr in arrays.items():
+        assert numpy.array_equal(arf[key], arr)
+    # second open uses the sidecar
+    arf = ario.load(str(path))
+    assert numpy.array_equal(arf['frame_orig_2'], arrays['frame_orig_2'])
+
+
+def test_pixz_embedded_index(tmp_path):
+    arrays = make_arrays()
+    raw = tar_bytes(arrays)
+    tf = tarfile.open(fileobj=io.BytesIO(raw))
+    index = ario.Pixz.pixz_magic.to_bytes(8, 'little')
+    for ti in tf.getmembers():
+        index += ti.name.encode() + b'\x00' + ti.offset.to_bytes(8, 'little')
+    index += b'\x00' + len(raw).to_bytes(8, 'little')
+    path = tmp_path / "frames.tpxz"
+    path.write_bytes(blocked_xz(raw, index=index))
+    arf = ario.load(str(path))
+    assert not (tmp_path / "frames.tpxz.ario.json").exists()
+    assert set(arf) == set(arrays)
+    for key, arr in arrays.items():
+        assert numpy.array_equal(arf[key], arr)
+
+
+def test_memmap_tar(tmp_path):
+    arrays = make_arrays()
+    path = tmp_path / "frames.tar"
+    path.write_bytes(tar_bytes(arrays))
+    arf = ario.load(str(path))
+    for key, arr in arrays.items():
+        got = arf[key]
+        assert isinstance(got, numpy.memmap)
+        assert numpy.array_equal(got, arr)
+    arf = ario.load(str(path), mmap=False)
+    assert not isinstance(arf['frame_orig_0'], numpy.memmap)
+
+
+def test_memmap_npz(tmp_path):
+    arrays = make_arrays()
+    arrays['fortran'] = numpy.asfortranarray(numpy.arange(12).reshape(3,4))
+    stored = tmp_path / "stored.npz"
+    numpy.savez(stored, **arrays)
+    deflated = tmp_path / "deflated.npz"
+    numpy.savez_compressed(deflated, **arrays)
+    for path, mapped in ((stored, True), (deflated, False)):
+        arf = ario.load(str(path))
+        for key, arr in arrays.items():
+            got = arf[key]
+            assert isinstance(got, numpy.memmap) == mapped
+            assert numpy.array_equal(got, arr)
+    # copy-on-write leaves the file untouched
+    arf = ario.load(str(stored))
+    got = arf['frame_orig_0']
+    got[:] = 0
+    assert numpy.array_equal(arf['frame_orig_0'], arrays['frame_orig_0'])
+
+
+def test_lru_cache(tmp_path):
+    arrays = make_arrays()
+    path = tmp_path / "frames.npz"
+    numpy.savez_compressed(path, **arrays)
+    nbytes = [arr.nbytes for arr in arrays.values()]
+    # room for the two largest arrays but not three
+    arf = ario.load(str(path), cache_bytes=nbytes[-1] + nbytes[-2])
+    for key in arrays:
+        arf[key]
+    info = arf.cache_info()
+    assert info['misses'] == 4 and info['hits'] == 0
+    assert info['evictions'] == 2
+    assert info['nbytes'] <= info['cache_bytes']
+    got = arf['frame_orig_3']
+    assert arf.hits == 1
+    assert numpy.array_equal(got, arrays['frame_orig_3'])
+    arf['frame_orig_0']
+    assert arf.misses == 5
+    # hits share one object so arrays are read-only
+    assert arf['frame_orig_0'] is arf['frame_orig_0']
+    assert not got.flags.writeable
+    try:
+        got[0, 0] = 1
+    except ValueError:
+        pass
+    else:
+        assert False, "cached array is writable"
+
+    nocache = ario.load(str(path))
+    nocache['frame_orig_0']
+    nocache['frame_orig_0']
+    assert nocache.cache_info()['count'] == 0
+
+
+def test_parallel_greedy(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    arrays = make_arrays()
+    bio = io.BytesIO()
+    with tarfile.open(fileobj=bio, mode='w') as tf:
+        for name, arr in arrays.items():
+            for ext, comp in (('.npy.bz2', bz2.compress), ('.json.gz', gzip.compress)):
+                if ext.startswith('.json'):
+                    dat = json.dumps(arr.tolist()).encode()
+                    name = name.replace('frame', 'graph')
+                else:
+                    dat = npy_bytes(arr)
+                dat = comp(dat)
+                ti = tarfile.TarInfo(name + ext)
+                ti.size = len(dat)
+                tf.addfile(ti, io.BytesIO(dat))
+    path = tmp_path / "mixed.tar"
+    path.write_bytes(bio.getvalue())
+
+    serial = ario.load(str(path), lazy=False)
+    for workers in (2, ThreadPoolExecutor(2)):
+        par = ario.load(str(path), lazy=False, workers=workers)
+        assert list(par) == list(serial)
+        for key in serial:
+            assert numpy.array_equal(numpy.array(par[key]), numpy.array(serial[key]))
+
+    # only bytes go to the pool, objects pass through as-is
+    class Recording(ThreadPoolExecutor):
+        def map(self, fn, fnames, datas):
+            self.fnames = list(fnames)
+            return super().map(fn, self.fnames, datas)
+    arr = numpy.arange(10)
+    rec = Recording(1)
+    got = ario.transform_all(["a.npy", "b.npy"], [arr, npy_bytes(arr)], rec)
+    assert got[0] is arr
+    assert numpy.array_equal(got[1], arr)
+    assert rec.fnames == ["b.npy"]
+
+
+def test_writer(tmp_path):
+    arrays = make_arrays()
+    arrays['fortran'] = numpy.asfortranarray(numpy.arange(12.0).reshape(3,4))
+    graph = dict(vertices=[dict(ident=1)], edges=[])
+    for fname in ("out.tar", "out.tar.gz", "out.tar.xz", "out.tix", "out.zip", "out.npz"):
+        path = str(tmp_path / fname)
+        with ario.Writer(path, block_size=8192) as out:
+            for ind, (key, arr) in enumerate(arrays.items()):
+                out.add(key, arr, compression=(None, "gz", "xz", "bz2", "none")[ind])
+            out.add("graph", graph, compression="bz2")
+        arf = ario.load(path)
+        if fname == "out.tix":
+            assert isinstance(arf, ario.Pixz)
+            assert len(arf._xz) > 2
+        assert list(arf) == list(arrays) + ["graph"]
+        for key, arr in arrays.items():
+            assert numpy.array_equal(arf[key], arr)
+        assert arf["graph"] == graph